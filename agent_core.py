@@ -0,0 +1,895 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль ядра агента.
+
+Ядро владеет коллектором логов, отправителем RabbitMQ, буфером событий
+и конвейерами. При запуске под gunicorn ядро работает в отдельном
+долгоживущем процессе, а рабочие процессы веб-интерфейса обращаются
+к нему через Unix-сокет (AgentCoreClient), поэтому подключение к брокеру
+и буфер событий существуют в единственном экземпляре.
+
+Протокол: каждый кадр - 4 байта длины (big-endian) и JSON в UTF-8.
+Запрос - список вызовов [{"method": ..., "params": {...}}, ...],
+ответ - список результатов [{"result": ...} или {"error": ..., "type": ...}]
+в том же порядке, поэтому несколько вызовов передаются за один обмен.
+
+Запуск отдельного процесса ядра:
+    python agent_core.py --socket /tmp/log_agent_core.sock
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import struct
+import argparse
+import threading
+import functools
+import socketserver
+from agent_logger import AgentLogger
+from anomaly_detector import RateAnomalyDetector
+from config_service import get_config_service
+from correlation import CorrelationSink, load_rules
+from enrichment import load_enrichment
+from event_buffer import EventBuffer
+from event_store import EventStore, EventStoreSink
+from log_collector import LogCollector
+from metrics import REGISTRY
+from pipeline import (Pipeline, PipelineManager, EventBufferSource, LogCollectorSource,
+                      RabbitMQSink, AlertSink, field_filter)
+from rabbitmq_client import RabbitMQClient
+from rollups import EventRollups, RollupSink
+
+# Инициализация логгера
+logger = AgentLogger(log_dir='logs').get_logger('agent_core')
+
+# Переменная окружения с путем к сокету ядра для рабочих процессов веб-интерфейса
+SOCKET_ENV = 'AGENT_CORE_SOCKET'
+
+# Максимальный размер кадра протокола
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+_FRAME_HEADER = struct.Struct('>I')
+
+
+class AgentCoreError(Exception):
+    """Ошибка выполнения вызова в ядре агента или обмена с ним"""
+
+
+class AgentCore:
+    """Ядро агента: коллектор, отправитель, буфер событий и конвейеры"""
+
+    # Методы, доступные через IPC
+    IPC_METHODS = frozenset((
+        'get_status', 'connect_rabbitmq', 'disconnect_rabbitmq', 'publish_logs',
+        'start_collecting', 'stop_collecting', 'buffer_version', 'query_events',
+        'fetch_events', 'wait_events', 'start_streaming', 'stop_streaming',
+        'get_pipelines', 'render_metrics', 'query_store', 'query_stats', 'get_alerts'
+    ))
+
+    # Общий бюджет потоков всех конвейеров
+    PIPELINE_MAX_THREADS = 16
+
+    # Имя конвейера передачи в RabbitMQ по умолчанию
+    STREAMING_PIPELINE = 'rabbitmq'
+
+    # Имя конвейера записи в локальное хранилище
+    STORAGE_PIPELINE = 'storage'
+
+    # Имя конвейера обновления агрегатов событий
+    ROLLUPS_PIPELINE = 'rollups'
+
+    # Файл агрегатов ядра в каталоге агрегатов
+    ROLLUPS_FILE = 'agent.json'
+
+    # Имя конвейера обнаружения всплесков частоты событий
+    ANOMALIES_PIPELINE = 'anomalies'
+
+    # Имя конвейера корреляции событий по правилам
+    CORRELATION_PIPELINE = 'correlation'
+
+    # Минимальный интервал пересчета скорости отправки в секундах
+    STATUS_RATE_INTERVAL = 5.0
+
+    def __init__(self, config_path='config.yml'):
+        """
+        Инициализация ядра
+
+        Args:
+            config_path (str): Путь к файлу конфигурации
+        """
+        self.config_service = get_config_service(config_path)
+        self.rabbitmq_client = RabbitMQClient()
+        self.log_collector = LogCollector()
+        self.event_buffer = EventBuffer()
+        self.pipeline_manager = PipelineManager(max_threads=self.PIPELINE_MAX_THREADS)
+        self.publish_rate = {'time': time.monotonic(), 'published': 0, 'rate': 0.0}
+        self.rate_lock = threading.Lock()
+
+        # Обогащение выполняется до буфера, поэтому его результат видят все конвейеры
+        self.enricher = None
+        enrichment = self.config_service.config.enrichment
+        if enrichment.enabled:
+            try:
+                self.enricher = load_enrichment(enrichment.rules)
+            except (OSError, ValueError) as e:
+                logger.error(f"Не удалось загрузить правила обогащения {enrichment.rules}: {str(e)}")
+
+        self.event_store = None
+        storage = self.config_service.config.storage
+        if storage.enabled:
+            self._start_storage(storage)
+
+        self.rollups = None
+        rollups = self.config_service.config.rollups
+        if rollups.enabled:
+            self._start_rollups(rollups)
+
+        # Приемники тревог по именам конвейеров
+        self.alert_sinks = {}
+
+        self.anomaly_detector = None
+        anomalies = self.config_service.config.anomalies
+        if anomalies.enabled:
+            self._start_anomalies(anomalies)
+
+        self.correlation_engine = None
+        correlation = self.config_service.config.correlation
+        if correlation.enabled:
+            self._start_correlation(correlation)
+
+        self.config_service.subscribe(self._on_config_changed)
+        self.config_service.start_watching()
+
+    def _start_storage(self, storage):
+        """Открытие локального хранилища и запуск конвейера записи в него из буфера событий"""
+        try:
+            self.event_store = EventStore(storage.directory, retention_days=storage.retention_days,
+                                          max_size_mb=storage.max_size_mb, full_text=storage.full_text)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось открыть локальное хранилище событий {storage.directory}: {str(e)}")
+            return
+        self.event_store.start_maintenance()
+
+        # Записи на диск идут пачками, очередь сглаживает всплески сбора
+        pipeline = Pipeline(
+            self.STORAGE_PIPELINE,
+            source=EventBufferSource(self.event_buffer),
+            sink=EventStoreSink(self.event_store),
+            queue_size=10000,
+            batch_size=1000
+        )
+        self.pipeline_manager.add(pipeline)
+        self.pipeline_manager.start(self.STORAGE_PIPELINE)
+        logger.info(f"Локальное хранилище событий: {storage.directory}")
+
+    def _start_rollups(self, settings):
+        """Загрузка агрегатов событий и запуск конвейера их обновления из буфера событий"""
+        self.rollups = EventRollups(os.path.join(settings.directory, self.ROLLUPS_FILE))
+        self.rollups.load()
+        self.rollups.start_saving(settings.save_interval)
+
+        pipeline = Pipeline(
+            self.ROLLUPS_PIPELINE,
+            source=EventBufferSource(self.event_buffer),
+            sink=RollupSink(self.rollups),
+            queue_size=10000,
+            batch_size=1000
+        )
+        self.pipeline_manager.add(pipeline)
+        self.pipeline_manager.start(self.ROLLUPS_PIPELINE)
+
+    def _start_anomalies(self, settings):
+        """Запуск конвейера обнаружения всплесков, передающего тревоги в RabbitMQ"""
+        self.anomaly_detector = RateAnomalyDetector(
+            interval=settings.interval,
+            half_life=settings.half_life,
+            threshold=settings.threshold,
+            min_count=settings.min_count,
+            max_keys=settings.max_keys
+        )
+        alert_sink = AlertSink(self.rabbitmq_client, settings.routing_key)
+        self.alert_sinks[self.ANOMALIES_PIPELINE] = alert_sink
+
+        # Детектор хранит состояние ключей, поэтому конвейер обрабатывает события в одном потоке
+        pipeline = Pipeline(
+            self.ANOMALIES_PIPELINE,
+            source=EventBufferSource(self.event_buffer),
+            sink=alert_sink,
+            transforms=(self.anomaly_detector.detect,),
+            queue_size=10000,
+            batch_size=1000
+        )
+        self.pipeline_manager.add(pipeline)
+        self.pipeline_manager.start(self.ANOMALIES_PIPELINE)
+
+    def _start_correlation(self, settings):
+        """Загрузка правил корреляции и запуск конвейера их проверки из буфера событий"""
+        try:
+            self.correlation_engine = load_rules(settings.rules, max_groups=settings.max_groups)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось загрузить правила корреляции {settings.rules}: {str(e)}")
+            return
+        alert_sink = AlertSink(self.rabbitmq_client, settings.routing_key)
+        self.alert_sinks[self.CORRELATION_PIPELINE] = alert_sink
+
+        # Состояния правил общие для всех событий, поэтому обработчик один
+        pipeline = Pipeline(
+            self.CORRELATION_PIPELINE,
+            source=EventBufferSource(self.event_buffer),
+            sink=CorrelationSink(self.correlation_engine, alert_sink),
+            queue_size=10000,
+            batch_size=1000
+        )
+        self.pipeline_manager.add(pipeline)
+        self.pipeline_manager.start(self.CORRELATION_PIPELINE)
+        logger.info(f"Загружено правил корреляции: {len(self.correlation_engine.rules)}")
+
+    def _on_config_changed(self, old_config, new_config):
+        """Применение новой конфигурации к работающим компонентам без перезапуска"""
+        # Переподключаем отправителя, если изменились параметры RabbitMQ
+        if new_config.rabbitmq != old_config.rabbitmq and self.rabbitmq_client.is_connected:
+            logger.info("Параметры RabbitMQ изменены, выполняется переподключение")
+            self.rabbitmq_client.connect(**new_config.rabbitmq.connect_kwargs())
+
+        # Сроки хранения применяются при следующем обслуживании хранилища
+        if new_config.storage != old_config.storage and self.event_store is not None:
+            self.event_store.retention_days = new_config.storage.retention_days
+            self.event_store.max_size = new_config.storage.max_size_mb * 1024 * 1024
+
+        # Ключи маршрутизации тревог меняются без перезапуска конвейеров
+        if self.ANOMALIES_PIPELINE in self.alert_sinks:
+            self.alert_sinks[self.ANOMALIES_PIPELINE].routing_key = new_config.anomalies.routing_key
+        if self.CORRELATION_PIPELINE in self.alert_sinks:
+            self.alert_sinks[self.CORRELATION_PIPELINE].routing_key = new_config.correlation.routing_key
+
+        # Перезапускаем сбор, если изменились параметры журналов
+        if new_config.logs != old_config.logs and self.log_collector.is_collecting:
+            logger.info("Параметры сбора логов изменены, сбор перезапускается")
+            self.log_collector.stop_collecting()
+            self.log_collector.start_collecting(
+                log_types=list(new_config.logs.types),
+                hours_back=new_config.logs.hours_back,
+                callback=self._on_event_collected
+            )
+
+    def call_many(self, calls):
+        """
+        Выполнение нескольких вызовов (интерфейс совпадает с AgentCoreClient.call_many)
+
+        Args:
+            calls (list): Список пар (имя метода, словарь параметров)
+
+        Returns:
+            list: Результаты вызовов в том же порядке
+        """
+        return [getattr(self, method)(**params) for method, params in calls]
+
+    def dispatch(self, call):
+        """
+        Выполнение одного вызова, полученного через IPC
+
+        Args:
+            call (dict): Вызов {"method": ..., "params": {...}}
+
+        Returns:
+            dict: {"result": ...} или {"error": ..., "type": ...}
+        """
+        method = call.get('method') if isinstance(call, dict) else None
+        if method not in self.IPC_METHODS:
+            return {'error': f"Неизвестный метод: {method}", 'type': 'AgentCoreError'}
+
+        try:
+            return {'result': getattr(self, method)(**(call.get('params') or {}))}
+        except (ValueError, KeyError) as e:
+            message = e.args[0] if e.args else str(e)
+            return {'error': str(message), 'type': type(e).__name__}
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении вызова {method}: {str(e)}")
+            return {'error': str(e), 'type': 'AgentCoreError'}
+
+    def get_status(self):
+        """
+        Получение состояния ядра
+
+        Returns:
+            dict: Состояние подключения, счетчики отправителя, коллектора и обогащения
+        """
+        rabbitmq_stats = self.rabbitmq_client.get_stats()
+
+        # Скорость отправки считается по приращению счетчика между запросами статуса
+        with self.rate_lock:
+            now = time.monotonic()
+            elapsed = now - self.publish_rate['time']
+            if elapsed >= self.STATUS_RATE_INTERVAL:
+                self.publish_rate['rate'] = round(
+                    (rabbitmq_stats['published'] - self.publish_rate['published']) / elapsed, 1)
+                self.publish_rate['time'] = now
+                self.publish_rate['published'] = rabbitmq_stats['published']
+            rabbitmq_stats['publish_rate'] = self.publish_rate['rate']
+
+        return {
+            'rabbitmq_connected': self.rabbitmq_client.is_connected,
+            'rabbitmq': rabbitmq_stats,
+            'collector': {
+                'is_collecting': self.log_collector.is_collecting,
+                'collected': self.log_collector.collected_count,
+                'last_event': self.event_buffer.last_seq
+            },
+            'enrichment': self.enricher.get_stats() if self.enricher is not None else None
+        }
+
+    def connect_rabbitmq(self):
+        """
+        Подключение к RabbitMQ с параметрами из конфигурации
+
+        Returns:
+            bool: Успешность подключения
+        """
+        # Настройки могли быть только что сохранены рабочим процессом веб-интерфейса
+        self.config_service.reload()
+        return self.rabbitmq_client.connect(**self.config_service.config.rabbitmq.connect_kwargs())
+
+    def disconnect_rabbitmq(self):
+        """Отключение от RabbitMQ"""
+        self.rabbitmq_client.disconnect()
+
+    def publish_logs(self, logs):
+        """
+        Публикация пачки логов в RabbitMQ
+
+        Args:
+            logs (list): Список словарей с данными логов
+
+        Returns:
+            bool: Успешность добавления пачки в очередь отправки
+        """
+        return self.rabbitmq_client.publish_logs(logs)
+
+    def start_collecting(self, log_types=None, hours_back=None):
+        """
+        Запуск сбора логов в буфер событий
+
+        Args:
+            log_types (list, optional): Типы журналов (по умолчанию из конфигурации)
+            hours_back (int, optional): Количество часов назад (по умолчанию из конфигурации)
+
+        Returns:
+            dict: Признак запуска (False, если сбор уже идет), типы журналов и курсор буфера
+        """
+        # Значения по умолчанию берем из раздела logs конфигурации
+        logs_settings = self.config_service.config.logs
+        log_types = log_types or list(logs_settings.types)
+        hours_back = int(hours_back or logs_settings.hours_back)
+
+        if self.log_collector.is_collecting:
+            return {'started': False, 'log_types': log_types, 'cursor': self.event_buffer.last_seq}
+
+        self.log_collector.start_collecting(log_types=log_types, hours_back=hours_back,
+                                            callback=self._on_event_collected)
+        return {'started': True, 'log_types': log_types, 'cursor': self.event_buffer.last_seq}
+
+    def _on_event_collected(self, event):
+        """Обогащение собранного события и добавление его в буфер"""
+        if self.enricher is not None:
+            event = self.enricher.enrich(event)
+        self.event_buffer.append(event)
+
+    def stop_collecting(self):
+        """Остановка сбора логов"""
+        self.log_collector.stop_collecting()
+
+    def buffer_version(self):
+        """
+        Версия содержимого буфера событий для условных запросов
+
+        Returns:
+            str: Версия буфера
+        """
+        return self.event_buffer.version
+
+    def query_events(self, filters=None, text=None, sort='-time', offset=0, limit=100, after=0):
+        """
+        Постраничная выборка событий буфера (см. EventBuffer.query)
+
+        Returns:
+            dict: Общее количество, курсор и сериализованные события страницы
+        """
+        cursor = self.event_buffer.last_seq
+        total, entries = self.event_buffer.query(filters=filters, text=text, sort=sort,
+                                                 offset=offset, limit=limit, after=after)
+        return {'total': total, 'cursor': cursor, 'fragments': [fragment for _, _, fragment in entries]}
+
+    def fetch_events(self, after=0, limit=500, log_type=None):
+        """
+        Инкрементальное получение событий после курсора
+
+        Args:
+            after (int): Номер последнего полученного события
+            limit (int): Максимальное количество просматриваемых событий
+            log_type (str, optional): Тип журнала для фильтрации
+
+        Returns:
+            dict: Курсор, признак наличия следующей страницы, количество
+                  вытесненных из буфера событий и сериализованные события
+        """
+        # Курсор больше последнего номера означает, что ядро было перезапущено
+        if after > self.event_buffer.last_seq:
+            after = 0
+
+        # Берем на одно событие больше, чтобы определить наличие следующей страницы
+        entries = self.event_buffer.since(after, limit=limit + 1)
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        cursor = entries[-1][0] if entries else max(after, 0)
+        fragments = [fragment for _, event, fragment in entries
+                     if not log_type or event.get('log_type') == log_type]
+
+        # События, вытесненные из буфера до того, как клиент успел их получить
+        first_seq = self.event_buffer.first_seq
+        dropped = max(first_seq - after - 1, 0) if first_seq else 0
+
+        return {'cursor': cursor, 'has_more': has_more, 'dropped': dropped, 'fragments': fragments}
+
+    def wait_events(self, after=None, limit=500, timeout=15.0, log_type=None):
+        """
+        Получение событий после курсора с ожиданием (длинный опрос).
+        Используется потоковой передачей событий веб-интерфейса
+
+        Args:
+            after (int, optional): Номер последнего полученного события;
+                                   None - только события, появившиеся после вызова
+            limit (int): Максимальное количество событий
+            timeout (float): Время ожидания новых событий в секундах
+            log_type (str, optional): Тип журнала для фильтрации
+
+        Returns:
+            dict: Результат в формате fetch_events; если событий не появилось,
+                  курсор совпадает с переданным
+        """
+        if after is None:
+            after = self.event_buffer.last_seq
+
+        result = self.fetch_events(after=after, limit=limit, log_type=log_type)
+        if result['cursor'] != after:
+            return result
+
+        # Новых событий нет: ждем появления события и повторяем выборку.
+        # Подписка с номером курсора получит и события, добавленные после выборки
+        subscription = self.event_buffer.subscribe(after)
+        try:
+            subscription.get_batch(max_items=1, timeout=timeout)
+        finally:
+            subscription.close()
+        return self.fetch_events(after=after, limit=limit, log_type=log_type)
+
+    def start_streaming(self, name=None, log_type=None, source='buffer', replay=False,
+                        log_types=None, hours_back=None, workers=1, queue_size=1000, batch_size=100):
+        """
+        Создание (или возобновление) конвейера передачи событий в RabbitMQ
+
+        Args:
+            name (str, optional): Имя конвейера
+            log_type (str, optional): Тип журнала для фильтрации
+            source (str): Источник событий: 'buffer' (буфер событий) или 'collector'
+                          (собственный периодический сбор журналов)
+            replay (bool): Передать события, уже находящиеся в буфере
+            log_types (list, optional): Типы журналов для источника 'collector'
+            hours_back (int, optional): Глубина первого прохода сбора для источника 'collector'
+            workers (int): Количество потоков обработки
+            queue_size (int): Размер очереди конвейера
+            batch_size (int): Размер пачки, передаваемой в RabbitMQ
+
+        Returns:
+            dict: Признак успеха, сообщение и состояние конвейера
+
+        Raises:
+            ValueError: Если параметры конвейера некорректны
+        """
+        name = name or self.STREAMING_PIPELINE
+
+        if not self.rabbitmq_client.is_connected:
+            return {'success': False, 'message': 'Нет подключения к RabbitMQ'}
+
+        pipeline = self.pipeline_manager.get(name)
+        if pipeline is not None and pipeline.running:
+            return {'success': True, 'message': 'Передача логов в RabbitMQ уже выполняется',
+                    'pipeline': pipeline.get_stats()}
+
+        config = self.config_service.config
+        if source == 'buffer':
+            # Передача в RabbitMQ необязательна: медленный брокер не должен задерживать сбор
+            pipeline_source = EventBufferSource(self.event_buffer, replay=bool(replay), lossless=False)
+            # Возобновленная передача продолжается с последнего переданного события
+            if pipeline is not None and isinstance(pipeline.source, EventBufferSource):
+                pipeline_source.last_seq = pipeline.source.last_seq
+        elif source == 'collector':
+            pipeline_source = LogCollectorSource(
+                log_types=log_types or list(config.logs.types),
+                hours_back=int(hours_back or config.logs.hours_back),
+                interval=config.interval
+            )
+        else:
+            raise ValueError(f"Неизвестный источник: {source}")
+
+        filters = []
+        if log_type:
+            filters.append(field_filter('log_type', [LogCollector.LOG_TYPES.get(log_type, log_type)]))
+
+        # События из буфера уже обогащены при сборе, собственный сбор обогащается в конвейере
+        transforms = []
+        if source == 'collector' and self.enricher is not None:
+            transforms.append(self.enricher.enrich)
+
+        pipeline = Pipeline(
+            name,
+            source=pipeline_source,
+            sink=RabbitMQSink(self.rabbitmq_client),
+            filters=filters,
+            transforms=transforms,
+            workers=int(workers),
+            queue_size=int(queue_size),
+            batch_size=int(batch_size)
+        )
+        self.pipeline_manager.add(pipeline, replace=True)
+        self.pipeline_manager.start(name)
+
+        return {'success': True, 'message': 'Передача логов в RabbitMQ начата', 'pipeline': pipeline.get_stats()}
+
+    def stop_streaming(self, name=None):
+        """
+        Остановка конвейера передачи (останавливает и чтение источника)
+
+        Args:
+            name (str, optional): Имя конвейера
+
+        Returns:
+            dict: Состояние конвейера
+
+        Raises:
+            KeyError: Если конвейер не найден
+        """
+        name = name or self.STREAMING_PIPELINE
+        self.pipeline_manager.stop(name)
+        return self.pipeline_manager.get(name).get_stats()
+
+    def get_pipelines(self):
+        """
+        Получение состояния конвейеров
+
+        Returns:
+            dict: Бюджет потоков и состояние каждого конвейера
+        """
+        return self.pipeline_manager.get_stats()
+
+    def query_store(self, start=None, end=None, log_type=None, level=None, source=None, event_id=None,
+                    sort='-time', limit=100, cursor=None, text=None):
+        """
+        Выборка событий из локального хранилища за период (см. EventStore.query)
+
+        Returns:
+            dict: Сериализованные события страницы и курсор следующей страницы
+
+        Raises:
+            ValueError: Если хранилище отключено или параметры выборки некорректны
+        """
+        if self.event_store is None:
+            raise ValueError("Локальное хранилище событий отключено")
+        fragments, next_cursor = self.event_store.query(
+            start=start, end=end, log_type=log_type, level=level, source=source,
+            event_id=event_id, sort=sort, limit=limit, cursor=cursor, text=text
+        )
+        return {'fragments': fragments, 'cursor': next_cursor, 'store': self.event_store.get_stats()}
+
+    def query_stats(self, start=None, end=None, group_by=None, resolution=None, series=False, limit=100,
+                    **filters):
+        """
+        Количество событий за период по агрегатам (см. EventRollups.query)
+
+        Returns:
+            dict: Период, разрешение, общее количество, группы и ряд по интервалам
+
+        Raises:
+            ValueError: Если агрегаты отключены или параметры запроса некорректны
+        """
+        if self.rollups is None:
+            raise ValueError("Агрегаты событий отключены")
+        return self.rollups.query(start=start, end=end, group_by=group_by or (), resolution=resolution,
+                                  series=series, limit=limit, **filters)
+
+    def get_alerts(self, limit=100):
+        """
+        Получение последних тревог детектора всплесков и правил корреляции
+
+        Args:
+            limit (int): Максимальное количество тревог
+
+        Returns:
+            dict: Тревоги (новые первыми), состояние детектора и правил
+
+        Raises:
+            ValueError: Если обнаружение всплесков и корреляция отключены
+        """
+        if not self.alert_sinks:
+            raise ValueError("Обнаружение всплесков и корреляция событий отключены")
+        limit = int(limit)
+        alerts = [alert for sink in self.alert_sinks.values() for alert in sink.recent(limit)]
+        alerts.sort(key=lambda alert: alert['time'], reverse=True)
+        return {
+            'alerts': alerts[:limit],
+            'detector': self.anomaly_detector.get_stats() if self.anomaly_detector else None,
+            'correlation': self.correlation_engine.get_stats() if self.correlation_engine else None
+        }
+
+    def render_metrics(self):
+        """
+        Экспорт метрик процесса ядра
+
+        Returns:
+            str: Метрики в текстовом формате Prometheus
+        """
+        return REGISTRY.render()
+
+    def shutdown(self):
+        """Остановка всех компонентов ядра"""
+        self.pipeline_manager.stop_all()
+        if self.event_store is not None:
+            self.event_store.close()
+        if self.rollups is not None:
+            self.rollups.close()
+        self.log_collector.stop_collecting()
+        if self.rabbitmq_client.is_connected:
+            self.rabbitmq_client.disconnect()
+        self.config_service.stop_watching()
+
+
+def _recv_exact(sock, size):
+    """Чтение ровно size байт из сокета (None, если соединение закрыто)"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return bytes(buffer)
+
+
+def _read_frame(sock):
+    """Чтение кадра протокола (None, если соединение закрыто)"""
+    header = _recv_exact(sock, _FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = _FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise AgentCoreError(f"Слишком большой кадр: {size} байт")
+    data = _recv_exact(sock, size)
+    if data is None:
+        return None
+    return json.loads(data.decode('utf-8'))
+
+
+def _write_frame(sock, payload):
+    """Запись кадра протокола"""
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    sock.sendall(_FRAME_HEADER.pack(len(data)) + data)
+
+
+def _is_stale(sock):
+    """Проверка, что простаивающее соединение закрыто ядром и его нельзя использовать"""
+    # Сокет с таймаутом ждет данных даже с MSG_DONTWAIT, поэтому на время
+    # проверки он переводится в неблокирующий режим
+    timeout = sock.gettimeout()
+    sock.settimeout(0)
+    try:
+        sock.recv(1, socket.MSG_PEEK)
+    except BlockingIOError:
+        return False
+    except OSError:
+        return True
+    finally:
+        sock.settimeout(timeout)
+    # Конец потока или данные, которых клиент не ожидает
+    return True
+
+
+class _AgentCoreHandler(socketserver.BaseRequestHandler):
+    """Обработчик соединения рабочего процесса веб-интерфейса"""
+
+    def handle(self):
+        """Выполнение пачек вызовов до закрытия соединения"""
+        core = self.server.core
+        while True:
+            try:
+                calls = _read_frame(self.request)
+            except (OSError, ValueError, AgentCoreError) as e:
+                logger.error(f"Ошибка чтения запроса к ядру: {str(e)}")
+                return
+            if calls is None:
+                return
+            if not isinstance(calls, list):
+                calls = [calls]
+
+            try:
+                _write_frame(self.request, [core.dispatch(call) for call in calls])
+            except OSError:
+                return
+
+
+class AgentCoreServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Сервер ядра агента на Unix-сокете (по потоку на соединение)"""
+
+    daemon_threads = True
+
+    def __init__(self, core, socket_path):
+        """
+        Инициализация сервера
+
+        Args:
+            core (AgentCore): Ядро агента
+            socket_path (str): Путь к Unix-сокету
+        """
+        self.core = core
+        self.socket_path = socket_path
+
+        # Сокет, оставшийся от предыдущего запуска, мешает привязке
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        super().__init__(socket_path, _AgentCoreHandler)
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self):
+        """Закрытие сервера и удаление файла сокета"""
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class AgentCoreClient:
+    """
+    Клиент ядра агента для рабочих процессов веб-интерфейса.
+    Повторяет интерфейс AgentCore: вызов метода передается ядру через Unix-сокет.
+    Каждый поток использует собственное соединение
+    """
+
+    def __init__(self, socket_path, timeout=60.0, connect_timeout=10.0):
+        """
+        Инициализация клиента
+
+        Args:
+            socket_path (str): Путь к Unix-сокету ядра
+            timeout (float): Время ожидания ответа в секундах
+            connect_timeout (float): Время ожидания запуска ядра в секундах
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.local = threading.local()
+
+    def _connect(self):
+        """Подключение к ядру (ядро может еще запускаться, поэтому попытки повторяются)"""
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+                return sock
+            except OSError as e:
+                sock.close()
+                if time.monotonic() >= deadline:
+                    raise AgentCoreError(f"Ядро агента недоступно ({self.socket_path}): {str(e)}")
+                time.sleep(0.1)
+
+    def _close(self):
+        """Закрытие соединения текущего потока"""
+        sock = getattr(self.local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self.local.sock = None
+
+    def call_many(self, calls):
+        """
+        Выполнение нескольких вызовов за один обмен с ядром
+
+        Args:
+            calls (list): Список пар (имя метода, словарь параметров)
+
+        Returns:
+            list: Результаты вызовов в том же порядке
+
+        Raises:
+            ValueError, KeyError: Ошибки, возникшие в методах ядра
+            AgentCoreError: Ошибка обмена с ядром или выполнения вызова
+        """
+        request = [{'method': method, 'params': params} for method, params in calls]
+
+        # Соединение могло быть закрыто ядром (например, после перезапуска)
+        sock = getattr(self.local, 'sock', None)
+        if sock is not None and _is_stale(sock):
+            self._close()
+
+        for attempt in (1, 2):
+            sock = getattr(self.local, 'sock', None)
+            fresh = sock is None
+            if fresh:
+                sock = self.local.sock = self._connect()
+            try:
+                _write_frame(sock, request)
+                break
+            except OSError as e:
+                self._close()
+                # Запрос не передан целиком, поэтому ядро его не выполняло:
+                # повторяем один раз через новое соединение
+                if fresh or attempt == 2:
+                    raise AgentCoreError(f"Ошибка обмена с ядром агента: {str(e)}")
+
+        # После отправки запрос не повторяется: ядро могло уже выполнить вызовы
+        try:
+            response = _read_frame(sock)
+        except OSError as e:
+            self._close()
+            raise AgentCoreError(f"Ошибка обмена с ядром агента: {str(e)}")
+        if response is None:
+            self._close()
+            raise AgentCoreError("Ошибка обмена с ядром агента: ядро закрыло соединение")
+
+        results = []
+        for item in response:
+            if 'error' in item:
+                error_type = {'ValueError': ValueError, 'KeyError': KeyError}.get(item.get('type'), AgentCoreError)
+                raise error_type(item['error'])
+            results.append(item.get('result'))
+        return results
+
+    def call(self, method, **params):
+        """
+        Выполнение одного вызова
+
+        Args:
+            method (str): Имя метода ядра
+            **params: Параметры метода
+
+        Returns:
+            Результат метода
+        """
+        return self.call_many([(method, params)])[0]
+
+    def __getattr__(self, name):
+        if name in AgentCore.IPC_METHODS:
+            return functools.partial(self.call, name)
+        raise AttributeError(name)
+
+
+def main():
+    """Запуск ядра агента отдельным процессом"""
+    parser = argparse.ArgumentParser(description='Ядро агента сбора логов')
+    parser.add_argument('--socket', default=os.environ.get(SOCKET_ENV, '/tmp/log_agent_core.sock'),
+                        help='Путь к Unix-сокету')
+    parser.add_argument('--config', default='config.yml', help='Путь к файлу конфигурации')
+    args = parser.parse_args()
+
+    core = AgentCore(args.config)
+    server = AgentCoreServer(core, args.socket)
+
+    # SIGTERM от gunicorn или systemd завершает процесс штатно
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    logger.info(f"Ядро агента запущено, сокет: {args.socket}")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        core.shutdown()
+        logger.info("Ядро агента остановлено")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,7 @@ import logging
 import logging.handlers
 import datetime
 import time
+from collections import deque
 from singleton import Singleton
 
 class AgentLogger(metaclass=Singleton):
@@ -128,3 +129,159 @@ class AgentLogger(metaclass=Singleton):
             
         # Возвращаем записи в обратном порядке (новые сверху)
         return entries[::-1]
+        
+    def get_log_page(self, offset=0, limit=100, level=None, text=None):
+        """
+        Получение страницы записей журнала (новые записи первыми)
+        
+        Файл читается потоково, в памяти хранится не больше offset + limit строк
+        
+        Args:
+            offset (int): Количество пропускаемых самых новых записей
+            limit (int): Размер страницы
+            level (str, optional): Уровень логирования для фильтрации
+            text (str, optional): Подстрока для поиска без учета регистра
+            
+        Returns:
+            tuple: Общее количество подходящих записей и список записей страницы
+        """
+        tail = deque(maxlen=offset + limit)
+        total = 0
+        text = text.lower() if text else None
+        
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if level and f" - {level} - " not in line:
+                        continue
+                    if text and text not in line.lower():
+                        continue
+                        
+                    tail.append(line.strip())
+                    total += 1
+                    
+        except Exception as e:
+            print(f"Ошибка при чтении журнала: {str(e)}")
+            
+        # Последние строки файла - самые новые, отдаем их первыми
+        page = list(tail)[::-1][offset:offset + limit]
+        return total, page
+
+
+class LogFileTail:
+    """
+    Последовательное чтение строк, дописываемых в файл журнала
+    
+    Файл открывается только на время опроса: в Windows открытый файл нельзя
+    переименовать, и TimedRotatingFileHandler не смог бы выполнить ротацию
+    в полночь. Между опросами запоминаются позиция чтения и признаки файла
+    (номер файла, если система его сообщает, и первые байты содержимого),
+    поэтому при каждом опросе читаются только новые байты. Если файл по пути
+    заменен при ротации, непрочитанный остаток дочитывается из переименованного
+    файла, а чтение продолжается с начала нового. Усеченный файл читается
+    с начала.
+    """
+    
+    # Количество первых байт файла, по которым определяется его замена
+    HEAD_BYTES = 256
+    
+    def __init__(self, path, initial_bytes=256 * 1024):
+        """
+        Инициализация
+        
+        Args:
+            path (str): Путь к файлу журнала
+            initial_bytes (int): Сколько последних байт файла прочитать при первом опросе
+        """
+        self.path = path
+        self.initial_bytes = initial_bytes
+        self._offset = None
+        self._file_id = 0
+        self._head = b''
+        self._partial = b''
+        
+    def _split(self, data, final=False):
+        """Разделение прочитанных байт на полные строки"""
+        # Неполная последняя строка дочитывается при следующем опросе
+        parts = (self._partial + data).split(b'\n')
+        self._partial = parts.pop()
+        if final and self._partial:
+            parts.append(self._partial)
+            self._partial = b''
+        return [part.rstrip(b'\r').decode('utf-8', errors='replace') for part in parts]
+        
+    def _is_same_file(self, stat, head):
+        """Проверка, что по пути находится тот же файл, что и при прошлом опросе"""
+        if self._file_id and stat.st_ino and stat.st_ino != self._file_id:
+            return False
+        return head[:len(self._head)] == self._head
+        
+    def _read_rotated(self):
+        """Дочитывание остатка файла, переименованного при ротации"""
+        directory = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        try:
+            names = [name for name in os.listdir(directory) if name.startswith(prefix)]
+        except OSError:
+            return []
+            
+        # Ротированный файл ищется среди самых новых по первым байтам
+        paths = sorted((os.path.join(directory, name) for name in names), key=os.path.getmtime, reverse=True)
+        for path in paths[:3]:
+            try:
+                with open(path, 'rb') as f:
+                    if f.read(self.HEAD_BYTES)[:len(self._head)] != self._head:
+                        continue
+                    f.seek(self._offset)
+                    return self._split(f.read(), final=True)
+            except OSError:
+                continue
+        return []
+        
+    def read_lines(self):
+        """
+        Получение новых строк журнала
+        
+        Returns:
+            list: Строки в порядке записи (без символов перевода строки)
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return []
+            
+        lines = []
+        with f:
+            stat = os.fstat(f.fileno())
+            head = f.read(self.HEAD_BYTES)
+            
+            if self._offset is None:
+                # При первом опросе читаем только конец файла, пропуская неполную первую строку
+                self._offset = 0
+                if stat.st_size > self.initial_bytes:
+                    f.seek(stat.st_size - self.initial_bytes)
+                    f.readline()
+                    self._offset = f.tell()
+            elif not self._is_same_file(stat, head):
+                lines.extend(self._read_rotated())
+                self._offset = 0
+                self._partial = b''
+            elif stat.st_size < self._offset:
+                # Файл усечен
+                self._offset = 0
+                self._partial = b''
+                
+            self._file_id = stat.st_ino
+            self._head = head
+            
+            f.seek(self._offset)
+            data = f.read()
+            self._offset += len(data)
+            lines.extend(self._split(data))
+            
+        return lines
+        
+    def close(self):
+        """Сброс позиции чтения (файл между опросами не удерживается открытым)"""
+        self._offset = None
+        self._partial = b''
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Обнаружение всплесков частоты событий.
+
+Для каждого ключа (журнал, источник, идентификатор события) хранится
+экспоненциально взвешенное среднее и дисперсия количества событий за
+интервал. Если количество событий ключа в текущем интервале превышает
+среднее на заданное число стандартных отклонений, формируется событие
+тревоги. Тревога поднимается сразу при пересечении порога, не дожидаясь
+конца интервала, поэтому всплески (неудачные входы, циклические падения
+служб) видны по мере сбора.
+
+Состояние ключей хранится в таблице фиксированного размера с вытеснением
+давно не встречавшихся ключей, поэтому память ограничена при любом
+количестве источников, а обработка события стоит O(1).
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+from agent_logger import AgentLogger
+from metrics import REGISTRY
+from rollups import format_time, now_seconds, parse_time
+from utils import get_event_field
+
+logger = AgentLogger().get_logger('anomaly_detector')
+
+# Метрики обнаружения всплесков
+ANOMALY_ALERTS = REGISTRY.counter('anomaly_alerts', 'Количество тревог о всплесках частоты событий')
+ANOMALY_EVICTED = REGISTRY.counter('anomaly_evicted_keys', 'Количество ключей, вытесненных из таблицы состояний')
+
+# Длина интервала подсчета событий (секунд)
+INTERVAL = 10
+
+# Период полураспада веса прошлых интервалов (секунд)
+HALF_LIFE = 300
+
+# Порог тревоги в стандартных отклонениях
+THRESHOLD = 4.0
+
+# Минимальное количество событий ключа за интервал для тревоги
+MIN_COUNT = 20
+
+# Максимальное количество ключей в таблице состояний
+MAX_KEYS = 10000
+
+# Количество интервалов наблюдения ключа до первой тревоги
+WARMUP_INTERVALS = 6
+
+
+class _KeyState:
+    """Состояние ключа: текущий интервал и взвешенная статистика прошлых"""
+
+    __slots__ = ('interval', 'count', 'mean', 'variance', 'samples', 'trigger', 'alerted')
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.samples = 0
+        self.trigger = math.inf
+        self.alerted = False
+
+
+class RateAnomalyDetector:
+    """
+    Детектор всплесков частоты событий по ключам.
+
+    Используется как преобразование конвейера: для обычного события
+    возвращает None, для события, на котором частота ключа пересекла
+    порог, - событие тревоги. Тревога по ключу поднимается не чаще одного
+    раза за интервал. Новый ключ сначала наблюдается WARMUP_INTERVALS
+    интервалов, поэтому всплеск ключа, ранее не встречавшегося, не
+    отличается от его обычной частоты.
+    """
+
+    def __init__(self, interval=INTERVAL, half_life=HALF_LIFE, threshold=THRESHOLD,
+                 min_count=MIN_COUNT, max_keys=MAX_KEYS):
+        """
+        Инициализация детектора
+
+        Args:
+            interval (int): Длина интервала подсчета событий в секундах
+            half_life (int): Период полураспада веса прошлых интервалов в секундах
+            threshold (float): Порог тревоги в стандартных отклонениях
+            min_count (int): Минимальное количество событий за интервал для тревоги
+            max_keys (int): Максимальное количество ключей в таблице состояний
+
+        Raises:
+            ValueError: Если параметры некорректны
+        """
+        if interval < 1 or half_life < 1:
+            raise ValueError("Интервал и период полураспада должны быть положительными")
+        if threshold <= 0 or min_count < 1 or max_keys < 1:
+            raise ValueError("Порог, минимальное количество и размер таблицы должны быть положительными")
+
+        self.interval = int(interval)
+        self.threshold = float(threshold)
+        self.min_count = int(min_count)
+        self.max_keys = int(max_keys)
+        # Доля нового интервала в среднем, при которой вес интервала убывает вдвое за half_life
+        self.decay = 0.5 ** (self.interval / half_life)
+        self.alpha = 1.0 - self.decay
+        self.states = OrderedDict()
+        self.lock = threading.Lock()
+        self.evicted = 0
+        self.alerts = 0
+
+    def detect(self, event):
+        """
+        Учет события и проверка частоты его ключа
+
+        Args:
+            event (dict): Данные события
+
+        Returns:
+            dict: Событие тревоги или None
+        """
+        seconds = parse_time(str(get_event_field(event, 'time'))) or now_seconds()
+        interval = seconds // self.interval
+        key = (
+            str(get_event_field(event, 'journal')),
+            str(get_event_field(event, 'source')),
+            str(get_event_field(event, 'id')),
+        )
+
+        with self.lock:
+            state = self.states.get(key)
+            if state is None:
+                state = _KeyState(interval)
+                self.states[key] = state
+                if len(self.states) > self.max_keys:
+                    self.states.popitem(last=False)
+                    self.evicted += 1
+                    ANOMALY_EVICTED.inc()
+            else:
+                self.states.move_to_end(key)
+                # События из прошлых интервалов (пришедшие с опозданием) учитываются в текущем
+                if interval > state.interval:
+                    self._close_interval(state, interval)
+
+            state.count += 1
+            if state.count < state.trigger or state.alerted:
+                return None
+            state.alerted = True
+            self.alerts += 1
+            alert = self._make_alert(key, state, seconds)
+
+        ANOMALY_ALERTS.inc()
+        logger.warning(alert['message'])
+        return alert
+
+    def _close_interval(self, state, interval):
+        """Учет завершенного интервала ключа в статистике и переход к новому"""
+        self._observe(state, state.count)
+
+        # Пропущенные интервалы без событий учитываются одной формулой:
+        # после k нулевых наблюдений среднее умножается на d^k, а дисперсия
+        # становится d^k * (дисперсия + среднее^2 * (1 - d^k))
+        empty = interval - state.interval - 1
+        if empty > 0:
+            factor = self.decay ** empty
+            state.variance = factor * (state.variance + state.mean * state.mean * (1.0 - factor))
+            state.mean *= factor
+            state.samples += empty
+
+        state.interval = interval
+        state.count = 0
+        state.alerted = False
+        if state.samples >= WARMUP_INTERVALS:
+            # Отклонение не меньше одного события, чтобы редкий ключ не поднимал тревогу от шума
+            deviation = max(math.sqrt(state.variance), 1.0)
+            state.trigger = max(self.min_count, math.ceil(state.mean + self.threshold * deviation))
+
+    def _observe(self, state, count):
+        """Обновление взвешенного среднего и дисперсии количеством событий за интервал"""
+        difference = count - state.mean
+        state.mean += self.alpha * difference
+        state.variance = self.decay * (state.variance + self.alpha * difference * difference)
+        state.samples += 1
+
+    def _make_alert(self, key, state, seconds):
+        """Событие тревоги о всплеске частоты ключа"""
+        log_type, source, event_id = key
+        deviation = max(math.sqrt(state.variance), 1.0)
+        rate = state.count / self.interval
+        expected = state.mean / self.interval
+        return {
+            'alert': 'rate_anomaly',
+            'time': format_time(seconds),
+            'log_type': log_type,
+            'source': source,
+            'event_id': event_id,
+            'count': state.count,
+            'interval': self.interval,
+            'rate': round(rate, 3),
+            'expected_rate': round(expected, 3),
+            'score': round((state.count - state.mean) / deviation, 2),
+            'message': (f"Всплеск событий {source} (ID {event_id}, журнал {log_type}): "
+                        f"{rate:.1f} в секунду при обычных {expected:.2f}")
+        }
+
+    def get_stats(self):
+        """
+        Получение состояния детектора
+
+        Returns:
+            dict: Параметры, количество ключей и счетчики
+        """
+        with self.lock:
+            keys = len(self.states)
+        return {
+            'interval': self.interval,
+            'threshold': self.threshold,
+            'min_count': self.min_count,
+            'max_keys': self.max_keys,
+            'keys': keys,
+            'evicted': self.evicted,
+            'alerts': self.alerts
+        }
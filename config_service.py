@@ -0,0 +1,728 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль единой конфигурации агента.
+Загружает config.yml или config.ini один раз, проверяет значения и хранит их
+в неизменяемом объекте. Файл перечитывается только при изменении его
+времени модификации или размера, либо после явного сохранения.
+"""
+
+import os
+import copy
+import threading
+import configparser
+from dataclasses import dataclass, asdict
+import yaml
+from agent_logger import AgentLogger
+
+try:
+    from ruamel.yaml import YAML
+except ImportError:
+    # Без ruamel.yaml config.yml сохраняется без комментариев
+    YAML = None
+
+logger = AgentLogger().get_logger('config_service')
+
+# Значения по умолчанию для всех параметров агента
+DEFAULT_CONFIG = {
+    'rabbitmq': {
+        'host': '192.168.239.181',
+        'port': 5672,
+        'vhost': '/win_logs',
+        'username': 'win_agent',
+        'password': '12345678',
+        'exchange': 'windows_logs',
+        'routing_key': 'system.logs',
+        'use_ssl': False,
+        'ssl_cert': '',
+        'ssl_key': '',
+        'ca_cert': '',
+        'autoconnect': False
+    },
+    'interval': 5,
+    'logging': {
+        'level': 'INFO',
+        'file': 'agent.log',
+        'directory': 'logs'
+    },
+    'logs': {
+        'types': ['Система', 'Приложение', 'Безопасность'],
+        'hours_back': 1,
+        'level_filter': 0,
+        'send_to_rabbitmq': False
+    },
+    'storage': {
+        'enabled': True,
+        'directory': 'data/events',
+        'retention_days': 30,
+        'max_size_mb': 2048,
+        'full_text': True
+    },
+    'rollups': {
+        'enabled': True,
+        'directory': 'data/rollups',
+        'save_interval': 60
+    },
+    'anomalies': {
+        'enabled': True,
+        'routing_key': 'system.alerts',
+        'interval': 10,
+        'half_life': 300,
+        'threshold': 4.0,
+        'min_count': 20,
+        'max_keys': 10000
+    },
+    'correlation': {
+        'enabled': True,
+        'rules': 'rules.yml',
+        'routing_key': 'system.alerts',
+        'max_groups': 10000
+    },
+    'enrichment': {
+        'enabled': True,
+        'rules': 'enrichment.yml'
+    }
+}
+
+# Для config.ini сохраняются прежние значения по умолчанию настольного
+# приложения (см. utils.create_default_config). Хранилище событий настольного
+# приложения по умолчанию находится в отдельном каталоге: ядро веб-интерфейса
+# (config.yml) и настольное приложение на одной машине не должны писать
+# сегменты и удалять устаревшие файлы в одном каталоге (агрегаты разделены
+# так же, файлами gui.json и agent.json)
+INI_DEFAULT_CONFIG = {
+    'rabbitmq': {
+        'host': 'localhost',
+        'vhost': '/',
+        'username': 'guest',
+        'password': 'guest'
+    },
+    'storage': {
+        'directory': 'data/events_gui'
+    }
+}
+
+# Соответствие разделов конфигурации разделам файла config.ini
+INI_SECTIONS = {
+    'rabbitmq': 'RabbitMQ',
+    'logging': 'Logging',
+    'logs': 'Logs',
+    'storage': 'Storage',
+    'rollups': 'Rollups',
+    'anomalies': 'Anomalies',
+    'correlation': 'Correlation',
+    'enrichment': 'Enrichment'
+}
+
+# Соответствие флагов раздела [Logs] файла config.ini названиям журналов
+INI_LOG_TYPES = {
+    'system': 'Система',
+    'application': 'Приложение',
+    'security': 'Безопасность',
+    'setup': 'Настройка',
+    'dns': 'Перенаправление DNS-сервера',
+    'active_directory': 'Active Directory'
+}
+
+LOGGING_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+def _to_bool(value):
+    """Преобразование значения конфигурации в логический тип"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.strip().lower() in ('1', 'yes', 'true', 'on'):
+            return True
+        if value.strip().lower() in ('0', 'no', 'false', 'off', ''):
+            return False
+        raise ValueError(f"Некорректное логическое значение: {value}")
+    return bool(value)
+
+
+def _to_int(value, name, minimum=None, maximum=None):
+    """Преобразование значения конфигурации в целое число с проверкой диапазона"""
+    try:
+        result = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Параметр {name} должен быть целым числом: {value}")
+    if (minimum is not None and result < minimum) or (maximum is not None and result > maximum):
+        raise ValueError(f"Параметр {name} вне допустимого диапазона: {result}")
+    return result
+
+
+def _to_float(value, name, minimum=None):
+    """Преобразование значения конфигурации в число с плавающей точкой с проверкой минимума"""
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Параметр {name} должен быть числом: {value}")
+    if minimum is not None and result < minimum:
+        raise ValueError(f"Параметр {name} вне допустимого диапазона: {result}")
+    return result
+
+
+def _merge(base, updates):
+    """Рекурсивное объединение словарей конфигурации"""
+    result = copy.deepcopy(base)
+    for key, value in (updates or {}).items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = _merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def _changed_values(old, new):
+    """
+    Параметры, значения которых отличаются в двух словарях конфигурации
+
+    Args:
+        old (dict): Прежний словарь конфигурации
+        new (dict): Новый словарь конфигурации
+
+    Returns:
+        list: Пары (путь к параметру в виде кортежа ключей, новое значение)
+    """
+    changes = []
+    for key, value in new.items():
+        if isinstance(value, dict):
+            previous = old.get(key) if isinstance(old.get(key), dict) else {}
+            changes.extend(((key,) + path, item) for path, item in _changed_values(previous, value))
+        elif old.get(key, object()) != value:
+            changes.append(((key,), value))
+    return changes
+
+
+def _set_path(document, path, value):
+    """Установка значения по пути в словаре с созданием промежуточных разделов"""
+    for key in path[:-1]:
+        if not isinstance(document.get(key), dict):
+            document[key] = {}
+        document = document[key]
+    document[path[-1]] = value
+
+
+@dataclass(frozen=True)
+class RabbitMQSettings:
+    """Параметры подключения к RabbitMQ"""
+    host: str
+    port: int
+    vhost: str
+    username: str
+    password: str
+    exchange: str
+    routing_key: str
+    use_ssl: bool
+    ssl_cert: str
+    ssl_key: str
+    ca_cert: str
+    autoconnect: bool
+
+    def connect_kwargs(self):
+        """
+        Параметры для RabbitMQClient.connect
+
+        Returns:
+            dict: Именованные аргументы подключения
+        """
+        return {
+            'host': self.host,
+            'port': self.port,
+            'virtual_host': self.vhost,
+            'username': self.username,
+            'password': self.password,
+            'exchange': self.exchange,
+            'routing_key': self.routing_key
+        }
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    """Параметры журналирования агента"""
+    level: str
+    file: str
+    directory: str
+
+
+@dataclass(frozen=True)
+class LogsSettings:
+    """Параметры сбора логов Windows"""
+    types: tuple
+    hours_back: int
+    level_filter: int
+    send_to_rabbitmq: bool
+
+
+@dataclass(frozen=True)
+class StorageSettings:
+    """Параметры локального хранилища событий"""
+    enabled: bool
+    directory: str
+    retention_days: int
+    max_size_mb: int
+    full_text: bool
+
+
+@dataclass(frozen=True)
+class RollupsSettings:
+    """Параметры агрегатов событий по интервалам времени"""
+    enabled: bool
+    directory: str
+    save_interval: int
+
+
+@dataclass(frozen=True)
+class AnomaliesSettings:
+    """Параметры обнаружения всплесков частоты событий"""
+    enabled: bool
+    routing_key: str
+    interval: int
+    half_life: int
+    threshold: float
+    min_count: int
+    max_keys: int
+
+
+@dataclass(frozen=True)
+class CorrelationSettings:
+    """Параметры корреляции событий по правилам"""
+    enabled: bool
+    rules: str
+    routing_key: str
+    max_groups: int
+
+
+@dataclass(frozen=True)
+class EnrichmentSettings:
+    """Параметры обогащения событий тегами и извлеченными полями"""
+    enabled: bool
+    rules: str
+
+
+@dataclass(frozen=True)
+class AgentConfig:
+    """Проверенная неизменяемая конфигурация агента"""
+    rabbitmq: RabbitMQSettings
+    logging: LoggingSettings
+    logs: LogsSettings
+    storage: StorageSettings
+    rollups: RollupsSettings
+    anomalies: AnomaliesSettings
+    correlation: CorrelationSettings
+    enrichment: EnrichmentSettings
+    interval: int
+
+    @classmethod
+    def from_dict(cls, data, defaults=DEFAULT_CONFIG):
+        """
+        Создание конфигурации из словаря с проверкой значений
+
+        Args:
+            data (dict): Словарь конфигурации (недостающие значения берутся по умолчанию)
+            defaults (dict): Значения по умолчанию
+
+        Returns:
+            AgentConfig: Конфигурация агента
+
+        Raises:
+            ValueError: Если значения конфигурации некорректны
+        """
+        if data is not None and not isinstance(data, dict):
+            raise ValueError("Конфигурация должна быть словарем")
+
+        merged = _merge(defaults, data)
+        for section in ('rabbitmq', 'logging', 'logs', 'storage', 'rollups', 'anomalies', 'correlation',
+                        'enrichment'):
+            if not isinstance(merged[section], dict):
+                raise ValueError(f"Раздел {section} должен быть словарем")
+
+        rmq = merged['rabbitmq']
+        rabbitmq = RabbitMQSettings(
+            host=str(rmq['host']),
+            port=_to_int(rmq['port'], 'rabbitmq.port', 1, 65535),
+            vhost=str(rmq['vhost']),
+            username=str(rmq['username']),
+            password=str(rmq['password']),
+            exchange=str(rmq['exchange']),
+            routing_key=str(rmq['routing_key']),
+            use_ssl=_to_bool(rmq['use_ssl']),
+            ssl_cert=str(rmq['ssl_cert'] or ''),
+            ssl_key=str(rmq['ssl_key'] or ''),
+            ca_cert=str(rmq['ca_cert'] or ''),
+            autoconnect=_to_bool(rmq['autoconnect'])
+        )
+        if not rabbitmq.host:
+            raise ValueError("Не указан хост RabbitMQ")
+
+        level = str(merged['logging']['level']).upper()
+        if level not in LOGGING_LEVELS:
+            raise ValueError(f"Неизвестный уровень логирования: {level}")
+        logging_settings = LoggingSettings(
+            level=level,
+            file=str(merged['logging']['file']),
+            directory=str(merged['logging']['directory'])
+        )
+
+        types = merged['logs']['types']
+        if isinstance(types, str):
+            types = [types]
+        if not isinstance(types, (list, tuple)):
+            raise ValueError("Параметр logs.types должен быть списком")
+        logs = LogsSettings(
+            types=tuple(str(log_type) for log_type in types),
+            hours_back=_to_int(merged['logs']['hours_back'], 'logs.hours_back', 1),
+            level_filter=_to_int(merged['logs']['level_filter'], 'logs.level_filter', 0, 5),
+            send_to_rabbitmq=_to_bool(merged['logs']['send_to_rabbitmq'])
+        )
+
+        storage = merged['storage']
+        storage_settings = StorageSettings(
+            enabled=_to_bool(storage['enabled']),
+            directory=str(storage['directory']),
+            retention_days=_to_int(storage['retention_days'], 'storage.retention_days', 1),
+            max_size_mb=_to_int(storage['max_size_mb'], 'storage.max_size_mb', 1),
+            full_text=_to_bool(storage['full_text'])
+        )
+
+        rollups = merged['rollups']
+        rollups_settings = RollupsSettings(
+            enabled=_to_bool(rollups['enabled']),
+            directory=str(rollups['directory']),
+            save_interval=_to_int(rollups['save_interval'], 'rollups.save_interval', 1)
+        )
+
+        anomalies = merged['anomalies']
+        anomalies_settings = AnomaliesSettings(
+            enabled=_to_bool(anomalies['enabled']),
+            routing_key=str(anomalies['routing_key']),
+            interval=_to_int(anomalies['interval'], 'anomalies.interval', 1),
+            half_life=_to_int(anomalies['half_life'], 'anomalies.half_life', 1),
+            threshold=_to_float(anomalies['threshold'], 'anomalies.threshold', 0.1),
+            min_count=_to_int(anomalies['min_count'], 'anomalies.min_count', 1),
+            max_keys=_to_int(anomalies['max_keys'], 'anomalies.max_keys', 1)
+        )
+        if not anomalies_settings.routing_key:
+            raise ValueError("Не указан ключ маршрутизации тревог")
+
+        correlation = merged['correlation']
+        correlation_settings = CorrelationSettings(
+            enabled=_to_bool(correlation['enabled']),
+            rules=str(correlation['rules']),
+            routing_key=str(correlation['routing_key']),
+            max_groups=_to_int(correlation['max_groups'], 'correlation.max_groups', 1)
+        )
+        if not correlation_settings.routing_key:
+            raise ValueError("Не указан ключ маршрутизации тревог корреляции")
+
+        enrichment = merged['enrichment']
+        enrichment_settings = EnrichmentSettings(
+            enabled=_to_bool(enrichment['enabled']),
+            rules=str(enrichment['rules'])
+        )
+
+        return cls(
+            rabbitmq=rabbitmq,
+            logging=logging_settings,
+            logs=logs,
+            storage=storage_settings,
+            rollups=rollups_settings,
+            anomalies=anomalies_settings,
+            correlation=correlation_settings,
+            enrichment=enrichment_settings,
+            interval=_to_int(merged['interval'], 'interval', 1)
+        )
+
+    def to_dict(self):
+        """
+        Преобразование конфигурации в словарь
+
+        Returns:
+            dict: Словарь конфигурации
+        """
+        data = asdict(self)
+        data['logs']['types'] = list(self.logs.types)
+        return data
+
+
+class ConfigService:
+    """
+    Сервис конфигурации агента.
+    Обработчики запросов читают готовый объект ``config`` без обращения к диску,
+    фоновый поток проверяет изменение файла, а подписчики получают уведомление
+    о каждой новой версии конфигурации.
+    """
+
+    def __init__(self, path, watch_interval=2.0):
+        """
+        Инициализация сервиса конфигурации
+
+        Args:
+            path (str): Путь к файлу config.yml или config.ini
+            watch_interval (float): Интервал проверки изменения файла в секундах
+        """
+        self.path = path
+        self.watch_interval = watch_interval
+        self.is_ini = path.lower().endswith('.ini')
+        self.defaults = _merge(DEFAULT_CONFIG, INI_DEFAULT_CONFIG) if self.is_ini else DEFAULT_CONFIG
+        self.config = AgentConfig.from_dict(None, self.defaults)
+        self.subscribers = []
+        self.file_stamp = None
+        self.lock = threading.RLock()
+        # Подписчики уведомляются вне self.lock под отдельной блокировкой,
+        # чтобы медленный обработчик не задерживал чтение и сохранение
+        self.notify_lock = threading.RLock()
+        self.notified_config = self.config
+        self.watch_thread = None
+        self.stop_event = threading.Event()
+
+        self.reload()
+
+    def subscribe(self, callback):
+        """
+        Подписка на изменение конфигурации
+
+        Args:
+            callback (function): Функция callback(old_config, new_config)
+        """
+        with self.lock:
+            self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Отмена подписки на изменение конфигурации
+
+        Args:
+            callback (function): Ранее зарегистрированная функция
+        """
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def _get_file_stamp(self):
+        """Время модификации и размер файла конфигурации (None, если файла нет)"""
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def reload(self, force=False):
+        """
+        Перечитывание файла конфигурации, если он изменился
+
+        Args:
+            force (bool): Перечитать файл независимо от времени модификации
+
+        Returns:
+            bool: True, если конфигурация была обновлена
+        """
+        with self.lock:
+            stamp = self._get_file_stamp()
+            if stamp == self.file_stamp and not force:
+                return False
+            self.file_stamp = stamp
+
+            try:
+                data = self._read_file() if stamp is not None else None
+                new_config = AgentConfig.from_dict(data, self.defaults)
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке конфигурации {self.path}: {str(e)}")
+                return False
+
+            changed = self._apply(new_config)
+
+        if changed:
+            self._notify()
+        return changed
+
+    def save(self, updates):
+        """
+        Сохранение изменений конфигурации в файл
+
+        В файле заменяются только изменившиеся параметры; неизвестные агенту
+        параметры и разделы остаются без изменений. Комментарии config.yml
+        сохраняются, если установлен модуль ruamel.yaml.
+
+        Args:
+            updates (dict): Изменяемые параметры (вложенный словарь по разделам)
+
+        Returns:
+            AgentConfig: Новая конфигурация
+
+        Raises:
+            ValueError: Если новые значения некорректны
+            OSError: Если файл не удалось записать
+        """
+        with self.lock:
+            new_config = AgentConfig.from_dict(_merge(self.config.to_dict(), updates), self.defaults)
+            # Если файла еще нет, в него записываются все параметры
+            current = self.config.to_dict() if self._get_file_stamp() is not None else {}
+            changes = _changed_values(current, new_config.to_dict())
+            if changes:
+                self._write_file(changes)
+            self.file_stamp = self._get_file_stamp()
+            changed = self._apply(new_config)
+
+        if changed:
+            self._notify()
+        return new_config
+
+    def _apply(self, new_config):
+        """Замена текущей конфигурации (вызывается под блокировкой)"""
+        if new_config == self.config:
+            return False
+
+        self.config = new_config
+        logger.info(f"Конфигурация загружена из {self.path}")
+        return True
+
+    def _notify(self):
+        """
+        Уведомление подписчиков о новой конфигурации (вызывается без self.lock).
+        Подписчики получают изменения по порядку: если конфигурация менялась
+        несколько раз, пока выполнялся обработчик, они получают одно
+        уведомление от последней переданной версии к текущей
+        """
+        with self.notify_lock:
+            with self.lock:
+                old_config, new_config = self.notified_config, self.config
+                subscribers = list(self.subscribers)
+            if new_config == old_config:
+                return
+            self.notified_config = new_config
+
+            for callback in subscribers:
+                try:
+                    callback(old_config, new_config)
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике изменения конфигурации: {str(e)}")
+
+    def _read_file(self):
+        """Чтение файла конфигурации в словарь"""
+        if not self.is_ini:
+            with open(self.path, 'r', encoding='utf-8') as config_file:
+                return yaml.safe_load(config_file) or {}
+
+        parser = configparser.ConfigParser()
+        parser.read(self.path, encoding='utf-8')
+
+        data = {}
+        for name, section_name in INI_SECTIONS.items():
+            if not parser.has_section(section_name):
+                continue
+            section = parser[section_name]
+            if name != 'logs':
+                data[name] = dict(section)
+                continue
+            logs = {key: section[key] for key in ('hours_back', 'level_filter', 'send_to_rabbitmq')
+                    if key in section}
+            # В config.ini журналы задаются отдельными флагами
+            if any(key in section for key in INI_LOG_TYPES):
+                logs['types'] = [name for key, name in INI_LOG_TYPES.items()
+                                 if section.getboolean(key, fallback=False)]
+            data['logs'] = logs
+        return data
+
+    def _write_file(self, changes):
+        """
+        Запись изменившихся параметров в файл конфигурации
+
+        Args:
+            changes (list): Пары (путь к параметру, новое значение)
+        """
+        if self.is_ini:
+            self._write_ini(changes)
+        else:
+            self._write_yaml(changes)
+
+    def _write_yaml(self, changes):
+        """Замена изменившихся параметров в config.yml"""
+        # ruamel.yaml читает и записывает документ с комментариями и порядком ключей
+        parser = YAML() if YAML is not None else None
+        if parser is not None:
+            parser.preserve_quotes = True
+
+        document = None
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as config_file:
+                document = parser.load(config_file) if parser is not None else yaml.safe_load(config_file)
+        if document is None:
+            document = {}
+        if not isinstance(document, dict):
+            raise ValueError(f"Файл {self.path} не содержит словарь конфигурации")
+
+        for path, value in changes:
+            _set_path(document, path, value)
+
+        with open(self.path, 'w', encoding='utf-8') as config_file:
+            if parser is not None:
+                parser.dump(document, config_file)
+            else:
+                yaml.safe_dump(document, config_file, default_flow_style=False, allow_unicode=True,
+                               sort_keys=False)
+
+    def _write_ini(self, changes):
+        """Замена изменившихся параметров в config.ini с сохранением остальных ключей и разделов"""
+        parser = configparser.ConfigParser()
+        parser.read(self.path, encoding='utf-8')
+
+        for path, value in changes:
+            # Параметры верхнего уровня (interval) в config.ini не хранятся
+            if len(path) != 2 or path[0] not in INI_SECTIONS:
+                continue
+            section_name = INI_SECTIONS[path[0]]
+            if not parser.has_section(section_name):
+                parser.add_section(section_name)
+            if path == ('logs', 'types'):
+                for key, name in INI_LOG_TYPES.items():
+                    parser.set(section_name, key, str(name in value))
+            else:
+                parser.set(section_name, path[1], str(value))
+
+        with open(self.path, 'w', encoding='utf-8') as config_file:
+            parser.write(config_file)
+
+    def start_watching(self):
+        """Запуск фонового потока отслеживания изменений файла"""
+        with self.lock:
+            if self.watch_thread and self.watch_thread.is_alive():
+                return
+            self.stop_event.clear()
+            self.watch_thread = threading.Thread(target=self._watch_thread)
+            self.watch_thread.daemon = True
+            self.watch_thread.start()
+
+    def stop_watching(self):
+        """Остановка фонового потока отслеживания изменений файла"""
+        self.stop_event.set()
+        if self.watch_thread and self.watch_thread.is_alive():
+            self.watch_thread.join(timeout=self.watch_interval + 1.0)
+
+    def _watch_thread(self):
+        """Поток отслеживания изменений файла конфигурации"""
+        while not self.stop_event.wait(self.watch_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Ошибка при проверке файла конфигурации: {str(e)}")
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_config_service(path):
+    """
+    Получение общего сервиса конфигурации для файла
+
+    Args:
+        path (str): Путь к файлу config.yml или config.ini
+
+    Returns:
+        ConfigService: Сервис конфигурации
+    """
+    key = os.path.abspath(path)
+    with _services_lock:
+        if key not in _services:
+            _services[key] = ConfigService(path)
+        return _services[key]
@@ -0,0 +1,499 @@
+# -*- coding: utf-8 -*-
+"""
+Корреляция событий по правилам со скользящим окном.
+
+Правило описывает последовательность шагов: каждый шаг - условие на поля
+события и количество совпадений. Например, "не менее 10 неудачных входов
+одной учетной записи за 60 секунд, затем успешный вход":
+
+    rules:
+      - name: logon_bruteforce
+        group_by: [computer, account]
+        window: 60
+        sequence:
+          - where: {message: {contains: "Неудачный вход в систему"}}
+            count: 10
+          - where: {message: {contains: "Успешный вход в систему"}}
+
+Правило без sequence задается условием where и количеством count
+(пороговое правило из одного шага). Условие поля - значение (равенство)
+или словарь с одной из операций equals, in, contains, startswith, regex;
+все условия шага должны выполняться.
+
+Правила компилируются в общий набор предикатов: одинаковые условия разных
+правил проверяются один раз для события. Все шаги последовательности
+должны уложиться в окно, отсчитываемое от первого события серии.
+Состояния групп без событий дольше окна удаляет колесо времени, а их
+количество на правило ограничено, поэтому память ограничена.
+"""
+
+import re
+import math
+import time
+import threading
+from collections import deque
+
+import yaml
+
+from agent_logger import AgentLogger
+from metrics import REGISTRY
+from rollups import format_time, now_seconds, parse_time
+from utils import EVENT_FIELDS, get_event_field
+
+logger = AgentLogger().get_logger('correlation')
+
+# Метрики корреляции
+CORRELATION_ALERTS = REGISTRY.counter('correlation_alerts', 'Количество срабатываний правил корреляции',
+                                      ('rule',))
+CORRELATION_DROPPED = REGISTRY.counter('correlation_dropped_groups',
+                                       'Количество групп, не учтенных из-за ограничения числа состояний')
+CORRELATION_TIME = REGISTRY.histogram('correlation_batch_seconds', 'Время обработки пачки событий правилами')
+
+# Максимальное количество состояний групп одного правила
+MAX_GROUPS = 10000
+
+# Операции условий на поле события
+OPERATIONS = ('equals', 'in', 'contains', 'startswith', 'regex')
+
+
+def _field_value(event, field):
+    """Значение поля события в виде строки (поля EVENT_FIELDS - независимо от языка ключей)"""
+    if field in EVENT_FIELDS:
+        return str(get_event_field(event, field))
+    return str(event.get(field, ''))
+
+
+def _compile_condition(field, operation, value):
+    """Функция проверки значения поля для условия"""
+    if operation == 'equals':
+        expected = str(value)
+        return lambda text: text == expected
+    if operation == 'in':
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"Значение операции in для поля {field} должно быть списком")
+        allowed = frozenset(str(item) for item in value)
+        return allowed.__contains__
+    if operation == 'contains':
+        part = str(value)
+        return lambda text: part in text
+    if operation == 'startswith':
+        prefix = str(value)
+        return lambda text: text.startswith(prefix)
+    try:
+        return re.compile(str(value)).search
+    except re.error as e:
+        raise ValueError(f"Некорректное регулярное выражение для поля {field}: {str(e)}")
+
+
+class _Step:
+    """Шаг правила: номера предикатов условия и требуемое количество совпадений"""
+
+    __slots__ = ('predicates', 'count')
+
+    def __init__(self, predicates, count):
+        self.predicates = predicates
+        self.count = count
+
+
+class _GroupState:
+    """Состояние последовательности правила для одной группы"""
+
+    __slots__ = ('step', 'start', 'times', 'tick')
+
+    def __init__(self, steps):
+        self.step = 0
+        self.start = None
+        self.times = [deque(maxlen=step.count) for step in steps]
+        self.tick = None
+
+
+class TimeWheel:
+    """
+    Колесо времени для удаления неактивных состояний.
+
+    Ячейка колеса соответствует секунде, ключ кладется в ячейку секунды
+    своего последнего события. При повороте колеса ячейка, прошедшая полный
+    оборот, освобождается, и ключи, которые с тех пор не встречались,
+    считаются истекшими. Стоимость поворота пропорциональна числу истекших
+    ключей, а не числу всех состояний.
+    """
+
+    def __init__(self, span):
+        """
+        Инициализация колеса
+
+        Args:
+            span (int): Время жизни ключа без событий в секундах
+        """
+        self.size = int(math.ceil(span)) + 1
+        self.slots = [[] for _ in range(self.size)]
+        self.tick = None
+
+    def touch(self, key, state):
+        """Отметка события ключа в текущей секунде колеса"""
+        if state.tick != self.tick:
+            state.tick = self.tick
+            self.slots[self.tick % self.size].append(key)
+
+    def advance(self, seconds, states):
+        """
+        Поворот колеса до указанного времени с удалением истекших состояний
+
+        Args:
+            seconds (int): Текущее время в секундах
+            states (dict): Состояния по ключам; истекшие удаляются
+
+        Returns:
+            int: Количество удаленных состояний
+        """
+        if self.tick is None:
+            self.tick = seconds
+            return 0
+        if seconds <= self.tick:
+            return 0
+
+        expired = 0
+        # При скачке больше оборота достаточно обойти каждую ячейку один раз
+        first = max(self.tick + 1, seconds - self.size + 1)
+        for tick in range(first, seconds + 1):
+            slot = self.slots[tick % self.size]
+            for key in slot:
+                state = states.get(key)
+                if state is not None and state.tick <= tick - self.size:
+                    del states[key]
+                    expired += 1
+            slot.clear()
+        self.tick = seconds
+        return expired
+
+
+class CorrelationRule:
+    """Скомпилированное правило: шаги последовательности и состояния групп"""
+
+    def __init__(self, name, steps, window, group_by=(), description='', severity='medium',
+                 max_groups=MAX_GROUPS):
+        """
+        Инициализация правила
+
+        Args:
+            name (str): Имя правила
+            steps (list): Шаги последовательности (_Step)
+            window (int): Окно последовательности в секундах
+            group_by (tuple): Поля, по которым события делятся на группы
+            description (str): Описание правила для тревоги
+            severity (str): Важность тревоги
+            max_groups (int): Максимальное количество состояний групп
+        """
+        self.name = name
+        self.steps = steps
+        self.window = window
+        self.group_by = tuple(group_by)
+        self.description = description
+        self.severity = severity
+        self.max_groups = max_groups
+        self.groups = {}
+        self.wheel = TimeWheel(window)
+        self.alerts_metric = CORRELATION_ALERTS.labels(name)
+        self.alerts = 0
+        self.dropped = 0
+
+    def process(self, event, seconds, matched):
+        """
+        Учет события правилом
+
+        Args:
+            event (dict): Данные события
+            seconds (int): Время события в секундах
+            matched (function): Функция номер предиката -> результат для события
+
+        Returns:
+            dict: Событие тревоги или None
+        """
+        self.wheel.advance(seconds, self.groups)
+        steps = [index for index, step in enumerate(self.steps)
+                 if all(matched(predicate) for predicate in step.predicates)]
+        if not steps:
+            return None
+
+        key = tuple(_field_value(event, field) for field in self.group_by)
+        state = self.groups.get(key)
+        if state is None:
+            # Новая последовательность может начаться только с первого шага
+            if steps[0] != 0:
+                return None
+            if len(self.groups) >= self.max_groups:
+                self.dropped += 1
+                CORRELATION_DROPPED.inc()
+                return None
+            state = _GroupState(self.steps)
+            self.groups[key] = state
+        self.wheel.touch(key, state)
+
+        # Серия, не завершенная в пределах окна, начинается заново
+        if state.step > 0 and seconds - state.start > self.window:
+            self._reset(state)
+
+        current = state.step
+        if current > 0 and current in steps:
+            times = state.times[current]
+            times.append(seconds)
+            if len(times) >= self.steps[current].count:
+                state.step += 1
+                if state.step == len(self.steps):
+                    return self._complete(key, state, event, seconds)
+
+        if steps[0] == 0:
+            times = state.times[0]
+            times.append(seconds)
+            while seconds - times[0] > self.window:
+                times.popleft()
+            if len(times) >= self.steps[0].count:
+                if state.step == 0:
+                    state.step = 1
+                    state.start = times[0]
+                    if len(self.steps) == 1:
+                        return self._complete(key, state, event, seconds)
+                elif state.step == 1:
+                    # Более поздняя серия первого шага сдвигает начало окна
+                    state.start = times[0]
+        return None
+
+    def _reset(self, state):
+        """Сброс последовательности группы"""
+        state.step = 0
+        state.start = None
+        for times in state.times[1:]:
+            times.clear()
+
+    def _complete(self, key, state, event, seconds):
+        """Событие тревоги о срабатывании правила"""
+        start = state.start
+        count = sum(step.count for step in self.steps)
+        self._reset(state)
+        state.times[0].clear()
+        self.alerts += 1
+        self.alerts_metric.inc()
+
+        group = dict(zip(self.group_by, key))
+        group_text = ', '.join(f"{field}={value}" for field, value in group.items())
+        return {
+            'alert': 'correlation',
+            'rule': self.name,
+            'description': self.description,
+            'severity': self.severity,
+            'time': format_time(seconds),
+            'first_time': format_time(start),
+            'group': group,
+            'count': count,
+            'log_type': str(get_event_field(event, 'journal')),
+            'source': str(get_event_field(event, 'source')),
+            'event_id': str(get_event_field(event, 'id')),
+            'message': f"Сработало правило {self.name}" + (f" ({group_text})" if group_text else '')
+        }
+
+    def get_stats(self):
+        """Состояние правила для просмотра"""
+        return {'name': self.name, 'window': self.window, 'steps': len(self.steps),
+                'groups': len(self.groups), 'alerts': self.alerts, 'dropped': self.dropped}
+
+
+class CorrelationEngine:
+    """
+    Движок правил корреляции.
+    Условия всех правил хранятся в общем списке предикатов без повторов,
+    для каждого события предикат вычисляется не более одного раза и только
+    если он нужен какому-либо правилу.
+    """
+
+    def __init__(self, rules=(), max_groups=MAX_GROUPS):
+        """
+        Инициализация движка
+
+        Args:
+            rules (list): Описания правил (словари в формате файла правил)
+            max_groups (int): Максимальное количество состояний групп одного правила
+
+        Raises:
+            ValueError: Если описание правила некорректно
+        """
+        self.max_groups = max_groups
+        self.predicates = []        # номер -> (поле, функция проверки значения)
+        self.predicate_numbers = {}  # (поле, операция, значение) -> номер
+        self.rules = []
+        self.lock = threading.Lock()
+        names = set()
+        for rule in rules:
+            compiled = self._compile_rule(rule)
+            if compiled.name in names:
+                raise ValueError(f"Повторяющееся имя правила: {compiled.name}")
+            names.add(compiled.name)
+            self.rules.append(compiled)
+
+    def _predicate(self, field, operation, value):
+        """Номер предиката условия (одинаковые условия получают один номер)"""
+        if operation not in OPERATIONS:
+            raise ValueError(f"Неизвестная операция условия для поля {field}: {operation}")
+        signature = (field, operation, tuple(map(str, value)) if isinstance(value, (list, tuple)) else str(value))
+        number = self.predicate_numbers.get(signature)
+        if number is None:
+            number = len(self.predicates)
+            self.predicates.append((field, _compile_condition(field, operation, value)))
+            self.predicate_numbers[signature] = number
+        return number
+
+    def _compile_step(self, name, step):
+        """Компиляция шага правила"""
+        where = step.get('where') if isinstance(step, dict) else None
+        if not isinstance(where, dict) or not where:
+            raise ValueError(f"Правило {name}: шаг должен содержать непустое условие where")
+        predicates = []
+        for field, condition in where.items():
+            if isinstance(condition, dict):
+                if len(condition) != 1:
+                    raise ValueError(f"Правило {name}: условие поля {field} должно содержать одну операцию")
+                operation, value = next(iter(condition.items()))
+            else:
+                operation, value = 'equals', condition
+            predicates.append(self._predicate(str(field), operation, value))
+        count = step.get('count', 1)
+        if not isinstance(count, int) or count < 1:
+            raise ValueError(f"Правило {name}: количество совпадений шага должно быть целым не меньше 1")
+        return _Step(tuple(predicates), count)
+
+    def _compile_rule(self, rule):
+        """Компиляция описания правила"""
+        if not isinstance(rule, dict) or not rule.get('name'):
+            raise ValueError("Правило должно быть словарем с именем name")
+        name = str(rule['name'])
+        sequence = rule.get('sequence')
+        if sequence is None:
+            sequence = [{'where': rule.get('where'), 'count': rule.get('count', 1)}]
+        if not isinstance(sequence, list) or not sequence:
+            raise ValueError(f"Правило {name}: sequence должен быть непустым списком шагов")
+
+        window = rule.get('window')
+        if not isinstance(window, int) or window < 1:
+            raise ValueError(f"Правило {name}: окно window должно быть целым числом секунд не меньше 1")
+        group_by = rule.get('group_by') or []
+        if isinstance(group_by, str):
+            group_by = [group_by]
+
+        return CorrelationRule(
+            name,
+            [self._compile_step(name, step) for step in sequence],
+            window,
+            group_by=[str(field) for field in group_by],
+            description=str(rule.get('description', '')),
+            severity=str(rule.get('severity', 'medium')),
+            max_groups=self.max_groups
+        )
+
+    def process(self, events):
+        """
+        Обработка пачки событий всеми правилами
+
+        Args:
+            events (list): Список событий
+
+        Returns:
+            list: События тревоги
+        """
+        alerts = []
+        predicates = self.predicates
+        started = time.perf_counter()
+        with self.lock:
+            for event in events:
+                seconds = parse_time(str(get_event_field(event, 'time'))) or now_seconds()
+                results = [None] * len(predicates)
+                fields = {}
+
+                def matched(number):
+                    result = results[number]
+                    if result is None:
+                        field, check = predicates[number]
+                        text = fields.get(field)
+                        if text is None:
+                            text = fields[field] = _field_value(event, field)
+                        result = results[number] = bool(check(text))
+                    return result
+
+                for rule in self.rules:
+                    alert = rule.process(event, seconds, matched)
+                    if alert is not None:
+                        alerts.append(alert)
+        CORRELATION_TIME.observe(time.perf_counter() - started)
+
+        for alert in alerts:
+            logger.warning(alert['message'])
+        return alerts
+
+    def get_stats(self):
+        """
+        Получение состояния движка
+
+        Returns:
+            dict: Количество предикатов и состояние правил
+        """
+        with self.lock:
+            return {'predicates': len(self.predicates), 'rules': [rule.get_stats() for rule in self.rules]}
+
+
+def load_rules(path, max_groups=MAX_GROUPS):
+    """
+    Загрузка и компиляция файла правил
+
+    Args:
+        path (str): Путь к файлу правил YAML
+        max_groups (int): Максимальное количество состояний групп одного правила
+
+    Returns:
+        CorrelationEngine: Движок с правилами из файла
+
+    Raises:
+        OSError: Если файл не читается
+        ValueError: Если файл или правила некорректны
+    """
+    with open(path, 'r', encoding='utf-8') as rules_file:
+        try:
+            data = yaml.safe_load(rules_file) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"Ошибка разбора файла правил: {str(e)}")
+    rules = data.get('rules') if isinstance(data, dict) else None
+    if not isinstance(rules, list):
+        raise ValueError("Файл правил должен содержать список rules")
+    return CorrelationEngine(rules, max_groups=max_groups)
+
+
+class CorrelationSink:
+    """Приемник конвейера, проверяющий события правилами и передающий тревоги дальше"""
+
+    def __init__(self, engine, alert_sink):
+        """
+        Инициализация приемника
+
+        Args:
+            engine (CorrelationEngine): Движок правил
+            alert_sink (AlertSink): Приемник тревог
+        """
+        self.engine = engine
+        self.alert_sink = alert_sink
+
+    def write(self, events, is_running):
+        """
+        Передача пачки событий
+
+        Args:
+            events (list): Список событий
+            is_running (function): Функция проверки, работает ли конвейер
+
+        Returns:
+            bool: Успешность обработки
+        """
+        alerts = self.engine.process(events)
+        if alerts:
+            return self.alert_sink.write(alerts, is_running)
+        return True
+
+    def describe(self):
+        """Описание приемника для просмотра состояния"""
+        return {'type': 'correlation', 'rules': len(self.engine.rules), 'alerts': self.alert_sink.describe()}
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+Обогащение событий тегами и полями, извлеченными из текста сообщения.
+
+Ключевые слова всех тегов собираются в один автомат Ахо-Корасик, поэтому
+сообщение просматривается один раз, и время поиска почти не зависит от
+количества слов. Регулярные выражения извлечения объединяются в одно
+выражение-альтернативу с именованными группами и тоже применяются к
+сообщению за один проход.
+
+Файл правил обогащения (YAML):
+
+    tags:
+      domain_controllers: ["DC01", "DC02"]
+      ioc: ["mimikatz", "psexec"]
+    fields:
+      account: 'Имя учетной записи:\\s*(\\S+)'
+      ip_address: '\\b\\d{1,3}(?:\\.\\d{1,3}){3}\\b'
+
+Ключевые слова ищутся без учета регистра как подстроки сообщения.
+Значение поля - первая группа выражения или, если групп нет, все
+совпадение. Объединенное выражение находит непересекающиеся совпадения,
+поэтому поле, совпадение которого лежит внутри совпадения другого поля
+(ip_address в значении account из примера), ищется отдельно только его
+выражениями. Флаги выражений задаются только для части выражения,
+например (?i:...); именованные группы и обратные ссылки не допускаются,
+так как при объединении группы перенумеровываются.
+"""
+
+import re
+import threading
+from collections import deque
+
+import yaml
+
+from agent_logger import AgentLogger
+from metrics import REGISTRY
+from utils import EVENT_FIELDS, get_event_field
+
+logger = AgentLogger().get_logger('enrichment')
+
+# Метрики обогащения
+ENRICHED_EVENTS = REGISTRY.counter('enriched_events', 'Количество событий, получивших теги или поля')
+
+# Поля событий, которые не могут быть заменены извлеченными значениями
+RESERVED_FIELDS = frozenset(
+    [key for keys in EVENT_FIELDS.values() for key in keys] + ['level', 'tags', 'alert']
+)
+
+# Обратная ссылка на группу по номеру (\\1) или условие по группе ((?(1)...))
+_GROUP_REFERENCE = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(')
+
+
+class KeywordAutomaton:
+    """
+    Автомат Ахо-Корасик для поиска множества ключевых слов за один проход.
+
+    Каждому слову соответствует набор тегов. Выходы состояний заранее
+    объединяются по суффиксным ссылкам, поэтому при проходе по тексту на
+    каждый символ приходится переход по словарю и проверка выхода.
+    """
+
+    def __init__(self, keywords):
+        """
+        Построение автомата
+
+        Args:
+            keywords (dict): Ключевое слово -> набор тегов
+        """
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [frozenset()]
+        self.keywords = 0
+
+        for word, tags in keywords.items():
+            word = word.casefold()
+            if not word:
+                continue
+            node = 0
+            for char in word:
+                following = self.transitions[node].get(char)
+                if following is None:
+                    following = len(self.transitions)
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.outputs.append(frozenset())
+                    self.transitions[node][char] = following
+                node = following
+            self.outputs[node] = self.outputs[node] | frozenset(tags)
+            self.keywords += 1
+
+        # Суффиксные ссылки строятся обходом в ширину от корня
+        pending = deque(self.transitions[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self.transitions[node].items():
+                state = self.fail[node]
+                while state and char not in self.transitions[state]:
+                    state = self.fail[state]
+                target = self.transitions[state].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.outputs[child] = self.outputs[child] | self.outputs[self.fail[child]]
+                pending.append(child)
+
+    def search(self, text):
+        """
+        Поиск ключевых слов в тексте
+
+        Args:
+            text (str): Текст
+
+        Returns:
+            set: Теги найденных слов
+        """
+        transitions = self.transitions
+        fail = self.fail
+        outputs = self.outputs
+        found = set()
+        node = 0
+        for char in text.casefold():
+            while node and char not in transitions[node]:
+                node = fail[node]
+            node = transitions[node].get(char, 0)
+            if outputs[node]:
+                found.update(outputs[node])
+        return found
+
+
+class FieldExtractor:
+    """
+    Извлечение полей из текста одним объединенным регулярным выражением.
+
+    За каждым выражением следует пустая именованная группа-метка: по
+    последней закрытой группе совпадения определяется, какое выражение
+    сработало. Метка стоит в конце, а не охватывает выражение, чтобы
+    альтернативы, начинающиеся с обычных символов, отбрасывались модулем re
+    по первому символу; иначе каждая альтернатива проверяется полностью,
+    и время растет быстрее количества выражений.
+
+    Поля, не найденные за основной проход (их совпадения перекрыты
+    совпадениями других полей), ищутся отдельно собственными выражениями.
+    """
+
+    def __init__(self, fields):
+        """
+        Компиляция выражений
+
+        Args:
+            fields (dict): Имя поля -> регулярное выражение или список выражений
+
+        Raises:
+            ValueError: Если имя поля или выражение некорректно
+        """
+        self.fields = []
+        self.field_patterns = {}   # поле -> скомпилированные выражения для повторного поиска
+        parts = []
+        self.alternatives = {}   # номер группы-метки -> (поле, номер группы значения или 0)
+
+        for field, patterns in fields.items():
+            field = str(field)
+            if field in RESERVED_FIELDS:
+                raise ValueError(f"Поле {field} нельзя заполнять извлечением")
+            if isinstance(patterns, str):
+                patterns = [patterns]
+            if not isinstance(patterns, list) or not patterns:
+                raise ValueError(f"Для поля {field} должно быть задано выражение или список выражений")
+            self.fields.append(field)
+
+            for pattern in patterns:
+                try:
+                    compiled = re.compile(str(pattern))
+                except re.error as e:
+                    raise ValueError(f"Некорректное регулярное выражение поля {field}: {str(e)}")
+                if compiled.groupindex:
+                    raise ValueError(f"Выражение поля {field} не должно содержать именованных групп")
+                if _GROUP_REFERENCE.search(str(pattern)):
+                    raise ValueError(f"Выражение поля {field} не должно содержать обратных ссылок на группы")
+                self.field_patterns.setdefault(field, []).append(compiled)
+                parts.append((f"_{len(parts)}", field, str(pattern), compiled.groups))
+
+        self.pattern = None
+        if parts:
+            try:
+                self.pattern = re.compile('|'.join(f"(?:{pattern})(?P<{name}>)" for name, _, pattern, _ in parts))
+            except re.error as e:
+                raise ValueError(f"Ошибка объединения выражений извлечения: {str(e)}")
+            for name, field, _, groups in parts:
+                # Группы выражения нумеруются перед его меткой
+                index = self.pattern.groupindex[name]
+                self.alternatives[index] = (field, index - groups if groups else 0)
+
+    def extract(self, text):
+        """
+        Извлечение полей из текста
+
+        Args:
+            text (str): Текст
+
+        Returns:
+            dict: Имя поля -> значение первого совпадения
+        """
+        values = {}
+        if self.pattern is None:
+            return values
+        for match in self.pattern.finditer(text):
+            field, group = self.alternatives[match.lastindex]
+            if field not in values:
+                value = match.group(group)
+                if value is not None:
+                    values[field] = value
+                    if len(values) == len(self.fields):
+                        return values
+
+        for field in self.fields:
+            if field not in values:
+                value = self._search_field(field, text)
+                if value is not None:
+                    values[field] = value
+        return values
+
+    def _search_field(self, field, text):
+        """Поиск самого левого совпадения выражений одного поля"""
+        found = None
+        for compiled in self.field_patterns[field]:
+            group = 1 if compiled.groups else 0
+            for match in compiled.finditer(text):
+                if found is not None and match.start() >= found[0]:
+                    break
+                value = match.group(group)
+                if value is not None:
+                    found = (match.start(), value)
+                    break
+        return found[1] if found else None
+
+
+class Enricher:
+    """Этап обогащения событий: теги по ключевым словам и извлеченные поля"""
+
+    def __init__(self, tags=None, fields=None):
+        """
+        Инициализация этапа
+
+        Args:
+            tags (dict, optional): Тег -> список ключевых слов
+            fields (dict, optional): Имя поля -> регулярное выражение или список выражений
+
+        Raises:
+            ValueError: Если правила обогащения некорректны
+        """
+        keywords = {}
+        for tag, words in (tags or {}).items():
+            if isinstance(words, str):
+                words = [words]
+            if not isinstance(words, list):
+                raise ValueError(f"Ключевые слова тега {tag} должны быть списком")
+            for word in words:
+                keywords.setdefault(str(word), set()).add(str(tag))
+
+        self.automaton = KeywordAutomaton(keywords)
+        self.extractor = FieldExtractor(fields or {})
+        self.lock = threading.Lock()
+        self.enriched = 0
+
+    def enrich(self, event):
+        """
+        Добавление тегов и извлеченных полей к событию
+
+        Исходное событие не изменяется: если найдены теги или поля,
+        возвращается его копия с дополнительными полями.
+
+        Args:
+            event (dict): Данные события
+
+        Returns:
+            dict: Событие
+        """
+        message = str(get_event_field(event, 'message'))
+        tags = self.automaton.search(message) if self.automaton.keywords else ()
+        values = self.extractor.extract(message)
+        if not tags and not values:
+            return event
+
+        enriched = dict(event)
+        enriched.update(values)
+        if tags:
+            enriched['tags'] = sorted(tags.union(event.get('tags') or ()))
+        with self.lock:
+            self.enriched += 1
+        ENRICHED_EVENTS.inc()
+        return enriched
+
+    def get_stats(self):
+        """
+        Получение состояния этапа
+
+        Returns:
+            dict: Количество ключевых слов, полей и обогащенных событий
+        """
+        return {'keywords': self.automaton.keywords, 'fields': list(self.extractor.fields),
+                'enriched': self.enriched}
+
+
+def load_enrichment(path):
+    """
+    Загрузка правил обогащения из файла
+
+    Args:
+        path (str): Путь к файлу YAML с разделами tags и fields
+
+    Returns:
+        Enricher: Этап обогащения
+
+    Raises:
+        OSError: Если файл не читается
+        ValueError: Если файл или правила некорректны
+    """
+    with open(path, 'r', encoding='utf-8') as rules_file:
+        try:
+            data = yaml.safe_load(rules_file) or {}
+        except yaml.YAMLError as e:
+            raise ValueError(f"Ошибка разбора файла правил обогащения: {str(e)}")
+    if not isinstance(data, dict):
+        raise ValueError("Файл правил обогащения должен быть словарем")
+    tags = data.get('tags') or {}
+    fields = data.get('fields') or {}
+    if not isinstance(tags, dict) or not isinstance(fields, dict):
+        raise ValueError("Разделы tags и fields должны быть словарями")
+    return Enricher(tags=tags, fields=fields)
@@ -0,0 +1,623 @@
+# -*- coding: utf-8 -*-
+"""
+Столбцовый архив событий для аналитики.
+
+События записываются группами строк, внутри группы - по столбцам. Повторяющиеся
+значения (журнал, уровень, источник, идентификатор события) кодируются словарем,
+время хранится в секундах разностями соседних значений, каждый столбец сжимается
+отдельно. Поэтому архив в разы меньше JSON, а выборка читает только нужные
+столбцы и пропускает группы строк вне заданного периода.
+
+Поддерживаются два формата:
+- Parquet (*.parquet) - при установленном модуле pyarrow;
+- собственный формат (*.evc), не требующий дополнительных модулей.
+
+Поля событий приводятся к английским ключам (time, log_type, source, ...),
+ключи вне столбцов архива сохраняются в столбце extra.
+
+Запуск из командной строки:
+    python event_archive.py convert archive.evc --store data/events --start "2024-05-01 00:00:00"
+    python event_archive.py convert archive.parquet --input logs.ndjson.gz
+    python event_archive.py info archive.evc
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import struct
+import argparse
+import calendar
+from array import array
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    # Parquet необязателен, без модуля доступен только собственный формат
+    pyarrow = None
+
+from agent_logger import AgentLogger
+from utils import get_event_field
+
+logger = AgentLogger().get_logger('event_archive')
+
+# Количество событий в группе строк
+ROW_GROUP_SIZE = 65536
+
+# Столбцы архива: имя и поле события (см. utils.EVENT_FIELDS)
+COLUMNS = [
+    ('time', 'time'),
+    ('log_type', 'journal'),
+    ('level', None),
+    ('level_name', 'level'),
+    ('source', 'source'),
+    ('id', 'id'),
+    ('category', 'category'),
+    ('computer', 'computer'),
+    ('message', 'message'),
+    ('extra', None),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+# Столбцы с небольшим количеством различных значений кодируются словарем
+DICTIONARY_COLUMNS = ('log_type', 'level', 'level_name', 'source', 'id', 'category', 'computer')
+
+# Ключи события, попадающие в столбцы; остальные сохраняются в столбце extra
+KNOWN_KEYS = frozenset((
+    'id', 'level', 'уровень', 'level_name', 'время', 'time', 'источник', 'source',
+    'категория', 'category', 'журнал', 'log_type', 'компьютер', 'computer', 'сообщение', 'message',
+))
+
+# Время события 'YYYY-MM-DD HH:MM:SS'
+TIME_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})$')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Подпись собственного формата в начале и в конце файла
+MAGIC = b'EVCOL01\n'
+FOOTER_LENGTH = struct.Struct('<I')
+
+# Формат архива по расширению файла
+ARCHIVE_EXTENSIONS = {'.evc': 'evc', '.parquet': 'parquet'}
+ARCHIVE_FORMATS = ('evc', 'parquet')
+
+
+def archive_format(file_path):
+    """
+    Формат архива по расширению файла
+
+    Args:
+        file_path (str): Путь к файлу
+
+    Returns:
+        str: 'evc', 'parquet' или None, если файл не является архивом
+    """
+    return ARCHIVE_EXTENSIONS.get(os.path.splitext(file_path.lower())[1])
+
+
+def check_archive_format(file_path, fmt=None):
+    """
+    Формат архива с проверкой поддержки
+
+    Args:
+        file_path (str): Путь к файлу
+        fmt (str, optional): Формат, если он не определяется расширением
+
+    Returns:
+        str: 'evc' или 'parquet'
+
+    Raises:
+        ValueError: Если формат не поддерживается
+    """
+    fmt = fmt or archive_format(file_path)
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат архива: {file_path}")
+    if fmt == 'parquet' and pyarrow is None:
+        raise ValueError("Для формата Parquet необходим модуль pyarrow (без него используйте *.evc)")
+    return fmt
+
+
+def _parse_time(text):
+    """Время события в секундах (None, если время не разобрано)"""
+    match = TIME_PATTERN.match(text)
+    if match is None:
+        return None
+    return calendar.timegm(tuple(map(int, match.groups())))
+
+
+def _format_time(seconds):
+    """Время события в формате 'YYYY-MM-DD HH:MM:SS'"""
+    return time.strftime(TIME_FORMAT, time.gmtime(seconds))
+
+
+def _native(values):
+    """Приведение массива к порядку байтов little-endian, принятому в файле"""
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _encode_json(values):
+    """Столбец значений JSON, по одному в строке"""
+    return 'json', '\n'.join(json.dumps(value, ensure_ascii=False) for value in values).encode('utf-8')
+
+
+def _decode_json(payload, count):
+    if not count:
+        return []
+    return [json.loads(line) for line in payload.decode('utf-8').split('\n')]
+
+
+def _encode_dictionary(values):
+    """Столбец, закодированный словарем: список различных значений и номера значений по строкам"""
+    dictionary = {}
+    codes = array('I', (dictionary.setdefault(value, len(dictionary)) for value in values))
+    if len(dictionary) <= 0xFFFF:
+        codes = array('H', codes)
+    encoded = json.dumps(list(dictionary), ensure_ascii=False).encode('utf-8')
+    return 'dict', FOOTER_LENGTH.pack(len(encoded)) + encoded + _native(codes).tobytes()
+
+
+def _decode_dictionary(payload, count):
+    size = FOOTER_LENGTH.unpack_from(payload)[0]
+    start = FOOTER_LENGTH.size
+    dictionary = json.loads(payload[start:start + size].decode('utf-8'))
+    codes = array('H' if len(dictionary) <= 0xFFFF else 'I')
+    codes.frombytes(payload[start + size:])
+    _native(codes)
+    return [dictionary[code] for code in codes]
+
+
+def _encode_delta(seconds):
+    """Столбец времени: первое значение и разности соседних значений"""
+    deltas = array('q', [seconds[0]] if seconds else [])
+    deltas.extend(b - a for a, b in zip(seconds, seconds[1:]))
+    return 'delta', _native(deltas).tobytes()
+
+
+def _decode_delta(payload, count):
+    deltas = array('q')
+    deltas.frombytes(payload)
+    _native(deltas)
+    result = []
+    current = 0
+    last_seconds = last_text = None
+    for delta in deltas:
+        current += delta
+        # Соседние события часто совпадают по времени: строка формируется один раз
+        if current != last_seconds:
+            last_seconds, last_text = current, _format_time(current)
+        result.append(last_text)
+    return result
+
+
+DECODERS = {'json': _decode_json, 'dict': _decode_dictionary, 'delta': _decode_delta}
+
+
+def _event_columns(event):
+    """Значения столбцов архива для события"""
+    row = []
+    for name, field in COLUMNS:
+        if name == 'level':
+            level = event.get('level')
+            row.append(level if isinstance(level, int) else None)
+        elif name == 'extra':
+            extra = {key: value for key, value in event.items() if key not in KNOWN_KEYS}
+            row.append(extra or None)
+        else:
+            value = get_event_field(event, field, None)
+            row.append(str(value) if name == 'time' and value is not None else value)
+    return row
+
+
+def _column_event(values):
+    """Событие по значениям столбцов (пустые поля не добавляются)"""
+    event = {}
+    for name, value in zip(COLUMN_NAMES, values):
+        if value is None:
+            continue
+        if name == 'extra':
+            event.update(value)
+        else:
+            event[name] = value
+    return event
+
+
+class _ColumnarWriter:
+    """Запись архива в собственном формате"""
+
+    def __init__(self, file_path, row_group_size):
+        self.file = open(file_path, 'wb')
+        self.file.write(MAGIC)
+        self.row_group_size = row_group_size
+        self.row_groups = []
+        self.rows = []
+
+    def write(self, events):
+        for event in events:
+            self.rows.append(_event_columns(event))
+            if len(self.rows) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        """Запись накопленных строк группой"""
+        if not self.rows:
+            return
+        columns = dict(zip(COLUMN_NAMES, zip(*self.rows)))
+        group = {'rows': len(self.rows), 'columns': {}}
+
+        times = columns['time']
+        seconds = [_parse_time(value) if value is not None else None for value in times]
+        known = [value for value in times if value is not None]
+        if known:
+            group['min_time'], group['max_time'] = min(known), max(known)
+
+        for name in COLUMN_NAMES:
+            if name == 'time' and None not in seconds:
+                encoding, payload = _encode_delta(seconds)
+            elif name in DICTIONARY_COLUMNS or name == 'time':
+                encoding, payload = _encode_dictionary(columns[name])
+            else:
+                encoding, payload = _encode_json(columns[name])
+            data = zlib.compress(payload, 6)
+            group['columns'][name] = {'encoding': encoding, 'offset': self.file.tell(), 'size': len(data)}
+            self.file.write(data)
+
+        self.row_groups.append(group)
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        footer = json.dumps({'version': 1, 'row_groups': self.row_groups}, ensure_ascii=False).encode('utf-8')
+        self.file.write(footer)
+        self.file.write(FOOTER_LENGTH.pack(len(footer)))
+        self.file.write(MAGIC)
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Запись архива в формате Parquet"""
+
+    def __init__(self, file_path, row_group_size):
+        self.file_path = file_path
+        self.row_group_size = row_group_size
+        self.schema = pyarrow.schema(
+            [('time', pyarrow.timestamp('s')), ('level', pyarrow.int32())]
+            + [(name, pyarrow.string()) for name in COLUMN_NAMES if name not in ('time', 'level')]
+        )
+        self.writer = pyarrow.parquet.ParquetWriter(
+            file_path, self.schema, compression='zstd',
+            use_dictionary=list(DICTIONARY_COLUMNS),
+            column_encoding={'time': 'DELTA_BINARY_PACKED'},
+        )
+        self.rows = []
+
+    def write(self, events):
+        for event in events:
+            self.rows.append(_event_columns(event))
+            if len(self.rows) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        columns = dict(zip(COLUMN_NAMES, (list(values) for values in zip(*self.rows))))
+        extra = columns['extra']
+        for i, (text, values) in enumerate(zip(columns['time'], extra)):
+            # Неразобранное время сохраняется как есть в столбце extra
+            if text is not None and _parse_time(text) is None:
+                extra[i] = dict(values or {}, time=text)
+        columns['time'] = [_parse_time(text) if text is not None else None for text in columns['time']]
+        columns['extra'] = [json.dumps(values, ensure_ascii=False) if values else None for values in extra]
+        for name in COLUMN_NAMES:
+            if name not in ('time', 'level', 'extra'):
+                columns[name] = [str(value) if value is not None else None for value in columns[name]]
+        table = pyarrow.Table.from_pydict(columns, schema=self.schema)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+class ArchiveWriter:
+    """
+    Запись событий в столбцовый архив.
+
+    События накапливаются до размера группы строк и записываются группой.
+    Формат определяется расширением файла (*.evc или *.parquet).
+    """
+
+    def __init__(self, file_path, row_group_size=ROW_GROUP_SIZE, fmt=None):
+        """
+        Открытие архива для записи
+
+        Args:
+            file_path (str): Путь к файлу архива
+            row_group_size (int): Количество событий в группе строк
+            fmt (str, optional): Формат 'evc' или 'parquet' (по умолчанию по расширению)
+
+        Raises:
+            ValueError: Если формат не поддерживается
+        """
+        fmt = check_archive_format(file_path, fmt)
+        self.file_path = file_path
+        self.count = 0
+        if fmt == 'parquet':
+            self._writer = _ParquetWriter(file_path, row_group_size)
+        else:
+            self._writer = _ColumnarWriter(file_path, row_group_size)
+
+    def write(self, events):
+        """
+        Добавление событий в архив
+
+        Args:
+            events (list): События
+        """
+        self._writer.write(events)
+        self.count += len(events)
+
+    def close(self):
+        """Запись оставшихся событий и закрытие файла"""
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class ArchiveReader:
+    """
+    Чтение столбцового архива в собственном формате.
+
+    Оглавление в конце файла содержит расположение столбцов каждой группы
+    строк и диапазон времени группы, поэтому читаются только нужные столбцы
+    нужных групп.
+    """
+
+    def __init__(self, file_path):
+        """
+        Открытие архива
+
+        Args:
+            file_path (str): Путь к файлу *.evc
+
+        Raises:
+            ValueError: Если файл не является архивом
+        """
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            tail = len(MAGIC) + FOOTER_LENGTH.size
+            if size < len(MAGIC) + tail:
+                raise ValueError(f"Файл {file_path} не является архивом событий")
+            f.seek(size - tail)
+            data = f.read(tail)
+            if data[FOOTER_LENGTH.size:] != MAGIC:
+                raise ValueError(f"Файл {file_path} не является архивом событий или не дописан")
+            footer_size = FOOTER_LENGTH.unpack_from(data)[0]
+            f.seek(size - tail - footer_size)
+            footer = json.loads(f.read(footer_size).decode('utf-8'))
+        self.row_groups = footer['row_groups']
+        self.count = sum(group['rows'] for group in self.row_groups)
+
+    def read_group(self, number, columns=None):
+        """
+        Чтение столбцов группы строк
+
+        Args:
+            number (int): Номер группы
+            columns (list, optional): Имена столбцов (по умолчанию все)
+
+        Returns:
+            dict: Имя столбца -> список значений
+        """
+        group = self.row_groups[number]
+        result = {}
+        with open(self.file_path, 'rb') as f:
+            for name in columns or COLUMN_NAMES:
+                column = group['columns'][name]
+                f.seek(column['offset'])
+                payload = zlib.decompress(f.read(column['size']))
+                result[name] = DECODERS[column['encoding']](payload, group['rows'])
+        return result
+
+    def iter_groups(self, columns=None, start=None, end=None):
+        """
+        Последовательное чтение групп строк за период
+
+        Args:
+            columns (list, optional): Имена столбцов (по умолчанию все)
+            start (str, optional): Начало периода 'YYYY-MM-DD HH:MM:SS' (включительно)
+            end (str, optional): Конец периода (не включительно)
+
+        Yields:
+            dict: Имя столбца -> список значений
+        """
+        columns = list(columns or COLUMN_NAMES)
+        filtered = bool(start or end)
+        if filtered and 'time' not in columns:
+            columns.append('time')
+
+        for number, group in enumerate(self.row_groups):
+            # Группы вне периода не читаются
+            if start and group.get('max_time') is not None and group['max_time'] < start:
+                continue
+            if end and group.get('min_time') is not None and group['min_time'] >= end:
+                continue
+            data = self.read_group(number, columns)
+            if filtered:
+                keep = [i for i, value in enumerate(data['time'])
+                        if value is not None and (not start or value >= start) and (not end or value < end)]
+                if len(keep) < group['rows']:
+                    data = {name: [values[i] for i in keep] for name, values in data.items()}
+            yield data
+
+
+def _iter_parquet_groups(file_path, columns=None, start=None, end=None):
+    """Последовательное чтение групп строк файла Parquet (см. ArchiveReader.iter_groups)"""
+    columns = list(columns or COLUMN_NAMES)
+    if (start or end) and 'time' not in columns:
+        columns.append('time')
+    start_seconds = _parse_time(start) if start else None
+    end_seconds = _parse_time(end) if end else None
+
+    parquet_file = pyarrow.parquet.ParquetFile(file_path)
+    time_index = parquet_file.schema_arrow.get_field_index('time')
+    for number in range(parquet_file.num_row_groups):
+        # Группы вне периода пропускаются по статистике столбца времени
+        statistics = parquet_file.metadata.row_group(number).column(time_index).statistics
+        if statistics is not None and statistics.has_min_max:
+            if start_seconds is not None and calendar.timegm(statistics.max.timetuple()) < start_seconds:
+                continue
+            if end_seconds is not None and calendar.timegm(statistics.min.timetuple()) >= end_seconds:
+                continue
+
+        table = parquet_file.read_row_group(number, columns=columns)
+        data = table.to_pydict()
+        data['time'] = [value.strftime(TIME_FORMAT) if value is not None else None
+                        for value in data['time']]
+        if 'extra' in data:
+            data['extra'] = [json.loads(value) if value else None for value in data['extra']]
+            # Неразобранное время было сохранено в столбце extra
+            for i, values in enumerate(data['extra']):
+                if values and 'time' in values:
+                    data['time'][i] = values.pop('time')
+        if start or end:
+            keep = [i for i, value in enumerate(data['time'])
+                    if value is not None and (not start or value >= start) and (not end or value < end)]
+            data = {name: [values[i] for i in keep] for name, values in data.items()}
+        yield data
+
+
+def iter_groups(file_path, columns=None, start=None, end=None):
+    """
+    Чтение столбцов архива по группам строк независимо от формата
+
+    Args:
+        file_path (str): Путь к файлу *.evc или *.parquet
+        columns (list, optional): Имена столбцов (по умолчанию все)
+        start (str, optional): Начало периода (включительно)
+        end (str, optional): Конец периода (не включительно)
+
+    Yields:
+        dict: Имя столбца -> список значений
+    """
+    if check_archive_format(file_path) == 'parquet':
+        return _iter_parquet_groups(file_path, columns, start, end)
+    return ArchiveReader(file_path).iter_groups(columns, start, end)
+
+
+def iter_archive(file_path, start=None, end=None, chunk_size=None):
+    """
+    Чтение событий архива пачками
+
+    Args:
+        file_path (str): Путь к файлу *.evc или *.parquet
+        start (str, optional): Начало периода (включительно)
+        end (str, optional): Конец периода (не включительно)
+        chunk_size (int, optional): Размер пачки (по умолчанию - группа строк)
+
+    Yields:
+        list: Пачка событий
+    """
+    for data in iter_groups(file_path, start=start, end=end):
+        columns = [data[name] for name in COLUMN_NAMES]
+        events = [_column_event(values) for values in zip(*columns)]
+        if not events:
+            continue
+        step = chunk_size or len(events)
+        for position in range(0, len(events), step):
+            yield events[position:position + step]
+
+
+def _convert(args):
+    """Преобразование событий хранилища или файла экспорта в архив"""
+    # Модули подключаются здесь: log_export сам использует архив для экспорта
+    from event_store import EventStore
+    from log_export import iter_import
+
+    fmt = check_archive_format(args.output)
+    if args.store:
+        store = EventStore(args.store)
+        batches = store.iter_range(args.start, args.end, chunk_size=10000)
+    else:
+        batches = iter_import(args.input, chunk_size=10000)
+
+    started = time.perf_counter()
+    temp_path = args.output + '.part'
+    try:
+        with ArchiveWriter(temp_path, row_group_size=args.row_group_size, fmt=fmt) as writer:
+            for batch in batches:
+                writer.write(batch)
+        os.replace(temp_path, args.output)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(args.output)
+    logger.info(f"Архив {args.output}: {writer.count} событий, {size} байт, {elapsed:.2f} с")
+    print(f"Записано событий: {writer.count}, размер архива: {size / 1024 / 1024:.1f} МБ, время: {elapsed:.2f} с")
+
+
+def _info(args):
+    """Сведения об архиве"""
+    print(f"Файл: {args.archive} ({os.path.getsize(args.archive) / 1024 / 1024:.1f} МБ)")
+    if check_archive_format(args.archive) == 'parquet':
+        metadata = pyarrow.parquet.ParquetFile(args.archive).metadata
+        print(f"Формат: Parquet, событий: {metadata.num_rows}, групп строк: {metadata.num_row_groups}")
+        return
+
+    reader = ArchiveReader(args.archive)
+    print(f"Формат: evc, событий: {reader.count}, групп строк: {len(reader.row_groups)}")
+    sizes = {}
+    for group in reader.row_groups:
+        for name, column in group['columns'].items():
+            sizes[name] = sizes.get(name, 0) + column['size']
+    for name in COLUMN_NAMES:
+        print(f"  {name:<12} {sizes.get(name, 0) / 1024:>10.1f} КБ")
+    times = [group[key] for group in reader.row_groups for key in ('min_time', 'max_time') if key in group]
+    if times:
+        print(f"Период: {min(times)} - {max(times)}")
+
+
+def main():
+    """Запуск преобразования из командной строки"""
+    parser = argparse.ArgumentParser(description='Столбцовый архив событий')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='Записать события в архив (*.evc или *.parquet)')
+    convert.add_argument('output', help='Путь к файлу архива')
+    source = convert.add_mutually_exclusive_group(required=True)
+    source.add_argument('--store', help='Каталог локального хранилища событий')
+    source.add_argument('--input', help='Файл экспорта (JSON, NDJSON или CSV, возможно сжатый)')
+    convert.add_argument('--start', help="Начало периода 'YYYY-MM-DD HH:MM:SS' (для --store)")
+    convert.add_argument('--end', help='Конец периода, не включительно (для --store)')
+    convert.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE,
+                         help='Количество событий в группе строк')
+    convert.set_defaults(handler=_convert)
+
+    info = commands.add_parser('info', help='Показать сведения об архиве')
+    info.add_argument('archive', help='Путь к файлу архива')
+    info.set_defaults(handler=_info)
+
+    args = parser.parse_args()
+    try:
+        args.handler(args)
+    except (OSError, ValueError) as e:
+        logger.error(f"Ошибка при работе с архивом: {str(e)}")
+        print(f"Ошибка: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,501 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль буфера собранных событий для веб-интерфейса
+"""
+
+import json
+import time
+import bisect
+import threading
+from collections import deque
+from agent_logger import AgentLogger
+from metrics import REGISTRY
+
+logger = AgentLogger().get_logger('event_buffer')
+
+# Метрики буфера событий
+BUFFERED_EVENTS = REGISTRY.counter('event_buffer_events', 'Количество событий, добавленных в буфер веб-интерфейса')
+SUBSCRIBER_DROPS = REGISTRY.counter('event_buffer_subscriber_dropped',
+                                    'Количество событий, потерянных медленными подписчиками')
+CURSOR_WAIT = REGISTRY.counter('event_buffer_cursor_wait_seconds',
+                               'Время ожидания добавления событий из-за отстающих читателей по курсору')
+CURSOR_DETACHED = REGISTRY.counter('event_buffer_cursor_detached',
+                                   'Количество отключений отстающих курсоров от обратного давления')
+CURSOR_LOST = REGISTRY.counter('event_buffer_cursor_lost',
+                               'Количество событий, вытесненных до прочтения отключенными курсорами')
+
+# Максимальное время ожидания отстающих читателей при добавлении события (секунд)
+CURSOR_WAIT_LIMIT = 2.0
+
+
+class Subscription:
+    """
+    Подписка клиента на новые события буфера.
+    Каждый клиент получает собственный ограниченный буфер, поэтому медленный
+    клиент теряет только свои самые старые события и не задерживает остальных.
+    """
+
+    def __init__(self, event_buffer, maxlen):
+        """
+        Инициализация подписки
+
+        Args:
+            event_buffer (EventBuffer): Буфер, на который оформлена подписка
+            maxlen (int): Максимальное количество ожидающих отправки событий
+        """
+        self.event_buffer = event_buffer
+        self.maxlen = maxlen
+        self.pending = deque(maxlen=maxlen)
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def push(self, entries):
+        """
+        Добавление событий в буфер подписки
+
+        Args:
+            entries (list): Список записей буфера (порядковый номер, событие, JSON)
+        """
+        with self.condition:
+            overflow = len(self.pending) + len(entries) - self.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+                SUBSCRIBER_DROPS.inc(overflow)
+            self.pending.extend(entries)
+            self.condition.notify()
+
+    def get_batch(self, max_items=500, timeout=15.0):
+        """
+        Получение пачки накопленных событий
+
+        Args:
+            max_items (int): Максимальное количество событий в пачке
+            timeout (float): Время ожидания новых событий в секундах
+
+        Returns:
+            tuple: Список записей (порядковый номер, событие, JSON) и количество
+                   потерянных с прошлого вызова событий
+        """
+        with self.condition:
+            if not self.pending and not self.closed:
+                self.condition.wait(timeout)
+
+            count = min(len(self.pending), max_items)
+            batch = [self.pending.popleft() for _ in range(count)]
+
+            dropped = self.dropped
+            self.dropped = 0
+
+        return batch, dropped
+
+    def close(self):
+        """Отмена подписки"""
+        self.event_buffer.unsubscribe(self)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class BufferCursor:
+    """
+    Читатель буфера по курсору без потерь.
+    Пока курсор открыт, буфер не вытесняет события, которые читатель еще
+    не подтвердил, а ждет его (обратное давление передается добавлению).
+    Ожидание ограничено CURSOR_WAIT_LIMIT: читатель, не успевший за это
+    время, отключается от обратного давления и теряет вытесненные события,
+    а при следующем чтении продолжает с самого старого хранимого события
+    и снова подключается. Поэтому зависший приемник не останавливает сбор.
+    Используется внутренними конвейерами; клиентам веб-интерфейса и
+    передаче в RabbitMQ предназначена подписка с потерями (Subscription).
+    """
+
+    def __init__(self, event_buffer, seq):
+        """
+        Инициализация курсора
+
+        Args:
+            event_buffer (EventBuffer): Буфер событий
+            seq (int): Номер последнего прочитанного события
+        """
+        self.event_buffer = event_buffer
+        self.seq = seq
+        self.closed = False
+        self.detached = False
+        self.lost = 0
+
+    def read(self, limit=500, timeout=1.0):
+        """
+        Получение следующих событий после курсора без его продвижения
+
+        Args:
+            limit (int): Максимальное количество событий
+            timeout (float): Время ожидания новых событий в секундах
+
+        Returns:
+            list: Список записей (порядковый номер, событие, JSON)
+        """
+        buffer = self.event_buffer
+        with buffer.changed:
+            if self.detached and not self.closed:
+                self._reattach_locked()
+            entries = buffer._since_locked(self.seq, limit)
+            if not entries and not self.closed:
+                buffer.changed.wait(timeout)
+                entries = buffer._since_locked(self.seq, limit)
+            return entries
+
+    def _reattach_locked(self):
+        """Учет вытесненных событий и подключение курсора обратно (вызывается под блокировкой)"""
+        buffer = self.event_buffer
+        first_seq = buffer.entries[0][0] if buffer.entries else buffer.last_seq + 1
+        if self.seq < first_seq - 1:
+            lost = first_seq - 1 - self.seq
+            self.lost += lost
+            CURSOR_LOST.inc(lost)
+            logger.warning(f"Отстающий читатель буфера пропустил {lost} вытесненных событий")
+            self.seq = first_seq - 1
+        self.detached = False
+        buffer.cursors.add(self)
+
+    def commit(self, seq):
+        """
+        Подтверждение обработки событий до указанного номера включительно
+
+        Args:
+            seq (int): Номер последнего обработанного события
+        """
+        with self.event_buffer.changed:
+            self.seq = seq
+            self.event_buffer.changed.notify_all()
+
+    def close(self):
+        """Закрытие курсора: буфер больше не ждет этого читателя"""
+        self.event_buffer.close_cursor(self)
+
+
+class EventBuffer:
+    """
+    Кольцевой буфер собранных событий с порядковыми номерами.
+    Номер события используется как идентификатор для возобновления
+    потока (Last-Event-ID) после переподключения клиента и как курсор
+    для инкрементального получения событий.
+
+    Каждое событие сериализуется в JSON один раз при добавлении, ответы
+    клиентам собираются из готовых фрагментов.
+
+    Для постраничного просмотра буфер поддерживает индексы по полям
+    INDEXED_FIELDS (значение -> номера событий в порядке поступления)
+    и индекс по времени события.
+    """
+
+    # Поля событий, по которым строятся индексы для фильтрации
+    INDEXED_FIELDS = ('level', 'log_type', 'source')
+
+    # Поля событий, по которым выполняется текстовый поиск
+    SEARCH_FIELDS = ('id', 'source', 'log_type', 'level_name', 'message')
+
+    # Допустимые варианты сортировки (минус означает обратный порядок)
+    SORT_ORDERS = ('seq', '-seq', 'time', '-time')
+
+    def __init__(self, maxlen=10000, subscriber_maxlen=1000):
+        """
+        Инициализация буфера
+
+        Args:
+            maxlen (int): Максимальное количество хранимых событий
+            subscriber_maxlen (int): Размер буфера каждой подписки
+        """
+        self.entries = deque(maxlen=maxlen)
+        self.subscriber_maxlen = subscriber_maxlen
+        self.last_seq = 0
+        self.subscribers = set()
+        self.cursors = set()
+        self.lock = threading.Lock()
+        # Условие на той же блокировке: новые события и продвижение курсоров
+        self.changed = threading.Condition(self.lock)
+
+        # Индексы для постраничного просмотра
+        self.by_seq = {}
+        self.search_text = {}
+        self.field_index = {field: {} for field in self.INDEXED_FIELDS}
+        self.time_index = []
+
+    def append(self, event):
+        """
+        Добавление события в буфер
+
+        Args:
+            event (dict): Данные события
+
+        Returns:
+            int: Порядковый номер события
+        """
+        # Сериализуем вне блокировки, чтобы не задерживать читателей
+        fragment = json.dumps(event, ensure_ascii=False)
+        search_text = ' '.join(str(event.get(field, '')) for field in self.SEARCH_FIELDS).lower()
+
+        with self.lock:
+            if len(self.entries) == self.entries.maxlen:
+                self._wait_cursors_locked()
+                self._unindex(self.entries[0])
+
+            self.last_seq += 1
+            entry = (self.last_seq, event, fragment)
+            self.entries.append(entry)
+            self._index(entry, search_text)
+
+            for subscription in self.subscribers:
+                subscription.push([entry])
+            if self.cursors:
+                self.changed.notify_all()
+
+            BUFFERED_EVENTS.inc()
+            return self.last_seq
+
+    def _wait_cursors_locked(self):
+        """
+        Ожидание, пока все курсоры прочитают вытесняемое событие (вызывается под блокировкой).
+        Курсоры, не успевшие за CURSOR_WAIT_LIMIT, отключаются от обратного давления
+        """
+        started = time.monotonic()
+        while True:
+            lagging = [cursor for cursor in self.cursors if cursor.seq < self.entries[0][0]]
+            if not lagging:
+                break
+            remaining = CURSOR_WAIT_LIMIT - (time.monotonic() - started)
+            if remaining <= 0:
+                for cursor in lagging:
+                    cursor.detached = True
+                    self.cursors.discard(cursor)
+                    CURSOR_DETACHED.inc()
+                logger.warning(f"Отключено отстающих читателей буфера: {len(lagging)}, "
+                               f"ожидание превысило {CURSOR_WAIT_LIMIT:.1f} с")
+                break
+            self.changed.wait(remaining)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            CURSOR_WAIT.inc(waited)
+
+    def open_cursor(self, last_seq=None):
+        """
+        Открытие курсора для чтения без потерь
+
+        Args:
+            last_seq (int, optional): Номер последнего прочитанного события;
+                                      по умолчанию читаются только новые события
+
+        Returns:
+            BufferCursor: Курсор
+        """
+        with self.lock:
+            cursor = BufferCursor(self, self.last_seq if last_seq is None else last_seq)
+            self.cursors.add(cursor)
+        return cursor
+
+    def close_cursor(self, cursor):
+        """
+        Закрытие курсора
+
+        Args:
+            cursor (BufferCursor): Курсор
+        """
+        with self.changed:
+            cursor.closed = True
+            self.cursors.discard(cursor)
+            self.changed.notify_all()
+
+    def _index(self, entry, search_text):
+        """Добавление события в индексы (вызывается под блокировкой)"""
+        seq, event, _ = entry
+        self.by_seq[seq] = entry
+        self.search_text[seq] = search_text
+
+        for field, index in self.field_index.items():
+            key = str(event.get(field, ''))
+            if key not in index:
+                index[key] = deque()
+            index[key].append(seq)
+
+        bisect.insort(self.time_index, (str(event.get('time', '')), seq))
+
+    def _unindex(self, entry):
+        """Удаление вытесняемого события из индексов (вызывается под блокировкой)"""
+        seq, event, _ = entry
+        del self.by_seq[seq]
+        del self.search_text[seq]
+
+        # События вытесняются в порядке поступления, поэтому номер всегда первый в списке
+        for field, index in self.field_index.items():
+            key = str(event.get(field, ''))
+            seqs = index[key]
+            seqs.popleft()
+            if not seqs:
+                del index[key]
+
+        time_key = (str(event.get('time', '')), seq)
+        position = bisect.bisect_left(self.time_index, time_key)
+        if position < len(self.time_index) and self.time_index[position] == time_key:
+            del self.time_index[position]
+
+    def query(self, filters=None, text=None, sort='-time', offset=0, limit=100, after=0):
+        """
+        Постраничная выборка событий с фильтрацией и сортировкой
+
+        Args:
+            filters (dict, optional): Точные значения индексируемых полей (поле -> значение)
+            text (str, optional): Подстрока для поиска без учета регистра
+            after (int): Учитывать только события с номером больше указанного
+            sort (str): Порядок сортировки из SORT_ORDERS
+            offset (int): Смещение от начала выборки
+            limit (int): Размер страницы
+
+        Returns:
+            tuple: Общее количество подходящих событий и список записей
+                   (порядковый номер, событие, JSON) для запрошенной страницы
+
+        Raises:
+            ValueError: Если указано неизвестное поле или порядок сортировки
+        """
+        if sort not in self.SORT_ORDERS:
+            raise ValueError(f"Неизвестный порядок сортировки: {sort}")
+
+        filters = {field: str(value) for field, value in (filters or {}).items() if value not in (None, '')}
+        for field in filters:
+            if field not in self.field_index:
+                raise ValueError(f"Фильтрация по полю {field} не поддерживается")
+
+        text = text.lower() if text else None
+        reverse = sort.startswith('-')
+        by_time = sort.endswith('time')
+
+        with self.lock:
+            if filters:
+                # Начинаем с самого короткого списка индекса, остальные условия проверяем по событию
+                candidates = min((self.field_index[field].get(value, ()) for field, value in filters.items()),
+                                 key=len)
+                seqs = [seq for seq in candidates
+                        if seq > after
+                        and all(str(self.by_seq[seq][1].get(field, '')) == value
+                               for field, value in filters.items())
+                        and (text is None or text in self.search_text[seq])]
+                if by_time:
+                    seqs.sort(key=lambda seq: str(self.by_seq[seq][1].get('time', '')))
+                if reverse:
+                    seqs.reverse()
+                total = len(seqs)
+                page = seqs[offset:offset + limit]
+
+            elif text is not None or after:
+                # Полный просмотр в нужном порядке без сортировки
+                if by_time:
+                    ordered = (seq for _, seq in (reversed(self.time_index) if reverse else self.time_index))
+                else:
+                    ordered = (entry[0] for entry in (reversed(self.entries) if reverse else self.entries))
+                seqs = [seq for seq in ordered
+                        if seq > after and (text is None or text in self.search_text[seq])]
+                total = len(seqs)
+                page = seqs[offset:offset + limit]
+
+            else:
+                # Без фильтров страница берется из индекса напрямую
+                total = len(self.entries)
+                if reverse:
+                    start, stop = max(total - offset - limit, 0), max(total - offset, 0)
+                else:
+                    start, stop = offset, offset + limit
+                if by_time:
+                    page = [seq for _, seq in self.time_index[start:stop]]
+                else:
+                    first = self.entries[0][0] if self.entries else 0
+                    page = list(range(first + start, first + min(stop, total)))
+                if reverse:
+                    page.reverse()
+
+            return total, [self.by_seq[seq] for seq in page]
+
+    @property
+    def version(self):
+        """
+        Версия содержимого буфера для условных запросов (ETag).
+        Меняется при добавлении событий и при очистке буфера
+        """
+        with self.lock:
+            first_seq = self.entries[0][0] if self.entries else 0
+            return f"{first_seq}-{self.last_seq}"
+
+    @property
+    def first_seq(self):
+        """Порядковый номер самого старого хранимого события (0, если буфер пуст)"""
+        with self.lock:
+            return self.entries[0][0] if self.entries else 0
+
+    def since(self, seq, limit=None):
+        """
+        Получение событий с номером больше указанного
+
+        Args:
+            seq (int): Порядковый номер последнего полученного события
+            limit (int, optional): Максимальное количество возвращаемых событий
+
+        Returns:
+            list: Список записей (порядковый номер, событие, JSON)
+        """
+        with self.lock:
+            return self._since_locked(seq, limit)
+
+    def _since_locked(self, seq, limit=None):
+        """Выборка новых событий (вызывается под блокировкой)"""
+        if not self.entries:
+            return []
+
+        # Номера событий в буфере идут подряд, поэтому позиция первого нового
+        # события вычисляется сразу, и стоимость пропорциональна размеру выборки
+        start = max(seq + 1 - self.entries[0][0], 0)
+        stop = len(self.entries)
+        if limit is not None:
+            stop = min(stop, start + max(limit, 0))
+        return [self.entries[index] for index in range(start, stop)]
+
+    def subscribe(self, last_seq=None):
+        """
+        Оформление подписки на новые события
+
+        Args:
+            last_seq (int, optional): Номер последнего полученного клиентом события.
+                                      Если указан, пропущенные события будут
+                                      переданы в подписку сразу
+
+        Returns:
+            Subscription: Объект подписки
+        """
+        subscription = Subscription(self, self.subscriber_maxlen)
+
+        with self.lock:
+            if last_seq is not None:
+                missed = self._since_locked(last_seq)
+                if missed:
+                    subscription.push(missed)
+            self.subscribers.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Отмена подписки
+
+        Args:
+            subscription (Subscription): Объект подписки
+        """
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def clear(self):
+        """Очистка буфера (порядковые номера продолжают расти)"""
+        with self.lock:
+            self.entries.clear()
+            self.by_seq.clear()
+            self.search_text.clear()
+            self.time_index.clear()
+            for index in self.field_index.values():
+                index.clear()
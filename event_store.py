@@ -0,0 +1,691 @@
+# -*- coding: utf-8 -*-
+"""
+Локальное хранилище собранных событий.
+
+События хранятся в файлах SQLite, по одному файлу на сутки (по времени
+события): events-YYYY-MM-DD.db. Разбиение по суткам позволяет выбирать
+события за период, открывая только файлы нужных дней, и удалять старые
+события целым файлом. В каждом файле события проиндексированы по времени,
+журналу, уровню и идентификатору, а при наличии в SQLite модуля FTS5 -
+полнотекстовым индексом по сообщению и источнику.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from agent_logger import AgentLogger
+from metrics import REGISTRY
+from utils import get_event_field
+
+logger = AgentLogger().get_logger('event_store')
+
+# Метрики хранилища
+STORED_EVENTS = REGISTRY.counter('event_store_events', 'Количество событий, записанных в локальное хранилище')
+STORE_WRITE_TIME = REGISTRY.histogram('event_store_write_seconds', 'Время записи пачки событий в локальное хранилище')
+STORE_REMOVED_DAYS = REGISTRY.counter('event_store_removed_days', 'Количество файлов суток, удаленных по сроку или размеру')
+STORE_SEARCH_TIME = REGISTRY.histogram('event_store_search_seconds', 'Время полнотекстового поиска в локальном хранилище')
+
+# Имя файла суток
+DAY_FILE_PATTERN = re.compile(r'^events-(\d{4}-\d{2}-\d{2})\.db$')
+
+# Сутки в начале времени события
+DAY_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# Размер кэша страниц SQLite на файл (КиБ): вставки в индексы идут не по порядку
+CACHE_SIZE_KB = 16384
+
+# Количество одновременно открытых файлов суток для записи
+MAX_OPEN_DAYS = 8
+
+# Интервал обслуживания хранилища (сроки хранения и уплотнение) в секундах
+MAINTENANCE_INTERVAL = 3600
+
+# Допустимые варианты сортировки выборки
+SORT_ORDERS = ('time', '-time')
+
+# Отметка уплотненного файла (PRAGMA user_version)
+COMPACTED_VERSION = 1
+
+# Время после последней записи в файл суток, до истечения которого файл не уплотняется (секунд)
+COMPACT_GRACE = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    time TEXT NOT NULL,
+    log_type TEXT NOT NULL,
+    level INTEGER,
+    level_name TEXT,
+    source TEXT,
+    event_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_time ON events (time, seq);
+CREATE INDEX IF NOT EXISTS events_log_type ON events (log_type, time, seq);
+CREATE INDEX IF NOT EXISTS events_level ON events (level, time, seq);
+CREATE INDEX IF NOT EXISTS events_event_id ON events (event_id);
+"""
+
+# Полнотекстовый индекс без копии текста: rowid совпадает с seq события.
+# Токенизатор unicode61 разбирает кириллицу и латиницу и не различает регистр
+FULL_TEXT_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+    message, source, content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Заполнение индекса для файлов, записанных до его появления
+FULL_TEXT_BACKFILL = """
+INSERT INTO events_fts (rowid, message, source)
+SELECT seq, coalesce(json_extract(data, '$."сообщение"'), json_extract(data, '$.message'), ''), source
+FROM events
+"""
+
+# Слова запроса: фраза в кавычках или отдельное слово (с * на конце - префикс)
+QUERY_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+QUERY_WORD_PATTERN = re.compile(r'\w+')
+
+
+def _event_row(event):
+    """Значения столбцов таблицы для события"""
+    level = event.get('level')
+    return (
+        str(get_event_field(event, 'time')),
+        str(get_event_field(event, 'journal')),
+        level if isinstance(level, int) else None,
+        str(get_event_field(event, 'level')),
+        str(get_event_field(event, 'source')),
+        str(get_event_field(event, 'id')),
+        json.dumps(event, ensure_ascii=False),
+    )
+
+
+def _event_day(time_text):
+    """Сутки события по времени в формате 'YYYY-MM-DD HH:MM:SS' (None, если время не разобрано)"""
+    match = DAY_PATTERN.match(time_text)
+    return match.group(0) if match else None
+
+
+def _fts5_available():
+    """Проверка наличия модуля FTS5 в сборке SQLite"""
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute('CREATE VIRTUAL TABLE fts_check USING fts5(text)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+
+
+FTS5_AVAILABLE = _fts5_available()
+
+
+def build_match_query(text):
+    """
+    Преобразование строки поиска в запрос FTS5
+
+    Слова запроса должны встречаться в событии все (в любом порядке),
+    текст в кавычках ищется как фраза, слово со звездочкой на конце -
+    как префикс: "служб*" находит "служба", "службы", "службой".
+    Основ слов индекс не выделяет, поэтому для поиска по всем формам
+    русского слова используется префикс.
+
+    Args:
+        text (str): Строка поиска
+
+    Returns:
+        str: Выражение MATCH или пустая строка, если в запросе нет слов
+    """
+    terms = []
+    for phrase, word in QUERY_TERM_PATTERN.findall(text):
+        prefix = word.endswith('*')
+        words = QUERY_WORD_PATTERN.findall(phrase or word)
+        if not words:
+            continue
+        # Слова заключаются в кавычки, поэтому операторы FTS5 в запросе не действуют
+        term = '"' + ' '.join(words) + '"'
+        terms.append(term + '*' if prefix else term)
+    return ' AND '.join(terms)
+
+
+class EventStore:
+    """
+    Хранилище событий в файлах SQLite по суткам.
+
+    Запись выполняется пачками: события пачки группируются по суткам и
+    вставляются одной транзакцией в каждый файл. Файлы работают в режиме
+    WAL, поэтому чтение из других потоков и процессов не блокируется
+    записью. Фоновое обслуживание удаляет файлы старше срока хранения
+    или сверх ограничения общего размера и уплотняет файлы прошедших суток.
+    """
+
+    def __init__(self, directory='data/events', retention_days=30, max_size_mb=2048, full_text=True):
+        """
+        Инициализация хранилища
+
+        Args:
+            directory (str): Каталог файлов хранилища
+            retention_days (int): Сколько суток хранить события
+            max_size_mb (int): Максимальный общий размер файлов в мегабайтах
+            full_text (bool): Вести полнотекстовый индекс (если SQLite поддерживает FTS5)
+        """
+        self.directory = directory
+        self.retention_days = retention_days
+        self.max_size = max_size_mb * 1024 * 1024
+        self.full_text = full_text and FTS5_AVAILABLE
+        if full_text and not FTS5_AVAILABLE:
+            logger.warning("SQLite собран без FTS5, полнотекстовый поиск в хранилище недоступен")
+        self.lock = threading.Lock()
+        self.connections = {}   # сутки -> соединение для записи (в порядке использования)
+        self.last_write = {}    # сутки -> время последней записи (time.time())
+        self.stop_event = threading.Event()
+        self.maintenance_thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _day_path(self, day):
+        """Путь к файлу суток"""
+        return os.path.join(self.directory, f'events-{day}.db')
+
+    def days(self):
+        """
+        Сутки, за которые в хранилище есть файлы
+
+        Returns:
+            list: Строки 'YYYY-MM-DD' в порядке возрастания
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(match.group(1) for match in map(DAY_FILE_PATTERN.match, names) if match)
+
+    def _connect(self, path):
+        """Открытие файла суток"""
+        connection = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+        return connection
+
+    def _writer(self, day):
+        """Соединение для записи в файл суток (вызывается под блокировкой)"""
+        connection = self.connections.pop(day, None)
+        if connection is None:
+            connection = self._connect(self._day_path(day))
+            connection.executescript(SCHEMA)
+            if self.full_text:
+                self._create_full_text(connection, day)
+            # Давно не используемые файлы закрываем
+            while len(self.connections) >= MAX_OPEN_DAYS:
+                oldest = next(iter(self.connections))
+                self.connections.pop(oldest).close()
+        self.connections[day] = connection
+        return connection
+
+    def _create_full_text(self, connection, day):
+        """Создание полнотекстового индекса файла суток с заполнением по уже записанным событиям"""
+        exists = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'events_fts'").fetchone()
+        if exists:
+            return
+        started = time.perf_counter()
+        with connection:
+            connection.executescript(FULL_TEXT_SCHEMA)
+            indexed = connection.execute(FULL_TEXT_BACKFILL).rowcount
+            connection.execute('PRAGMA user_version=0')
+        if indexed > 0:
+            logger.info(f"Построен полнотекстовый индекс файла хранилища за {day} (событий: {indexed}) "
+                        f"за {time.perf_counter() - started:.2f} с")
+
+    def append(self, events):
+        """
+        Запись пачки событий
+
+        Args:
+            events (list): События
+
+        Returns:
+            int: Количество записанных событий
+        """
+        started = time.perf_counter()
+        today = datetime.now().strftime('%Y-%m-%d')
+
+        by_day = {}
+        for event in events:
+            row = _event_row(event)
+            # События с неразобранным временем записываются в файл текущих суток
+            by_day.setdefault(_event_day(row[0]) or today, []).append((row, event))
+
+        with self.lock:
+            for day, items in by_day.items():
+                connection = self._writer(day)
+                with connection:
+                    connection.executemany(
+                        'INSERT INTO events (time, log_type, level, level_name, source, event_id, data) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)', [row for row, _ in items])
+                    if self.full_text:
+                        # Транзакция удерживает блокировку записи файла, поэтому номера пачки идут подряд
+                        last = connection.execute('SELECT max(seq) FROM events').fetchone()[0]
+                        connection.executemany(
+                            'INSERT INTO events_fts (rowid, message, source) VALUES (?, ?, ?)',
+                            [(seq, str(get_event_field(event, 'message')), row[4])
+                             for seq, (row, event) in enumerate(items, last - len(items) + 1)])
+                    # Файл с новыми событиями снова требует уплотнения
+                    connection.execute('PRAGMA user_version=0')
+                self.last_write[day] = time.time()
+
+        STORED_EVENTS.inc(len(events))
+        STORE_WRITE_TIME.observe(time.perf_counter() - started)
+        return len(events)
+
+    def query(self, start=None, end=None, log_type=None, level=None, source=None, event_id=None,
+              sort='-time', limit=100, cursor=None, text=None):
+        """
+        Выборка событий за период с фильтрацией
+
+        Просматриваются только файлы суток, попадающих в период, в порядке
+        сортировки; в каждом файле выборка идет по индексу до набора страницы.
+        Следующая страница запрашивается по курсору из результата.
+        При указании text события дополнительно отбираются полнотекстовым
+        индексом (синтаксис запроса см. build_match_query).
+
+        Args:
+            start (str, optional): Начало периода 'YYYY-MM-DD HH:MM:SS' (включительно)
+            end (str, optional): Конец периода (не включительно)
+            log_type (str, optional): Журнал
+            level (int, optional): Уровень события
+            source (str, optional): Источник
+            event_id (str, optional): Идентификатор события
+            sort (str): Порядок сортировки: 'time' или '-time'
+            limit (int): Размер страницы
+            cursor (str, optional): Курсор, полученный с предыдущей страницей
+            text (str, optional): Строка полнотекстового поиска по сообщению и источнику
+
+        Returns:
+            tuple: (список событий в формате JSON, курсор следующей страницы или None)
+
+        Raises:
+            ValueError: Если указан неизвестный порядок сортировки, некорректный курсор
+                или полнотекстовый поиск недоступен
+        """
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Неизвестный порядок сортировки: {sort}")
+        descending = sort.startswith('-')
+
+        conditions = []
+        params = []
+        if text is not None:
+            if not self.full_text:
+                raise ValueError("Полнотекстовый поиск в хранилище недоступен")
+            match = build_match_query(text)
+            if not match:
+                raise ValueError("В строке поиска нет слов")
+            conditions.append('seq IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)')
+            params.append(match)
+            started = time.perf_counter()
+        if start:
+            conditions.append('time >= ?')
+            params.append(start)
+        if end:
+            conditions.append('time < ?')
+            params.append(end)
+        for column, value in (('log_type', log_type), ('source', source), ('event_id', event_id)):
+            if value not in (None, ''):
+                conditions.append(f'{column} = ?')
+                params.append(str(value))
+        if level not in (None, ''):
+            conditions.append('level = ?')
+            params.append(int(level))
+
+        days = self.days()
+        if start:
+            days = [day for day in days if day >= start[:10]]
+        if end:
+            days = [day for day in days if day <= end[:10]]
+        if descending:
+            days.reverse()
+
+        # Курсор: сутки, время и номер последнего события предыдущей страницы
+        after = None
+        if cursor:
+            try:
+                cursor_day, cursor_time, cursor_seq = cursor.split('|')
+                after = (cursor_day, cursor_time, int(cursor_seq))
+            except ValueError:
+                raise ValueError(f"Некорректный курсор: {cursor}")
+            days = [day for day in days if (day <= cursor_day if descending else day >= cursor_day)]
+
+        direction = 'DESC' if descending else 'ASC'
+        comparison = '<' if descending else '>'
+        fragments = []
+        last = None
+        next_cursor = None
+
+        for day in days:
+            day_conditions = list(conditions)
+            day_params = list(params)
+            if after is not None and after[0] == day:
+                day_conditions.append(f'(time, seq) {comparison} (?, ?)')
+                day_params.extend(after[1:])
+
+            sql = 'SELECT seq, time, data FROM events'
+            if day_conditions:
+                sql += ' WHERE ' + ' AND '.join(day_conditions)
+            sql += f' ORDER BY time {direction}, seq {direction} LIMIT ?'
+            day_params.append(limit - len(fragments) + 1)
+
+            rows = self._read(day, sql, day_params)
+            for seq, event_time, data in rows:
+                if len(fragments) == limit:
+                    # Есть хотя бы одно событие после страницы
+                    next_cursor = '|'.join((last[0], last[1], str(last[2])))
+                    break
+                fragments.append(data)
+                last = (day, event_time, seq)
+            if next_cursor is not None:
+                break
+
+        if text is not None:
+            STORE_SEARCH_TIME.observe(time.perf_counter() - started)
+        return fragments, next_cursor
+
+    def iter_range(self, start=None, end=None, chunk_size=1000, sort='time', limit=None, **filters):
+        """
+        Последовательное чтение событий за период
+
+        Args:
+            start (str, optional): Начало периода (включительно)
+            end (str, optional): Конец периода (не включительно)
+            chunk_size (int): Размер пачки
+            sort (str): Порядок сортировки: 'time' или '-time'
+            limit (int, optional): Максимальное количество событий
+            **filters: Фильтры query (log_type, level, source, event_id, text)
+
+        Yields:
+            list: Пачка событий
+        """
+        cursor = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            fragments, cursor = self.query(start=start, end=end, sort=sort, limit=size,
+                                           cursor=cursor, **filters)
+            if fragments:
+                yield [json.loads(fragment) for fragment in fragments]
+            if cursor is None:
+                return
+            if remaining is not None:
+                remaining -= len(fragments)
+
+    def _read(self, day, sql, params):
+        """Выполнение запроса чтения к файлу суток (отдельное соединение на запрос)"""
+        path = self._day_path(day)
+        try:
+            connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=10.0)
+        except sqlite3.OperationalError:
+            # Файл удален обслуживанием между получением списка и чтением
+            return []
+        try:
+            return connection.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            # В только что созданном файле таблицы может еще не быть
+            logger.debug(f"Файл хранилища {path} пропущен: {str(e)}")
+            return []
+        finally:
+            connection.close()
+
+    def get_stats(self):
+        """
+        Состояние хранилища
+
+        Returns:
+            dict: Каталог, количество файлов суток, первые и последние сутки, общий размер
+        """
+        days = self.days()
+        return {
+            'directory': self.directory,
+            'days': len(days),
+            'first_day': days[0] if days else None,
+            'last_day': days[-1] if days else None,
+            'size': sum(self._file_size(day) for day in days),
+        }
+
+    def _file_size(self, day):
+        """Размер файла суток вместе с журналом WAL"""
+        size = 0
+        for suffix in ('', '-wal'):
+            try:
+                size += os.path.getsize(self._day_path(day) + suffix)
+            except OSError:
+                pass
+        return size
+
+    def _remove_day(self, day):
+        """Удаление файла суток (вызывается под блокировкой)"""
+        connection = self.connections.pop(day, None)
+        if connection is not None:
+            connection.close()
+        self.last_write.pop(day, None)
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(self._day_path(day) + suffix)
+            except FileNotFoundError:
+                pass
+        STORE_REMOVED_DAYS.inc()
+        logger.info(f"Удален файл хранилища за {day}")
+
+    def apply_retention(self):
+        """Удаление файлов старше срока хранения и самых старых файлов сверх ограничения размера"""
+        oldest_day = (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        with self.lock:
+            days = self.days()
+            for day in [day for day in days if day < oldest_day]:
+                self._remove_day(day)
+                days.remove(day)
+
+            total = sum(self._file_size(day) for day in days)
+            # Файл последних суток не удаляется, даже если он один превышает ограничение
+            while total > self.max_size and len(days) > 1:
+                day = days.pop(0)
+                total -= self._file_size(day)
+                self._remove_day(day)
+
+    def compact(self):
+        """
+        Уплотнение файлов прошедших суток
+
+        Файл, в который больше не ожидается запись, перестраивается (VACUUM),
+        журнал WAL переносится в основной файл, статистика индексов обновляется.
+        Уплотненные файлы отмечаются и повторно не обрабатываются, пока в них
+        не будут записаны новые события. Файлы, в которые писали в течение
+        COMPACT_GRACE секунд (например, запоздавшие события прошлых суток
+        после полуночи), пропускаются до следующего обслуживания.
+        Уплотнение идет под блокировкой хранилища, поэтому запись в тот же
+        файл дожидается его завершения, а не завершается ошибкой блокировки
+        SQLite.
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        for day in self.days():
+            if day >= today or time.time() - self._last_write_time(day) < COMPACT_GRACE:
+                continue
+            with self.lock:
+                connection = self.connections.pop(day, None)
+                if connection is None:
+                    connection = self._connect(self._day_path(day))
+                try:
+                    if connection.execute('PRAGMA user_version').fetchone()[0] == COMPACTED_VERSION:
+                        continue
+                    started = time.perf_counter()
+                    connection.execute('PRAGMA optimize')
+                    connection.execute('VACUUM')
+                    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                    connection.execute(f'PRAGMA user_version={COMPACTED_VERSION}')
+                    logger.info(f"Файл хранилища за {day} уплотнен за {time.perf_counter() - started:.2f} с")
+                except sqlite3.Error as e:
+                    logger.error(f"Ошибка при уплотнении файла хранилища за {day}: {str(e)}")
+                finally:
+                    connection.close()
+
+    def _last_write_time(self, day):
+        """Время последней записи в файл суток (после перезапуска - по времени изменения файлов)"""
+        with self.lock:
+            written = self.last_write.get(day)
+        if written is not None:
+            return written
+        path = self._day_path(day)
+        times = [os.path.getmtime(name) for name in (path, path + '-wal') if os.path.exists(name)]
+        return max(times, default=0)
+
+    def build_full_text(self):
+        """Построение полнотекстового индекса в файлах, записанных без него"""
+        if not self.full_text:
+            return
+        for day in self.days():
+            with self.lock:
+                # Индекс создается при открытии файла для записи
+                self._writer(day)
+
+    def run_maintenance(self):
+        """Обслуживание хранилища: сроки хранения, полнотекстовый индекс и уплотнение"""
+        try:
+            self.apply_retention()
+            self.build_full_text()
+            self.compact()
+        except Exception as e:
+            logger.error(f"Ошибка при обслуживании хранилища событий: {str(e)}")
+
+    def start_maintenance(self, interval=MAINTENANCE_INTERVAL):
+        """
+        Запуск фонового потока обслуживания
+
+        Args:
+            interval (float): Интервал обслуживания в секундах
+        """
+        if self.maintenance_thread and self.maintenance_thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.maintenance_thread = threading.Thread(target=self._maintenance_loop, args=(interval,))
+        self.maintenance_thread.daemon = True
+        self.maintenance_thread.start()
+
+    def _maintenance_loop(self, interval):
+        """Поток обслуживания хранилища"""
+        self.run_maintenance()
+        while not self.stop_event.wait(interval):
+            self.run_maintenance()
+
+    def close(self):
+        """Остановка обслуживания и закрытие файлов"""
+        self.stop_event.set()
+        if self.maintenance_thread and self.maintenance_thread.is_alive():
+            self.maintenance_thread.join(timeout=5.0)
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+
+class EventStoreSink:
+    """Приемник конвейера, записывающий пачки событий в локальное хранилище"""
+
+    def __init__(self, event_store):
+        """
+        Инициализация приемника
+
+        Args:
+            event_store (EventStore): Хранилище событий
+        """
+        self.event_store = event_store
+
+    def write(self, events, is_running):
+        """
+        Передача пачки событий
+
+        Args:
+            events (list): Список событий
+            is_running (function): Функция проверки, работает ли конвейер
+
+        Returns:
+            bool: Успешность записи
+        """
+        self.event_store.append(events)
+        return True
+
+    def describe(self):
+        """Описание приемника для просмотра состояния"""
+        return {'type': 'store', 'directory': self.event_store.directory}
+
+
+class EventStoreWriter:
+    """
+    Фоновая запись событий в хранилище для графического интерфейса.
+
+    Пачки передаются в очередь без ожидания, запись выполняет отдельный
+    поток, поэтому запись на диск не задерживает поток интерфейса.
+    """
+
+    # Максимальное количество пачек, ожидающих записи
+    MAX_PENDING_BATCHES = 100
+
+    def __init__(self, event_store):
+        """
+        Инициализация записи
+
+        Args:
+            event_store (EventStore): Хранилище событий
+        """
+        self.event_store = event_store
+        self.pending = []
+        self.condition = threading.Condition()
+        self.running = True
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._write_loop, name='event-store-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, events):
+        """
+        Постановка пачки событий в очередь записи
+
+        Args:
+            events (list): События
+        """
+        with self.condition:
+            if len(self.pending) >= self.MAX_PENDING_BATCHES:
+                # Диск не успевает за сбором: теряем пачку, но не блокируем интерфейс
+                self.dropped += len(events)
+                logger.warning(f"Очередь записи в хранилище переполнена, пропущено событий: {len(events)}")
+                return
+            self.pending.append(list(events))
+            self.condition.notify()
+
+    def _write_loop(self):
+        """Поток записи"""
+        while True:
+            with self.condition:
+                while not self.pending and self.running:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                batches = self.pending
+                self.pending = []
+
+            # Накопившиеся пачки записываются одной транзакцией на сутки
+            events = [event for batch in batches for event in batch]
+            try:
+                self.event_store.append(events)
+            except Exception as e:
+                logger.error(f"Ошибка при записи событий в хранилище: {str(e)}")
+
+    def close(self):
+        """Запись оставшихся пачек и остановка потока"""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=10.0)
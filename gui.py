@@ -8,28 +8,68 @@ import sys
 import datetime
 import time
 import json
+import threading
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QTabWidget, QLabel, QPushButton, QComboBox, 
-                            QCheckBox, QGroupBox, QTableWidget, QTableWidgetItem,
-                            QLineEdit, QTextEdit, QSpinBox, QFileDialog, 
+                            QCheckBox, QGroupBox, QTableView, QAbstractItemView,
+                            QLineEdit, QTextEdit, QPlainTextEdit, QSpinBox, QFileDialog, 
                             QMessageBox, QHeaderView, QSplitter, QMenu, QAction,
-                            QToolBar, QStatusBar, QDialog, QDialogButtonBox)
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QSize
-from PyQt5.QtGui import QIcon, QColor, QFont, QPixmap, QTextCursor
-import configparser
+                            QToolBar, QStatusBar, QDialog, QDialogButtonBox,
+                            QProgressDialog, QFormLayout, QDateTimeEdit)
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QSize, QDateTime
+from PyQt5.QtGui import QIcon, QColor, QFont, QPixmap, QTextCursor, QTextCharFormat
 import traceback
 
+from config_service import get_config_service
+from event_store import EventStore, EventStoreWriter
 from log_collector import LogCollector
+from log_export import FILE_FILTER, export_logs, iter_import, parse_file_name
+from log_table_model import LogTableModel, LogFilterProxyModel
+from metrics import REGISTRY
 from rabbitmq_client import RabbitMQClient
-from agent_logger import AgentLogger
+from agent_logger import AgentLogger, LogFileTail
 from resources.icons import get_icon
-from utils import create_default_config
+from rollups import EventRollups
+from utils import create_default_config, get_event_field
+
+# Метрики графического интерфейса
+GUI_EVENTS = REGISTRY.counter('gui_events', 'Количество событий, отображенных в графическом интерфейсе')
+GUI_BATCH_TIME = REGISTRY.histogram('gui_batch_seconds', 'Время обработки пачки событий в потоке интерфейса')
+
+# Интервал, за который события коллектора собираются в одну пачку для интерфейса (мс)
+BATCH_INTERVAL_MS = 50
+# Максимальный размер пачки: остаток обрабатывается на следующем срабатывании таймера
+MAX_BATCH_SIZE = 5000
+# Задержка поиска после последнего изменения текста запроса (мс)
+SEARCH_DEBOUNCE_MS = 200
+# Максимальное количество событий, показываемых при поиске в хранилище
+STORE_SEARCH_LIMIT = 10000
+# Файл агрегатов графического интерфейса в каталоге агрегатов (ядро ведет свой файл)
+ROLLUPS_FILE = 'gui.json'
+# Интервал опроса файла журнала агента (мс)
+AGENT_LOG_POLL_MS = 1000
+# Максимальное количество строк журнала агента в окне
+AGENT_LOG_MAX_LINES = 5000
+# Цвета строк журнала агента по уровню
+AGENT_LOG_COLORS = {
+    'ERROR': QColor(255, 0, 0),
+    'WARNING': QColor(255, 165, 0),
+    'INFO': QColor(0, 128, 0),
+}
+
 
 class LogCollectorThread(QThread):
-    """Поток для сбора логов"""
+    """
+    Поток для сбора логов.
+    
+    События накапливаются в буфере под блокировкой, интерфейс забирает их
+    пачкой. Сигнал batch_ready отправляется только при появлении событий
+    в пустом буфере, поэтому в очередь событий Qt попадает один вызов
+    на пачку, а не на каждое событие.
+    """
     
-    # Сигнал для передачи собранного лога
-    log_collected = pyqtSignal(dict)
+    # Сигнал о появлении событий в пустом буфере
+    batch_ready = pyqtSignal()
     
     def __init__(self, log_collector, log_types, hours_back):
         """
@@ -44,6 +84,8 @@ class LogCollectorThread(QThread):
         self.log_collector = log_collector
         self.log_types = log_types
         self.hours_back = hours_back
+        self._pending = []
+        self._lock = threading.Lock()
         
     def run(self):
         """Запуск потока сбора логов"""
@@ -55,7 +97,29 @@ class LogCollectorThread(QThread):
         
     def _on_log_collected(self, log_data):
         """Обработчик события сбора лога"""
-        self.log_collected.emit(log_data)
+        with self._lock:
+            self._pending.append(log_data)
+            first = len(self._pending) == 1
+        if first:
+            self.batch_ready.emit()
+            
+    def take_pending(self, max_count):
+        """
+        Получение накопленных событий с удалением их из буфера
+        
+        Args:
+            max_count (int): Максимальное количество событий
+        
+        Returns:
+            tuple: (события в порядке сбора, остались ли события в буфере)
+        """
+        with self._lock:
+            if len(self._pending) <= max_count:
+                pending, self._pending = self._pending, []
+                return pending, False
+            pending = self._pending[:max_count]
+            del self._pending[:max_count]
+            return pending, True
         
     def stop(self):
         """Остановка потока"""
@@ -63,6 +127,206 @@ class LogCollectorThread(QThread):
         self.wait()
 
 
+class SearchThread(QThread):
+    """
+    Поток текстового поиска по индексу событий.
+    
+    Выполняется только последний запрос: новый запрос отменяет выполняемый,
+    результат устаревшего запроса не отправляется.
+    """
+    
+    # Сигнал с результатом поиска: (поколение запроса, текст запроса, номера строк, количество строк в индексе)
+    results_ready = pyqtSignal(int, str, object, int)
+    
+    def __init__(self, search_index):
+        """
+        Инициализация потока
+        
+        Args:
+            search_index (SearchIndex): Индекс событий
+        """
+        super().__init__()
+        self.search_index = search_index
+        self.generation = 0
+        self._request = None
+        self._running = True
+        self._condition = threading.Condition()
+        
+    def request(self, query):
+        """
+        Запуск поиска (выполняемый поиск отменяется)
+        
+        Args:
+            query (str): Текст запроса
+            
+        Returns:
+            int: Поколение запроса
+        """
+        with self._condition:
+            self.generation += 1
+            self._request = (self.generation, query)
+            self._condition.notify()
+            return self.generation
+            
+    def cancel(self):
+        """Отмена выполняемого и ожидающего поиска"""
+        with self._condition:
+            self.generation += 1
+            self._request = None
+        
+    def run(self):
+        """Обработка запросов поиска"""
+        while True:
+            with self._condition:
+                while self._running and self._request is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                generation, query = self._request
+                self._request = None
+                
+            result = self.search_index.search(query, lambda: self.generation != generation)
+            if result is not None and generation == self.generation:
+                rows, limit = result
+                self.results_ready.emit(generation, query, rows, limit)
+                
+    def stop(self):
+        """Остановка потока"""
+        with self._condition:
+            self._running = False
+            self.generation += 1
+            self._condition.notify()
+        self.wait()
+
+
+class ExportThread(QThread):
+    """Поток экспорта событий в файл"""
+    
+    # Сигнал о ходе экспорта: (записано, всего)
+    progress = pyqtSignal(int, int)
+    # Сигнал о завершении: (экспорт завершен, сообщение об ошибке)
+    export_finished = pyqtSignal(bool, str)
+    
+    def __init__(self, events, file_path):
+        """
+        Инициализация потока
+        
+        Args:
+            events (SessionSnapshot): События для экспорта
+            file_path (str): Путь к файлу
+        """
+        super().__init__()
+        self.events = events
+        self.file_path = file_path
+        self._cancelled = threading.Event()
+        
+    def run(self):
+        """Запись событий в файл"""
+        try:
+            completed = export_logs(
+                self.events, self.file_path,
+                progress=self.progress.emit,
+                is_cancelled=self._cancelled.is_set
+            )
+            self.export_finished.emit(completed, '')
+        except Exception as e:
+            self.export_finished.emit(False, str(e))
+            
+    def cancel(self):
+        """Отмена экспорта"""
+        self._cancelled.set()
+
+
+class ImportThread(QThread):
+    """
+    Поток импорта событий из файла.
+    
+    Файл читается пачками, следующая пачка читается только после того,
+    как интерфейс обработал одну из ранее отправленных.
+    """
+    
+    # Размер пачки: обработка одной пачки в интерфейсе не должна быть заметна
+    BATCH_SIZE = 1000
+    # Количество пачек, которые могут ожидать обработки в интерфейсе
+    MAX_PENDING_BATCHES = 2
+    
+    # Сигнал с очередной пачкой событий
+    batch_loaded = pyqtSignal(object)
+    # Сигнал о завершении: (количество прочитанных событий, сообщение об ошибке)
+    import_finished = pyqtSignal(int, str)
+    
+    def __init__(self, file_path):
+        """
+        Инициализация потока
+        
+        Args:
+            file_path (str): Путь к файлу
+        """
+        super().__init__()
+        self.file_path = file_path
+        self._slots = threading.Semaphore(self.MAX_PENDING_BATCHES)
+        self._cancelled = threading.Event()
+        
+    def iter_batches(self):
+        """Пачки событий для загрузки"""
+        return iter_import(self.file_path, chunk_size=self.BATCH_SIZE)
+        
+    def run(self):
+        """Чтение событий из файла"""
+        count = 0
+        try:
+            for chunk in self.iter_batches():
+                # Ждем, пока интерфейс обработает предыдущие пачки
+                while not self._slots.acquire(timeout=0.1):
+                    if self._cancelled.is_set():
+                        break
+                if self._cancelled.is_set():
+                    break
+                self.batch_loaded.emit(chunk)
+                count += len(chunk)
+            self.import_finished.emit(count, '')
+        except Exception as e:
+            self.import_finished.emit(count, str(e))
+            
+    def batch_done(self):
+        """Уведомление об обработке пачки интерфейсом"""
+        self._slots.release()
+        
+    def cancel(self):
+        """Отмена импорта"""
+        self._cancelled.set()
+
+
+class HistoryThread(ImportThread):
+    """Поток загрузки событий за период из локального хранилища"""
+    
+    def __init__(self, event_store, start, end, text=None, sort='time', limit=None):
+        """
+        Инициализация потока
+        
+        Args:
+            event_store (EventStore): Хранилище событий
+            start (str): Начало периода 'YYYY-MM-DD HH:MM:SS'
+            end (str): Конец периода (не включительно)
+            text (str, optional): Строка полнотекстового поиска
+            sort (str): Порядок сортировки: 'time' или '-time'
+            limit (int, optional): Максимальное количество событий
+        """
+        super().__init__(None)
+        self.event_store = event_store
+        self.start_time = start
+        self.end_time = end
+        self.text = text
+        self.sort = sort
+        self.limit = limit
+        
+    def iter_batches(self):
+        """Пачки событий периода в заданном порядке"""
+        filters = {'text': self.text} if self.text else {}
+        return self.event_store.iter_range(self.start_time, self.end_time, chunk_size=self.BATCH_SIZE,
+                                           sort=self.sort, limit=self.limit, **filters)
+
+
 class MainWindow(QMainWindow):
     """Главное окно приложения"""
     
@@ -74,18 +338,45 @@ class MainWindow(QMainWindow):
         self.logger = AgentLogger().get_logger('gui')
         self.log_collector = LogCollector()
         self.rabbitmq_client = RabbitMQClient()
-        self.collected_logs = []
         self.collector_thread = None
+        self.export_thread = None
+        self.import_thread = None
+        
+        # Таймер объединения событий коллектора в пачки
+        self.batch_timer = QTimer(self)
+        self.batch_timer.setSingleShot(True)
+        self.batch_timer.setInterval(BATCH_INTERVAL_MS)
+        self.batch_timer.timeout.connect(self._drain_collected_logs)
         
         # Загрузка конфигурации
-        self.config = configparser.ConfigParser()
         self.config_path = 'config.ini'
         
         if not os.path.exists(self.config_path):
             self.logger.info("Файл конфигурации не найден, создаем новый")
             create_default_config(self.config_path)
             
-        self.config.read(self.config_path, encoding='utf-8')
+        self.config_service = get_config_service(self.config_path)
+        
+        # Локальное хранилище: собранные события записываются в него в фоновом потоке
+        self.event_store = None
+        self.store_writer = None
+        storage = self.config_service.config.storage
+        if storage.enabled:
+            try:
+                self.event_store = EventStore(storage.directory, retention_days=storage.retention_days,
+                                              max_size_mb=storage.max_size_mb, full_text=storage.full_text)
+                self.event_store.start_maintenance()
+                self.store_writer = EventStoreWriter(self.event_store)
+            except OSError as e:
+                self.logger.error(f"Не удалось открыть локальное хранилище событий: {str(e)}")
+        
+        # Агрегаты собранных событий по минутам и часам для строки состояния
+        self.rollups = None
+        rollups = self.config_service.config.rollups
+        if rollups.enabled:
+            self.rollups = EventRollups(os.path.join(rollups.directory, ROLLUPS_FILE))
+            self.rollups.load()
+            self.rollups.start_saving(rollups.save_interval)
         
         # Установка параметров окна
         self.setWindowTitle("Агент сбора системных логов Windows")
@@ -98,7 +389,7 @@ class MainWindow(QMainWindow):
         self._load_settings_from_config()
         
         # Автоматическое подключение к RabbitMQ, если указано в настройках
-        if self.config.getboolean('RabbitMQ', 'autoconnect', fallback=False):
+        if self.config_service.config.rabbitmq.autoconnect:
             self._connect_to_rabbitmq()
             
         self.logger.info("Приложение запущено")
@@ -144,6 +435,10 @@ class MainWindow(QMainWindow):
         self.rabbitmq_status_label = QLabel("RabbitMQ: Не подключен")
         self.statusBar.addPermanentWidget(self.rabbitmq_status_label)
         
+        # Количество событий за последние сутки по агрегатам
+        self.stats_status_label = QLabel()
+        self.statusBar.addPermanentWidget(self.stats_status_label)
+        
         # Таймер для обновления статуса
         self.status_timer = QTimer(self)
         self.status_timer.timeout.connect(self._update_status)
@@ -183,6 +478,15 @@ class MainWindow(QMainWindow):
         action_save.triggered.connect(self._save_logs_to_file)
         self.toolbar.addAction(action_save)
         
+        action_open = QAction(get_icon("open"), "Загрузить логи из файла", self)
+        action_open.triggered.connect(self._load_logs_from_file)
+        self.toolbar.addAction(action_open)
+        
+        action_history = QAction(get_icon("history"), "Загрузить события из хранилища за период", self)
+        action_history.triggered.connect(self._load_history_from_store)
+        action_history.setEnabled(self.event_store is not None)
+        self.toolbar.addAction(action_history)
+        
         self.toolbar.addSeparator()
         
         action_exit = QAction(get_icon("exit"), "Выход", self)
@@ -280,30 +584,56 @@ class MainWindow(QMainWindow):
         
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Введите текст для поиска...")
-        self.search_input.textChanged.connect(self._filter_logs)
+        # Поиск запускается после паузы в наборе текста
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self._filter_logs)
+        self.search_input.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_input)
         
         self.btn_clear_search = QPushButton("Очистить")
         self.btn_clear_search.clicked.connect(lambda: self.search_input.clear())
         search_layout.addWidget(self.btn_clear_search)
         
+        # Поиск по всем сохраненным событиям через полнотекстовый индекс хранилища
+        self.btn_search_store = QPushButton("Найти в хранилище")
+        self.btn_search_store.setToolTip(
+            "Все слова обязательны; \"текст в кавычках\" - фраза; служб* - слова с этим началом"
+        )
+        self.btn_search_store.clicked.connect(self._search_store)
+        self.btn_search_store.setEnabled(self.event_store is not None and self.event_store.full_text)
+        search_layout.addWidget(self.btn_search_store)
+        
         search_layout.addStretch()
         
         top_layout.addWidget(search_group)
         
         layout.addWidget(top_panel)
         
-        # Таблица с логами
-        self.logs_table = QTableWidget()
-        self.logs_table.setColumnCount(6)
-        self.logs_table.setHorizontalHeaderLabels([
-            "Время", "Уровень", "Источник", "Журнал", "ID", "Сообщение"
-        ])
+        # Таблица с логами: модель хранит события, прокси-модель фильтрует по тексту поиска
+        self.logs_model = LogTableModel(self)
+        self.logs_proxy = LogFilterProxyModel(self)
+        self.logs_proxy.setSourceModel(self.logs_model)
+        
+        # Поиск по индексу модели выполняется в отдельном потоке
+        self.search_thread = SearchThread(self.logs_model.search_index)
+        self.search_thread.results_ready.connect(self._on_search_results)
+        self.search_thread.start()
+        
+        self.logs_table = QTableView()
+        self.logs_table.setModel(self.logs_proxy)
+        self.logs_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.logs_table.setWordWrap(False)
+        # Фиксированная высота строк и ширина колонок: таблица не измеряет содержимое всех строк
+        self.logs_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.logs_table.verticalHeader().setDefaultSectionSize(
+            self.logs_table.fontMetrics().height() + 8
+        )
+        for column, width in enumerate((140, 120, 180, 120, 60)):
+            self.logs_table.setColumnWidth(column, width)
         # Растягиваем последнюю колонку
         self.logs_table.horizontalHeader().setSectionResizeMode(5, QHeaderView.Stretch)
-        # Устанавливаем ресайз для остальных колонок
-        for i in range(5):
-            self.logs_table.horizontalHeader().setSectionResizeMode(i, QHeaderView.ResizeToContents)
         
         # Контекстное меню для таблицы
         self.logs_table.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -446,13 +776,23 @@ class MainWindow(QMainWindow):
         """Инициализация вкладки журнала агента"""
         layout = QVBoxLayout(self.tab_agent_log)
         
-        # Текстовое поле для отображения журнала
-        self.agent_log_text = QTextEdit()
+        # Текстовое поле для отображения журнала: старые строки удаляются сверху
+        self.agent_log_text = QPlainTextEdit()
         self.agent_log_text.setReadOnly(True)
+        self.agent_log_text.setMaximumBlockCount(AGENT_LOG_MAX_LINES)
         font = QFont("Courier New", 10)
         self.agent_log_text.setFont(font)
         layout.addWidget(self.agent_log_text)
         
+        # Форматы строк по уровню
+        self.agent_log_formats = {}
+        for level, color in AGENT_LOG_COLORS.items():
+            text_format = QTextCharFormat()
+            text_format.setForeground(color)
+            self.agent_log_formats[f" - {level} - "] = text_format
+        self.agent_log_default_format = QTextCharFormat()
+        self.agent_log_default_format.setForeground(QColor(0, 0, 0))
+        
         # Кнопки управления
         buttons_layout = QHBoxLayout()
         
@@ -466,39 +806,45 @@ class MainWindow(QMainWindow):
         
         layout.addLayout(buttons_layout)
         
-        # Первоначальное заполнение журнала
+        # Журнал читается с места последнего опроса, новые строки дописываются в конец
+        self.agent_log_tail = LogFileTail(AgentLogger().get_log_file_path())
         self._refresh_agent_log()
         
+        self.agent_log_timer = QTimer(self)
+        self.agent_log_timer.timeout.connect(self._refresh_agent_log)
+        self.agent_log_timer.start(AGENT_LOG_POLL_MS)
+        
     def _load_settings_from_config(self):
         """Загрузка настроек из конфигурационного файла"""
         try:
+            # Файл перечитывается, только если он изменился с момента последней загрузки
+            self.config_service.reload()
+            config = self.config_service.config
+            
             # RabbitMQ настройки
-            self.rabbitmq_host.setText(self.config.get('RabbitMQ', 'host', fallback='localhost'))
-            self.rabbitmq_port.setValue(self.config.getint('RabbitMQ', 'port', fallback=5672))
-            self.rabbitmq_vhost.setText(self.config.get('RabbitMQ', 'vhost', fallback='/'))
-            self.rabbitmq_username.setText(self.config.get('RabbitMQ', 'username', fallback='guest'))
-            self.rabbitmq_password.setText(self.config.get('RabbitMQ', 'password', fallback='guest'))
-            self.rabbitmq_exchange.setText(self.config.get('RabbitMQ', 'exchange', fallback='windows_logs'))
-            self.rabbitmq_routing_key.setText(self.config.get('RabbitMQ', 'routing_key', fallback='system.logs'))
-            self.rabbitmq_autoconnect.setChecked(self.config.getboolean('RabbitMQ', 'autoconnect', fallback=False))
+            self.rabbitmq_host.setText(config.rabbitmq.host)
+            self.rabbitmq_port.setValue(config.rabbitmq.port)
+            self.rabbitmq_vhost.setText(config.rabbitmq.vhost)
+            self.rabbitmq_username.setText(config.rabbitmq.username)
+            self.rabbitmq_password.setText(config.rabbitmq.password)
+            self.rabbitmq_exchange.setText(config.rabbitmq.exchange)
+            self.rabbitmq_routing_key.setText(config.rabbitmq.routing_key)
+            self.rabbitmq_autoconnect.setChecked(config.rabbitmq.autoconnect)
             
             # Настройки логирования
-            self.log_dir.setText(self.config.get('Logging', 'directory', fallback='logs'))
+            self.log_dir.setText(config.logging.directory)
             
             # Настройки сбора логов
-            self.cb_system.setChecked(self.config.getboolean('Logs', 'system', fallback=True))
-            self.cb_application.setChecked(self.config.getboolean('Logs', 'application', fallback=True))
-            self.cb_security.setChecked(self.config.getboolean('Logs', 'security', fallback=False))
-            self.cb_setup.setChecked(self.config.getboolean('Logs', 'setup', fallback=False))
-            self.cb_dns.setChecked(self.config.getboolean('Logs', 'dns', fallback=False))
-            self.cb_active_directory.setChecked(self.config.getboolean('Logs', 'active_directory', fallback=False))
+            self.cb_system.setChecked("Система" in config.logs.types)
+            self.cb_application.setChecked("Приложение" in config.logs.types)
+            self.cb_security.setChecked("Безопасность" in config.logs.types)
+            self.cb_setup.setChecked("Настройка" in config.logs.types)
+            self.cb_dns.setChecked("Перенаправление DNS-сервера" in config.logs.types)
+            self.cb_active_directory.setChecked("Active Directory" in config.logs.types)
             
-            self.spin_hours.setValue(self.config.getint('Logs', 'hours_back', fallback=1))
-            
-            level_index = self.config.getint('Logs', 'level_filter', fallback=0)
-            self.combo_level.setCurrentIndex(level_index)
-            
-            self.chk_send_rabbitmq.setChecked(self.config.getboolean('Logs', 'send_to_rabbitmq', fallback=False))
+            self.spin_hours.setValue(config.logs.hours_back)
+            self.combo_level.setCurrentIndex(config.logs.level_filter)
+            self.chk_send_rabbitmq.setChecked(config.logs.send_to_rabbitmq)
             
             self.logger.info("Настройки загружены из конфигурационного файла")
             
@@ -509,43 +855,27 @@ class MainWindow(QMainWindow):
     def _save_settings(self):
         """Сохранение настроек в конфигурационный файл"""
         try:
-            # RabbitMQ настройки
-            if not self.config.has_section('RabbitMQ'):
-                self.config.add_section('RabbitMQ')
-                
-            self.config.set('RabbitMQ', 'host', self.rabbitmq_host.text())
-            self.config.set('RabbitMQ', 'port', str(self.rabbitmq_port.value()))
-            self.config.set('RabbitMQ', 'vhost', self.rabbitmq_vhost.text())
-            self.config.set('RabbitMQ', 'username', self.rabbitmq_username.text())
-            self.config.set('RabbitMQ', 'password', self.rabbitmq_password.text())
-            self.config.set('RabbitMQ', 'exchange', self.rabbitmq_exchange.text())
-            self.config.set('RabbitMQ', 'routing_key', self.rabbitmq_routing_key.text())
-            self.config.set('RabbitMQ', 'autoconnect', str(self.rabbitmq_autoconnect.isChecked()))
-            
-            # Настройки логирования
-            if not self.config.has_section('Logging'):
-                self.config.add_section('Logging')
-                
-            self.config.set('Logging', 'directory', self.log_dir.text())
-            
-            # Настройки сбора логов
-            if not self.config.has_section('Logs'):
-                self.config.add_section('Logs')
-                
-            self.config.set('Logs', 'system', str(self.cb_system.isChecked()))
-            self.config.set('Logs', 'application', str(self.cb_application.isChecked()))
-            self.config.set('Logs', 'security', str(self.cb_security.isChecked()))
-            self.config.set('Logs', 'setup', str(self.cb_setup.isChecked()))
-            self.config.set('Logs', 'dns', str(self.cb_dns.isChecked()))
-            self.config.set('Logs', 'active_directory', str(self.cb_active_directory.isChecked()))
-            
-            self.config.set('Logs', 'hours_back', str(self.spin_hours.value()))
-            self.config.set('Logs', 'level_filter', str(self.combo_level.currentIndex()))
-            self.config.set('Logs', 'send_to_rabbitmq', str(self.chk_send_rabbitmq.isChecked()))
-            
-            # Сохраняем конфигурацию в файл
-            with open(self.config_path, 'w', encoding='utf-8') as configfile:
-                self.config.write(configfile)
+            self.config_service.save({
+                'rabbitmq': {
+                    'host': self.rabbitmq_host.text(),
+                    'port': self.rabbitmq_port.value(),
+                    'vhost': self.rabbitmq_vhost.text(),
+                    'username': self.rabbitmq_username.text(),
+                    'password': self.rabbitmq_password.text(),
+                    'exchange': self.rabbitmq_exchange.text(),
+                    'routing_key': self.rabbitmq_routing_key.text(),
+                    'autoconnect': self.rabbitmq_autoconnect.isChecked()
+                },
+                'logging': {
+                    'directory': self.log_dir.text()
+                },
+                'logs': {
+                    'types': self._get_selected_log_types(),
+                    'hours_back': self.spin_hours.value(),
+                    'level_filter': self.combo_level.currentIndex(),
+                    'send_to_rabbitmq': self.chk_send_rabbitmq.isChecked()
+                }
+            })
                 
             self.logger.info("Настройки сохранены в конфигурационный файл")
             QMessageBox.information(self, "Сохранение настроек", "Настройки успешно сохранены")
@@ -620,23 +950,37 @@ class MainWindow(QMainWindow):
             self.logger.error(f"Ошибка при отключении от RabbitMQ: {str(e)}")
             QMessageBox.warning(self, "Ошибка", f"Ошибка при отключении от RabbitMQ: {str(e)}")
     
+    def _get_selected_log_types(self):
+        """
+        Получение списка выбранных журналов
+        
+        Returns:
+            list: Названия выбранных журналов на русском языке
+        """
+        log_types = []
+        if self.cb_system.isChecked():
+            log_types.append("Система")
+        if self.cb_application.isChecked():
+            log_types.append("Приложение")
+        if self.cb_security.isChecked():
+            log_types.append("Безопасность")
+        if self.cb_setup.isChecked():
+            log_types.append("Настройка")
+        if self.cb_dns.isChecked():
+            log_types.append("Перенаправление DNS-сервера")
+        if self.cb_active_directory.isChecked():
+            log_types.append("Active Directory")
+        return log_types
+    
     def _start_collecting(self):
         """Начало сбора логов"""
+        # Новый сбор очищает события, которые может читать поток экспорта
+        if self._is_exporting():
+            return
+            
         try:
             # Проверяем, что хотя бы один тип логов выбран
-            log_types = []
-            if self.cb_system.isChecked():
-                log_types.append("Система")
-            if self.cb_application.isChecked():
-                log_types.append("Приложение")
-            if self.cb_security.isChecked():
-                log_types.append("Безопасность")
-            if self.cb_setup.isChecked():
-                log_types.append("Настройка")
-            if self.cb_dns.isChecked():
-                log_types.append("Перенаправление DNS-сервера")
-            if self.cb_active_directory.isChecked():
-                log_types.append("Active Directory")
+            log_types = self._get_selected_log_types()
                 
             if not log_types:
                 QMessageBox.warning(self, "Внимание", "Необходимо выбрать хотя бы один тип логов")
@@ -651,14 +995,14 @@ class MainWindow(QMainWindow):
             self.status_label.setText("Статус: Сбор логов...")
             
             # Очищаем таблицу и список логов
-            self.logs_table.setRowCount(0)
-            self.collected_logs = []
+            self.logs_model.clear()
+            self._filter_logs()
             
             # Запускаем поток сбора логов
             self.collector_thread = LogCollectorThread(
                 self.log_collector, log_types, hours_back
             )
-            self.collector_thread.log_collected.connect(self._on_log_collected)
+            self.collector_thread.batch_ready.connect(self._schedule_drain)
             self.collector_thread.start()
             
             self.logger.info(f"Начат сбор логов типов: {', '.join(log_types)}")
@@ -677,6 +1021,11 @@ class MainWindow(QMainWindow):
                 self.status_label.setText("Статус: Остановка сбора логов...")
                 self.collector_thread.stop()
                 
+            # Забираем события, собранные до остановки
+            self.batch_timer.stop()
+            while self._drain_collected_logs():
+                pass
+                
             self.btn_start.setEnabled(True)
             self.btn_stop.setEnabled(False)
             self.status_label.setText("Статус: Сбор логов остановлен")
@@ -686,122 +1035,102 @@ class MainWindow(QMainWindow):
             self.logger.error(f"Ошибка при остановке сбора логов: {str(e)}")
             QMessageBox.warning(self, "Ошибка", f"Ошибка при остановке сбора логов: {str(e)}")
     
-    def _on_log_collected(self, log_data):
-        """Обработчик события сбора лога"""
+    def _schedule_drain(self):
+        """Запуск таймера сбора пачки, если он еще не запущен"""
+        if not self.batch_timer.isActive():
+            self.batch_timer.start()
+    
+    def _drain_collected_logs(self):
+        """
+        Обработка пачки событий, накопленных потоком сбора
+        
+        Returns:
+            bool: Остались ли необработанные события
+        """
+        if self.collector_thread is None:
+            return False
+            
+        batch, has_more = self.collector_thread.take_pending(MAX_BATCH_SIZE)
+        if batch:
+            self._on_logs_collected(batch)
+            
+        # Остаток обрабатываем на следующем срабатывании, чтобы интерфейс успевал перерисовываться
+        if has_more:
+            self.batch_timer.start()
+        return has_more
+    
+    def _on_logs_collected(self, batch):
+        """
+        Обработчик пачки собранных логов
+        
+        Args:
+            batch (list): События в порядке сбора
+        """
+        started = time.perf_counter()
         try:
+            # В хранилище записываются все собранные события независимо от фильтра
+            if self.store_writer is not None:
+                self.store_writer.put(batch)
+            if self.rollups is not None:
+                self.rollups.add(batch)
+                
             # Получаем выбранный уровень фильтрации
             level_filter = self.combo_level.currentText()
             
-            # Если выбран фильтр по уровню и уровень не соответствует
-            if level_filter != "Все" and log_data['уровень'] != level_filter:
+            # Отбрасываем события, уровень которых не соответствует фильтру
+            if level_filter != "Все":
+                batch = [log_data for log_data in batch
+                         if get_event_field(log_data, 'level') == level_filter]
+            if not batch:
                 return
                 
-            # Добавляем лог в список
-            self.collected_logs.append(log_data)
-            
-            # Добавляем строку в таблицу
-            row_position = self.logs_table.rowCount()
-            self.logs_table.insertRow(row_position)
-            
-            # Заполняем ячейки таблицы
-            self.logs_table.setItem(row_position, 0, QTableWidgetItem(log_data['время']))
+            # Добавляем логи в таблицу
+            self.logs_model.append_events(batch)
             
-            level_item = QTableWidgetItem(log_data['уровень'])
-            # Устанавливаем цвет в зависимости от уровня
-            if log_data['уровень'] == 'Ошибка':
-                level_item.setForeground(QColor(255, 0, 0))
-            elif log_data['уровень'] == 'Предупреждение':
-                level_item.setForeground(QColor(255, 165, 0))
-            elif log_data['уровень'] == 'Информация':
-                level_item.setForeground(QColor(0, 128, 0))
-            self.logs_table.setItem(row_position, 1, level_item)
-            
-            self.logs_table.setItem(row_position, 2, QTableWidgetItem(log_data['источник']))
-            self.logs_table.setItem(row_position, 3, QTableWidgetItem(log_data['журнал']))
-            self.logs_table.setItem(row_position, 4, QTableWidgetItem(str(log_data['id'])))
-            
-            # Сокращаем сообщение для отображения в таблице
-            message = log_data['сообщение']
-            if len(message) > 100:
-                message = message[:100] + "..."
-            self.logs_table.setItem(row_position, 5, QTableWidgetItem(message))
-            
-            # Отправляем в RabbitMQ, если включена опция
+            # Отправляем в RabbitMQ одной пачкой, если включена опция
             if self.chk_send_rabbitmq.isChecked() and self.rabbitmq_client.is_connected:
-                self.rabbitmq_client.publish_log(log_data)
+                self.rabbitmq_client.publish_logs(batch)
+            
+            GUI_EVENTS.inc(len(batch))
             
         except Exception as e:
-            self.logger.error(f"Ошибка при обработке собранного лога: {str(e)}")
+            self.logger.error(f"Ошибка при обработке собранных логов: {str(e)}")
+        finally:
+            GUI_BATCH_TIME.observe(time.perf_counter() - started)
     
     def _filter_logs(self):
         """Фильтрация логов по введенному тексту"""
-        search_text = self.search_input.text().lower()
+        self.search_timer.stop()
+        search_text = self.search_input.text()
         
         # Если текст поиска пустой, показываем все логи
         if not search_text:
-            self.logs_table.setRowCount(0)
-            for log_data in self.collected_logs:
-                row_position = self.logs_table.rowCount()
-                self.logs_table.insertRow(row_position)
-                
-                self.logs_table.setItem(row_position, 0, QTableWidgetItem(log_data['время']))
-                
-                level_item = QTableWidgetItem(log_data['уровень'])
-                if log_data['уровень'] == 'Ошибка':
-                    level_item.setForeground(QColor(255, 0, 0))
-                elif log_data['уровень'] == 'Предупреждение':
-                    level_item.setForeground(QColor(255, 165, 0))
-                elif log_data['уровень'] == 'Информация':
-                    level_item.setForeground(QColor(0, 128, 0))
-                self.logs_table.setItem(row_position, 1, level_item)
-                
-                self.logs_table.setItem(row_position, 2, QTableWidgetItem(log_data['источник']))
-                self.logs_table.setItem(row_position, 3, QTableWidgetItem(log_data['журнал']))
-                self.logs_table.setItem(row_position, 4, QTableWidgetItem(str(log_data['id'])))
-                
-                message = log_data['сообщение']
-                if len(message) > 100:
-                    message = message[:100] + "..."
-                self.logs_table.setItem(row_position, 5, QTableWidgetItem(message))
-            
+            self.search_thread.cancel()
+            self.logs_proxy.set_result('')
             return
             
-        # Фильтруем логи по тексту
-        self.logs_table.setRowCount(0)
-        for log_data in self.collected_logs:
-            # Проверяем наличие текста в каждом поле
-            if (search_text in str(log_data['id']).lower() or
-                search_text in log_data['уровень'].lower() or
-                search_text in log_data['источник'].lower() or
-                search_text in log_data['журнал'].lower() or
-                search_text in log_data['сообщение'].lower()):
-                
-                row_position = self.logs_table.rowCount()
-                self.logs_table.insertRow(row_position)
-                
-                self.logs_table.setItem(row_position, 0, QTableWidgetItem(log_data['время']))
-                
-                level_item = QTableWidgetItem(log_data['уровень'])
-                if log_data['уровень'] == 'Ошибка':
-                    level_item.setForeground(QColor(255, 0, 0))
-                elif log_data['уровень'] == 'Предупреждение':
-                    level_item.setForeground(QColor(255, 165, 0))
-                elif log_data['уровень'] == 'Информация':
-                    level_item.setForeground(QColor(0, 128, 0))
-                self.logs_table.setItem(row_position, 1, level_item)
-                
-                self.logs_table.setItem(row_position, 2, QTableWidgetItem(log_data['источник']))
-                self.logs_table.setItem(row_position, 3, QTableWidgetItem(log_data['журнал']))
-                self.logs_table.setItem(row_position, 4, QTableWidgetItem(str(log_data['id'])))
-                
-                message = log_data['сообщение']
-                if len(message) > 100:
-                    message = message[:100] + "..."
-                self.logs_table.setItem(row_position, 5, QTableWidgetItem(message))
+        self.search_thread.request(search_text)
+    
+    def _on_search_results(self, generation, query, rows, limit):
+        """Установка результата поиска, если запрос еще актуален"""
+        if generation != self.search_thread.generation:
+            return
+        self.logs_proxy.set_result(query, rows, limit)
+    
+    def _is_exporting(self):
+        """Проверка, выполняется ли сохранение логов (показывает предупреждение)"""
+        if self.export_thread and self.export_thread.isRunning():
+            QMessageBox.warning(self, "Внимание", "Дождитесь завершения сохранения логов в файл")
+            return True
+        return False
     
     def _clear_logs(self):
         """Очистка собранных логов"""
-        if self.collected_logs:
+        # Очистка удаляет файлы сегментов, которые читает поток экспорта
+        if self._is_exporting():
+            return
+            
+        if self.logs_model.events:
             reply = QMessageBox.question(
                 self, "Очистка логов",
                 "Вы уверены, что хотите очистить все собранные логи?",
@@ -809,78 +1138,238 @@ class MainWindow(QMainWindow):
             )
             
             if reply == QMessageBox.Yes:
-                self.logs_table.setRowCount(0)
-                self.collected_logs = []
+                self.logs_model.clear()
+                self._filter_logs()
                 self.logger.info("Собранные логи очищены")
     
     def _save_logs_to_file(self):
-        """Сохранение логов в файл"""
-        if not self.collected_logs:
+        """Сохранение логов в файл (запись выполняется в отдельном потоке)"""
+        if not self.logs_model.events:
             QMessageBox.warning(self, "Внимание", "Нет собранных логов для сохранения")
             return
             
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "Сохранить логи", "", "JSON Files (*.json);;CSV Files (*.csv);;Text Files (*.txt)"
+        if self.export_thread and self.export_thread.isRunning():
+            QMessageBox.warning(self, "Внимание", "Сохранение логов уже выполняется")
+            return
+            
+        file_path, _ = QFileDialog.getSaveFileName(self, "Сохранить логи", "", FILE_FILTER)
+        
+        if not file_path:
+            return
+            
+        try:
+            # Проверяем формат до запуска потока
+            parse_file_name(file_path)
+        except ValueError as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить логи в файл: {str(e)}")
+            return
+            
+        # Поток пишет представление событий, собранных к этому моменту: новые события
+        # в файл не попадают, а очистка и новый сбор запрещены до завершения экспорта
+        events = self.logs_model.events.snapshot()
+        
+        progress_dialog = QProgressDialog("Сохранение логов...", "Отмена", 0, len(events), self)
+        progress_dialog.setWindowTitle("Сохранение логов")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        self.export_thread = ExportThread(events, file_path)
+        self.export_thread.progress.connect(lambda done, total: progress_dialog.setValue(done))
+        progress_dialog.canceled.connect(self.export_thread.cancel)
+        self.export_thread.export_finished.connect(
+            lambda completed, error: self._on_export_finished(progress_dialog, file_path, completed, error)
         )
+        self.export_thread.start()
+    
+    def _on_export_finished(self, progress_dialog, file_path, completed, error):
+        """Обработка завершения экспорта"""
+        progress_dialog.reset()
+        
+        if error:
+            self.logger.error(f"Ошибка при сохранении логов в файл: {error}")
+            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить логи в файл: {error}")
+        elif completed:
+            self.logger.info(f"Логи сохранены в файл: {file_path}")
+            QMessageBox.information(self, "Сохранение логов", f"Логи успешно сохранены в файл:\n{file_path}")
+        else:
+            self.status_label.setText("Статус: Сохранение логов отменено")
+    
+    def _load_logs_from_file(self):
+        """Загрузка ранее сохраненных логов (чтение выполняется в отдельном потоке пачками)"""
+        if self.import_thread and self.import_thread.isRunning():
+            QMessageBox.warning(self, "Внимание", "Загрузка логов уже выполняется")
+            return
+            
+        file_path, _ = QFileDialog.getOpenFileName(self, "Загрузить логи", "", FILE_FILTER)
         
         if not file_path:
             return
             
+        # Количество событий в файле заранее неизвестно, поэтому индикатор без шкалы
+        progress_dialog = QProgressDialog("Загрузка логов...", "Отмена", 0, 0, self)
+        progress_dialog.setWindowTitle("Загрузка логов")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        self.import_thread = ImportThread(file_path)
+        self.import_thread.batch_loaded.connect(
+            lambda batch: self._on_imported_batch(progress_dialog, batch)
+        )
+        progress_dialog.canceled.connect(self.import_thread.cancel)
+        self.import_thread.import_finished.connect(
+            lambda count, error: self._on_import_finished(progress_dialog, file_path, count, error)
+        )
+        self.import_thread.start()
+    
+    def _on_imported_batch(self, progress_dialog, batch):
+        """Добавление в таблицу пачки загруженных событий"""
         try:
-            # Определяем формат файла по расширению
-            ext = file_path.split('.')[-1].lower()
+            self.logs_model.append_events(batch)
+            progress_dialog.setLabelText(f"Загрузка логов... ({len(self.logs_model.events)})")
+        finally:
+            self.import_thread.batch_done()
+    
+    def _on_import_finished(self, progress_dialog, file_path, count, error):
+        """Обработка завершения импорта"""
+        progress_dialog.reset()
+        
+        if error:
+            self.logger.error(f"Ошибка при загрузке логов из файла: {error}")
+            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить логи из файла: {error}")
+        else:
+            self.logger.info(f"Загружено {count} событий из файла: {file_path}")
+            self.status_label.setText(f"Статус: Загружено логов из файла: {count}")
+    
+    def _load_history_from_store(self):
+        """Загрузка в таблицу событий за период из локального хранилища"""
+        if self.import_thread and self.import_thread.isRunning():
+            QMessageBox.warning(self, "Внимание", "Загрузка логов уже выполняется")
+            return
             
-            if ext == 'json':
-                # Сохраняем в JSON
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.collected_logs, f, ensure_ascii=False, indent=4)
-                    
-            elif ext == 'csv':
-                # Сохраняем в CSV
-                import csv
-                with open(file_path, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    # Записываем заголовки
-                    writer.writerow(['ID', 'Уровень', 'Время', 'Источник', 'Категория', 
-                                     'Сообщение', 'Компьютер', 'Журнал'])
-                    # Записываем данные
-                    for log in self.collected_logs:
-                        writer.writerow([
-                            log['id'], log['уровень'], log['время'], log['источник'],
-                            log['категория'], log['сообщение'], log['компьютер'], log['журнал']
-                        ])
-                        
-            elif ext == 'txt':
-                # Сохраняем в текстовый файл
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    for log in self.collected_logs:
-                        f.write(f"ID: {log['id']}\n")
-                        f.write(f"Уровень: {log['уровень']}\n")
-                        f.write(f"Время: {log['время']}\n")
-                        f.write(f"Источник: {log['источник']}\n")
-                        f.write(f"Категория: {log['категория']}\n")
-                        f.write(f"Журнал: {log['журнал']}\n")
-                        f.write(f"Компьютер: {log['компьютер']}\n")
-                        f.write(f"Сообщение: {log['сообщение']}\n")
-                        f.write("-" * 50 + "\n")
+        # Диалог выбора периода (по умолчанию - последние сутки)
+        dialog = QDialog(self)
+        dialog.setWindowTitle("События из хранилища")
+        layout = QFormLayout(dialog)
+        
+        now = QDateTime.currentDateTime()
+        start_edit = QDateTimeEdit(now.addDays(-1))
+        end_edit = QDateTimeEdit(now)
+        for edit in (start_edit, end_edit):
+            edit.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+            edit.setCalendarPopup(True)
+        layout.addRow("С:", start_edit)
+        layout.addRow("По:", end_edit)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addRow(button_box)
+        
+        if dialog.exec_() != QDialog.Accepted:
+            return
             
-            else:
-                raise ValueError(f"Неподдерживаемый формат файла: {ext}")
+        start = start_edit.dateTime().toString("yyyy-MM-dd HH:mm:ss")
+        end = end_edit.dateTime().toString("yyyy-MM-dd HH:mm:ss")
+        
+        progress_dialog = QProgressDialog("Загрузка событий из хранилища...", "Отмена", 0, 0, self)
+        progress_dialog.setWindowTitle("Загрузка событий")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+        
+        self.import_thread = HistoryThread(self.event_store, start, end)
+        self.import_thread.batch_loaded.connect(
+            lambda batch: self._on_imported_batch(progress_dialog, batch)
+        )
+        progress_dialog.canceled.connect(self.import_thread.cancel)
+        self.import_thread.import_finished.connect(
+            lambda count, error: self._on_history_loaded(progress_dialog, start, end, count, error)
+        )
+        self.import_thread.start()
+    
+    def _on_history_loaded(self, progress_dialog, start, end, count, error):
+        """Обработка завершения загрузки событий из хранилища"""
+        progress_dialog.reset()
+        
+        if error:
+            self.logger.error(f"Ошибка при загрузке событий из хранилища: {error}")
+            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить события из хранилища: {error}")
+        else:
+            self.logger.info(f"Загружено {count} событий из хранилища за период {start} - {end}")
+            self.status_label.setText(f"Статус: Загружено событий из хранилища: {count}")
+    
+    def _search_store(self):
+        """Поиск текста запроса по всем событиям локального хранилища"""
+        query = self.search_input.text().strip()
+        if not query:
+            QMessageBox.warning(self, "Внимание", "Введите текст для поиска")
+            return
+            
+        # Результаты показываются в отдельном окне, таблица текущего сеанса не меняется
+        dialog = QDialog(self)
+        dialog.setWindowTitle(f"Поиск в хранилище: {query}")
+        dialog.resize(1000, 500)
+        layout = QVBoxLayout(dialog)
+        
+        status_label = QLabel("Поиск...")
+        layout.addWidget(status_label)
+        
+        model = LogTableModel(dialog)
+        table = QTableView()
+        table.setModel(model)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setWordWrap(False)
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        table.verticalHeader().setDefaultSectionSize(table.fontMetrics().height() + 8)
+        for column, width in enumerate((140, 120, 180, 120, 60)):
+            table.setColumnWidth(column, width)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.doubleClicked.connect(lambda index: self._show_log_details(index.row(), model))
+        layout.addWidget(table)
+        
+        button_box = QDialogButtonBox(QDialogButtonBox.Close)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box)
+        
+        started = time.perf_counter()
+        search_thread = HistoryThread(self.event_store, None, None, text=query, sort='-time',
+                                      limit=STORE_SEARCH_LIMIT)
+        
+        def on_batch(batch):
+            try:
+                model.append_events(batch)
+                status_label.setText(f"Найдено событий: {len(model.events)}...")
+            finally:
+                search_thread.batch_done()
                 
-            self.logger.info(f"Логи сохранены в файл: {file_path}")
-            QMessageBox.information(self, "Сохранение логов", f"Логи успешно сохранены в файл:\n{file_path}")
+        def on_finished(count, error):
+            if error:
+                self.logger.error(f"Ошибка при поиске в хранилище: {error}")
+                status_label.setText(f"Ошибка поиска: {error}")
+                return
+            elapsed = time.perf_counter() - started
+            text = f"Найдено событий: {count} за {elapsed:.2f} с (новые первыми)"
+            if count >= STORE_SEARCH_LIMIT:
+                text += f"; показаны последние {STORE_SEARCH_LIMIT}, уточните запрос"
+            status_label.setText(text)
+            self.logger.info(f"Поиск в хранилище '{query}': найдено {count} событий за {elapsed:.2f} с")
             
-        except Exception as e:
-            self.logger.error(f"Ошибка при сохранении логов в файл: {str(e)}")
-            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить логи в файл: {str(e)}")
+        search_thread.batch_loaded.connect(on_batch)
+        search_thread.import_finished.connect(on_finished)
+        search_thread.start()
+        
+        dialog.exec_()
+        
+        search_thread.cancel()
+        search_thread.wait()
+        model.close()
     
     def _show_log_context_menu(self, position):
         """Отображение контекстного меню для таблицы логов"""
         # Создаем меню
         menu = QMenu()
         
-        # Получаем текущую строку
-        current_row = self.logs_table.currentRow()
+        # Получаем строку исходной модели для выбранной строки таблицы
+        current_row = self.logs_proxy.mapToSource(self.logs_table.currentIndex()).row()
         
         if current_row >= 0:
             # Добавляем действие для просмотра подробной информации
@@ -902,12 +1391,11 @@ class MainWindow(QMainWindow):
         # Показываем меню
         menu.exec_(self.logs_table.viewport().mapToGlobal(position))
     
-    def _show_log_details(self, row):
-        """Отображение подробной информации о логе"""
-        if row < 0 or row >= len(self.collected_logs):
+    def _show_log_details(self, row, model=None):
+        """Отображение подробной информации о логе (по умолчанию из таблицы текущего сеанса)"""
+        log_data = (model if model is not None else self.logs_model).event_at(row)
+        if log_data is None:
             return
-            
-        log_data = self.collected_logs[row]
         
         # Создаем диалог
         dialog = QDialog(self)
@@ -923,15 +1411,15 @@ class MainWindow(QMainWindow):
         
         # Форматируем текст
         html = "<h3>Подробная информация о событии</h3>"
-        html += f"<p><b>ID события:</b> {log_data['id']}</p>"
-        html += f"<p><b>Уровень:</b> {log_data['уровень']}</p>"
-        html += f"<p><b>Время:</b> {log_data['время']}</p>"
-        html += f"<p><b>Источник:</b> {log_data['источник']}</p>"
-        html += f"<p><b>Категория:</b> {log_data['категория']}</p>"
-        html += f"<p><b>Журнал:</b> {log_data['журнал']}</p>"
-        html += f"<p><b>Компьютер:</b> {log_data['компьютер']}</p>"
+        html += f"<p><b>ID события:</b> {get_event_field(log_data, 'id')}</p>"
+        html += f"<p><b>Уровень:</b> {get_event_field(log_data, 'level')}</p>"
+        html += f"<p><b>Время:</b> {get_event_field(log_data, 'time')}</p>"
+        html += f"<p><b>Источник:</b> {get_event_field(log_data, 'source')}</p>"
+        html += f"<p><b>Категория:</b> {get_event_field(log_data, 'category')}</p>"
+        html += f"<p><b>Журнал:</b> {get_event_field(log_data, 'journal')}</p>"
+        html += f"<p><b>Компьютер:</b> {get_event_field(log_data, 'computer')}</p>"
         html += "<p><b>Сообщение:</b></p>"
-        html += f"<pre>{log_data['сообщение']}</pre>"
+        html += f"<pre>{get_event_field(log_data, 'message')}</pre>"
         
         text_edit.setHtml(html)
         layout.addWidget(text_edit)
@@ -946,27 +1434,26 @@ class MainWindow(QMainWindow):
     
     def _copy_log_message(self, row):
         """Копирование сообщения в буфер обмена"""
-        if row < 0 or row >= len(self.collected_logs):
+        log_data = self.logs_model.event_at(row)
+        if log_data is None:
             return
-            
-        log_data = self.collected_logs[row]
         
         # Копируем сообщение в буфер обмена
         from PyQt5.QtGui import QGuiApplication
-        QGuiApplication.clipboard().setText(log_data['сообщение'])
+        QGuiApplication.clipboard().setText(get_event_field(log_data, 'message'))
         
         self.status_label.setText("Сообщение скопировано в буфер обмена")
     
     def _send_log_to_rabbitmq(self, row):
         """Отправка лога в RabbitMQ"""
-        if row < 0 or row >= len(self.collected_logs):
+        log_data = self.logs_model.event_at(row)
+        if log_data is None:
             return
             
         if not self.rabbitmq_client.is_connected:
             QMessageBox.warning(self, "Ошибка", "Необходимо подключиться к RabbitMQ")
             return
             
-        log_data = self.collected_logs[row]
         
         # Отправляем лог
         if self.rabbitmq_client.publish_log(log_data):
@@ -975,32 +1462,38 @@ class MainWindow(QMainWindow):
             self.status_label.setText("Ошибка отправки лога в RabbitMQ")
     
     def _refresh_agent_log(self):
-        """Обновление журнала агента"""
+        """Добавление новых строк журнала агента"""
         try:
-            # Получаем записи журнала
-            log_entries = AgentLogger().get_log_entries(max_entries=1000)
+            lines = self.agent_log_tail.read_lines()
+            if not lines:
+                return
+                
+            # Строки сверх лимита все равно были бы удалены
+            lines = lines[-AGENT_LOG_MAX_LINES:]
             
-            # Очищаем текстовое поле
-            self.agent_log_text.clear()
+            scroll_bar = self.agent_log_text.verticalScrollBar()
+            at_bottom = scroll_bar.value() == scroll_bar.maximum()
             
-            # Заполняем текстовое поле
-            for entry in log_entries:
-                # Раскрашиваем в зависимости от уровня
-                if " - ERROR - " in entry:
-                    self.agent_log_text.setTextColor(QColor(255, 0, 0))
-                elif " - WARNING - " in entry:
-                    self.agent_log_text.setTextColor(QColor(255, 165, 0))
-                elif " - INFO - " in entry:
-                    self.agent_log_text.setTextColor(QColor(0, 128, 0))
-                else:
-                    self.agent_log_text.setTextColor(QColor(0, 0, 0))
-                    
-                self.agent_log_text.append(entry)
-                
-            # Прокручиваем до конца
-            cursor = self.agent_log_text.textCursor()
+            # Все строки вставляются одной операцией редактирования документа
+            cursor = QTextCursor(self.agent_log_text.document())
             cursor.movePosition(QTextCursor.End)
-            self.agent_log_text.setTextCursor(cursor)
+            cursor.beginEditBlock()
+            for line in lines:
+                # Раскрашиваем в зависимости от уровня
+                text_format = self.agent_log_default_format
+                for marker, level_format in self.agent_log_formats.items():
+                    if marker in line:
+                        text_format = level_format
+                        break
+                        
+                if not self.agent_log_text.document().isEmpty():
+                    cursor.insertBlock()
+                cursor.insertText(line, text_format)
+            cursor.endEditBlock()
+            
+            # Прокручиваем до конца, если пользователь не листает журнал выше
+            if at_bottom:
+                scroll_bar.setValue(scroll_bar.maximum())
             
         except Exception as e:
             self.logger.error(f"Ошибка при обновлении журнала агента: {str(e)}")
@@ -1019,15 +1512,41 @@ class MainWindow(QMainWindow):
             self.btn_connect.setEnabled(True)
             self.btn_disconnect.setEnabled(False)
             
-        # Обновляем счетчик логов
-        if self.collected_logs:
-            self.status_label.setText(f"Статус: Собрано логов: {len(self.collected_logs)}")
+        # Обновляем количество событий за сутки по агрегатам
+        if self.rollups is not None:
+            try:
+                stats = self.rollups.query(resolution='hour')
+                errors = self.rollups.query(resolution='hour', level='Ошибка')['total']
+                self.stats_status_label.setText(f"За 24 ч: {stats['total']} событий, ошибок: {errors}")
+            except Exception as e:
+                self.logger.error(f"Ошибка при получении статистики событий: {str(e)}")
         
     def closeEvent(self, event):
         """Обработка события закрытия окна"""
         # Останавливаем сбор логов если он запущен
         if self.collector_thread and self.collector_thread.isRunning():
             self.collector_thread.stop()
+        self.batch_timer.stop()
+        self.agent_log_timer.stop()
+        self.agent_log_tail.close()
+        self.search_thread.stop()
+        
+        # Прерываем экспорт и импорт (незавершенный файл экспорта удаляется)
+        for thread in (self.export_thread, self.import_thread):
+            if thread and thread.isRunning():
+                thread.cancel()
+                thread.wait()
+        
+        # Удаляем файлы событий, вытесненных на диск
+        self.logs_model.close()
+        
+        # Дописываем собранные события в хранилище
+        if self.store_writer is not None:
+            self.store_writer.close()
+        if self.event_store is not None:
+            self.event_store.close()
+        if self.rollups is not None:
+            self.rollups.close()
             
         # Отключаемся от RabbitMQ
         if self.rabbitmq_client.is_connected:
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Настройки gunicorn.
+
+Перед запуском рабочих процессов мастер запускает отдельный процесс ядра
+агента (agent_core.py) и передает путь к его Unix-сокету через переменную
+окружения AGENT_CORE_SOCKET. Рабочие процессы наследуют переменную и
+обращаются к общему ядру, поэтому подключение к RabbitMQ и буфер событий
+не дублируются при увеличении числа рабочих процессов.
+
+Если переменная AGENT_CORE_SOCKET задана заранее, считается, что ядро
+запущено отдельно, и мастер его не запускает.
+"""
+
+import os
+import sys
+import tempfile
+import subprocess
+
+# Потоковая передача событий (SSE) держит запрос открытым, поэтому
+# рабочим процессам нужны потоки для обслуживания остальных запросов
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+_agent_core = None
+
+
+def on_starting(server):
+    """Запуск процесса ядра агента до создания рабочих процессов"""
+    global _agent_core
+
+    if os.environ.get('AGENT_CORE_SOCKET'):
+        server.log.info(f"Используется внешнее ядро агента: {os.environ['AGENT_CORE_SOCKET']}")
+        return
+
+    socket_path = os.path.join(tempfile.gettempdir(), f'log_agent_core_{os.getpid()}.sock')
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_core.py')
+    _agent_core = subprocess.Popen([sys.executable, script, '--socket', socket_path])
+    os.environ['AGENT_CORE_SOCKET'] = socket_path
+    server.log.info(f"Запущено ядро агента (pid {_agent_core.pid}), сокет: {socket_path}")
+
+
+def on_exit(server):
+    """Остановка процесса ядра агента вместе с мастером"""
+    if _agent_core is None or _agent_core.poll() is not None:
+        return
+
+    _agent_core.terminate()
+    try:
+        _agent_core.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        _agent_core.kill()
@@ -10,10 +10,14 @@ import datetime
 import threading
 import time
 from agent_logger import AgentLogger
+from metrics import REGISTRY
 
 # Инициализируем логгер
 logger = AgentLogger().get_logger('log_collector')
 
+# Метрики коллектора
+COLLECTED_EVENTS = REGISTRY.counter('collector_events', 'Количество собранных событий по журналам', ('channel',))
+
 class LogCollector:
     """Класс для сбора системных логов Windows"""
     
@@ -42,6 +46,7 @@ class LogCollector:
         self.offsets_file = 'offsets.json'
         self.is_collecting = False
         self.collect_thread = None
+        self.collected_count = 0  # количество собранных событий с момента запуска агента
         
         # Загрузка последних смещений
         self._load_offsets()
@@ -240,6 +245,8 @@ class LogCollector:
         num_events = 15  # количество событий для генерации
         time_range = (end_time - start_time).total_seconds()
         
+        collected_metric = COLLECTED_EVENTS.labels(log_type)
+        
         import random
         for i in range(num_events):
             # Проверка флага остановки
@@ -264,6 +271,9 @@ class LogCollector:
                 'message': random.choice(samples) if samples else f"Событие в журнале {log_type}"
             }
             
+            self.collected_count += 1
+            collected_metric.inc()
+            
             # Отправляем событие через callback, если он задан
             if callback:
                 callback(event)
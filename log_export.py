@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковый экспорт и импорт собранных событий
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:
+    # Сжатие zstd необязательно, без модуля доступен только gzip
+    zstandard = None
+
+from agent_logger import AgentLogger
+from event_archive import ARCHIVE_FORMATS, ArchiveWriter, archive_format, check_archive_format, iter_archive
+from utils import get_event_field, iter_json_stream
+
+logger = AgentLogger().get_logger('log_export')
+
+# Количество событий, записываемых или читаемых за один шаг
+CHUNK_SIZE = 5000
+
+# Размер блока чтения JSON-массива при импорте
+JSON_READ_SIZE = 256 * 1024
+
+# Количество некорректных элементов, о которых при импорте пишется в журнал
+MAX_LOGGED_ERRORS = 10
+
+# Столбцы CSV: заголовок и поле события
+CSV_COLUMNS = [
+    ('ID', 'id'),
+    ('Уровень', 'level'),
+    ('Время', 'time'),
+    ('Источник', 'source'),
+    ('Категория', 'category'),
+    ('Сообщение', 'message'),
+    ('Компьютер', 'computer'),
+    ('Журнал', 'journal'),
+]
+
+# Ключи, под которыми поля CSV восстанавливаются при импорте
+CSV_IMPORT_KEYS = {
+    'ID': 'id',
+    'Уровень': 'уровень',
+    'Время': 'время',
+    'Источник': 'источник',
+    'Категория': 'категория',
+    'Сообщение': 'сообщение',
+    'Компьютер': 'компьютер',
+    'Журнал': 'журнал',
+}
+
+# Фильтр диалога выбора файла
+FILE_FILTER = (
+    "JSON Files (*.json);;"
+    "NDJSON Files (*.ndjson *.jsonl);;"
+    "NDJSON gzip (*.ndjson.gz);;"
+    "NDJSON zstd (*.ndjson.zst);;"
+    "CSV Files (*.csv);;"
+    "CSV gzip (*.csv.gz);;"
+    "CSV zstd (*.csv.zst);;"
+    "Columnar archive (*.evc);;"
+    "Parquet (*.parquet);;"
+    "Text Files (*.txt)"
+)
+
+
+def parse_file_name(file_path):
+    """
+    Определение формата и сжатия файла по расширению
+
+    Args:
+        file_path (str): Путь к файлу
+
+    Returns:
+        tuple: (формат: json, ndjson, csv, txt, evc или parquet; сжатие: gzip, zstd или None)
+    """
+    if archive_format(file_path) is not None:
+        # Столбцовый архив сжимает столбцы сам
+        return check_archive_format(file_path), None
+
+    name = file_path.lower()
+    compression = None
+    if name.endswith('.gz'):
+        compression = 'gzip'
+        name = name[:-3]
+    elif name.endswith('.zst'):
+        compression = 'zstd'
+        name = name[:-4]
+
+    ext = name.rsplit('.', 1)[-1]
+    if ext == 'jsonl':
+        ext = 'ndjson'
+    if ext not in ('json', 'ndjson', 'csv', 'txt'):
+        raise ValueError(f"Неподдерживаемый формат файла: {ext}")
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("Для сжатия zstd необходим модуль zstandard")
+    return ext, compression
+
+
+def _open_text(file_path, mode, compression):
+    """Открытие текстового файла с учетом сжатия"""
+    if compression == 'gzip':
+        return gzip.open(file_path, mode + 't', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        if mode == 'w':
+            raw = zstandard.ZstdCompressor().stream_writer(open(file_path, 'wb'), closefd=True)
+        else:
+            raw = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+        return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    return open(file_path, mode, encoding='utf-8', newline='')
+
+
+def _open_binary(file_path, compression):
+    """Открытие файла для чтения байтов с учетом сжатия"""
+    if compression == 'gzip':
+        return gzip.open(file_path, 'rb')
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+    return open(file_path, 'rb')
+
+
+def _write_json(f, chunk, first):
+    """Запись пачки событий как элементов JSON-массива"""
+    parts = []
+    for i, log in enumerate(chunk):
+        separator = '' if first and i == 0 else ',\n'
+        item = json.dumps(log, ensure_ascii=False, indent=4)
+        parts.append(separator + '    ' + item.replace('\n', '\n    '))
+    f.write(''.join(parts))
+
+
+def _write_ndjson(f, chunk):
+    """Запись пачки событий по одному JSON-объекту в строке"""
+    f.write(''.join(json.dumps(log, ensure_ascii=False) + '\n' for log in chunk))
+
+
+def _write_txt(f, chunk):
+    """Запись пачки событий в текстовом виде"""
+    parts = []
+    for log in chunk:
+        parts.append(
+            f"ID: {get_event_field(log, 'id')}\n"
+            f"Уровень: {get_event_field(log, 'level')}\n"
+            f"Время: {get_event_field(log, 'time')}\n"
+            f"Источник: {get_event_field(log, 'source')}\n"
+            f"Категория: {get_event_field(log, 'category')}\n"
+            f"Журнал: {get_event_field(log, 'journal')}\n"
+            f"Компьютер: {get_event_field(log, 'computer')}\n"
+            f"Сообщение: {get_event_field(log, 'message')}\n"
+            + "-" * 50 + "\n"
+        )
+    f.write(''.join(parts))
+
+
+def _export_text(events, file_path, fmt, compression, progress, is_cancelled):
+    """Запись событий в текстовом формате (возвращает False, если запись отменена)"""
+    total = len(events)
+    with _open_text(file_path, 'w', compression) as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow([header for header, _ in CSV_COLUMNS])
+        elif fmt == 'json':
+            f.write('[\n')
+
+        for start in range(0, total, CHUNK_SIZE):
+            if is_cancelled and is_cancelled():
+                return False
+            chunk = events[start:start + CHUNK_SIZE]
+
+            if fmt == 'csv':
+                writer.writerows(
+                    [get_event_field(log, field) for _, field in CSV_COLUMNS]
+                    for log in chunk
+                )
+            elif fmt == 'json':
+                _write_json(f, chunk, start == 0)
+            elif fmt == 'ndjson':
+                _write_ndjson(f, chunk)
+            else:
+                _write_txt(f, chunk)
+
+            if progress:
+                progress(start + len(chunk), total)
+
+        if fmt == 'json':
+            f.write('\n]\n')
+    return True
+
+
+def _export_archive(events, file_path, fmt, progress, is_cancelled):
+    """Запись событий в столбцовый архив (возвращает False, если запись отменена)"""
+    total = len(events)
+    with ArchiveWriter(file_path, fmt=fmt) as writer:
+        for start in range(0, total, CHUNK_SIZE):
+            if is_cancelled and is_cancelled():
+                return False
+            chunk = events[start:start + CHUNK_SIZE]
+            writer.write(chunk)
+            if progress:
+                progress(start + len(chunk), total)
+    return True
+
+
+def export_logs(events, file_path, progress=None, is_cancelled=None):
+    """
+    Запись событий в файл пачками
+
+    Файл пишется во временный файл рядом с целевым и переименовывается
+    только после успешного завершения, поэтому отмена или ошибка не
+    оставляют недописанный файл.
+
+    Args:
+        events (list): События
+        file_path (str): Путь к файлу; формат и сжатие определяются по расширению
+        progress (callable, optional): Функция (записано, всего), вызывается после каждой пачки
+        is_cancelled (callable, optional): Функция без аргументов, возвращающая True при отмене
+
+    Returns:
+        bool: True, если экспорт завершен, False, если отменен
+    """
+    fmt, compression = parse_file_name(file_path)
+    temp_path = file_path + '.part'
+    total = len(events)
+
+    try:
+        if fmt in ARCHIVE_FORMATS:
+            completed = _export_archive(events, temp_path, fmt, progress, is_cancelled)
+        else:
+            completed = _export_text(events, temp_path, fmt, compression, progress, is_cancelled)
+
+        if not completed:
+            os.remove(temp_path)
+            logger.info(f"Экспорт логов в {file_path} отменен")
+            return False
+
+        os.replace(temp_path, file_path)
+        logger.info(f"Экспортировано {total} событий в {file_path}")
+        return True
+
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _iter_json_events(stream):
+    """
+    Последовательное чтение событий JSON-массива без загрузки файла целиком
+
+    Некорректные элементы пропускаются, чтение продолжается со следующего
+    элемента массива.
+    """
+    skipped = 0
+    for item, error in iter_json_stream(stream, chunk_size=JSON_READ_SIZE):
+        if error is None and not isinstance(item, dict):
+            error = f"ожидался объект JSON, получено: {type(item).__name__}"
+        if error is not None:
+            skipped += 1
+            if skipped <= MAX_LOGGED_ERRORS:
+                logger.warning(f"Пропущен некорректный элемент файла: {error}")
+            continue
+        yield item
+
+    if skipped:
+        logger.warning(f"При импорте пропущено некорректных элементов: {skipped}")
+
+
+def iter_import(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Чтение событий из экспортированного файла пачками
+
+    Args:
+        file_path (str): Путь к файлу в формате JSON, NDJSON, CSV (возможно сжатому) или к архиву
+        chunk_size (int): Размер пачки
+
+    Yields:
+        list: Пачка событий
+    """
+    fmt, compression = parse_file_name(file_path)
+    if fmt == 'txt':
+        raise ValueError("Импорт из текстового формата не поддерживается")
+    if fmt in ARCHIVE_FORMATS:
+        yield from iter_archive(file_path, chunk_size=chunk_size)
+        return
+
+    if fmt == 'json':
+        # JSON разбирается из байтов общим потоковым разборщиком
+        with _open_binary(file_path, compression) as f:
+            yield from _chunked(_iter_json_events(f), chunk_size)
+        return
+
+    with _open_text(file_path, 'r', compression) as f:
+        if fmt == 'csv':
+            items = (
+                {CSV_IMPORT_KEYS.get(key, key): value for key, value in row.items()}
+                for row in csv.DictReader(f)
+            )
+        else:
+            items = (json.loads(line) for line in f if line.strip())
+        yield from _chunked(items, chunk_size)
+
+
+def _chunked(items, chunk_size):
+    """Разбиение последовательности на пачки"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Модель таблицы собранных событий для графического интерфейса
+"""
+
+from bisect import bisect_left
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QAbstractProxyModel, QModelIndex
+from PyQt5.QtGui import QColor
+
+from search_index import SearchIndex
+from session_store import SessionEventStore
+from utils import get_event_field
+
+# Цвета уровней событий в таблице
+LEVEL_COLORS = {
+    'Ошибка': QColor(255, 0, 0),
+    'Предупреждение': QColor(255, 165, 0),
+    'Информация': QColor(0, 128, 0),
+}
+
+# Максимальная длина сообщения в таблице
+MESSAGE_PREVIEW_LENGTH = 100
+
+
+def make_search_text(log_data):
+    """
+    Строка для текстового поиска: все поля, кроме времени, в нижнем регистре
+
+    Args:
+        log_data (dict): Событие
+
+    Returns:
+        str: Строка для поиска
+    """
+    return ' '.join((
+        get_event_field(log_data, 'level'),
+        get_event_field(log_data, 'source'),
+        get_event_field(log_data, 'journal'),
+        str(get_event_field(log_data, 'id')),
+        get_event_field(log_data, 'message'),
+    )).lower()
+
+
+class LogTableModel(QAbstractTableModel):
+    """
+    Модель таблицы событий на основе хранилища сеанса.
+
+    События хранятся в SessionEventStore: последние в памяти, более старые
+    на диске. Для событий в памяти отображаемые значения строки вычисляются
+    один раз при добавлении, поэтому data() только читает кортеж по индексу;
+    строки вытесненных событий вычисляются при обращении. Новые события
+    добавляются в конец пачками с одним вызовом beginInsertRows на пачку,
+    одновременно пополняется индекс текстового поиска.
+    """
+
+    HEADERS = ["Время", "Уровень", "Источник", "Журнал", "ID", "Сообщение"]
+    LEVEL_COLUMN = 1
+
+    def __init__(self, parent=None):
+        """
+        Инициализация модели
+
+        Args:
+            parent (QObject, optional): Родительский объект
+        """
+        super().__init__(parent)
+        self.events = SessionEventStore()
+        self._rows = []         # отображаемые значения событий в памяти
+        self._rows_start = 0    # номер строки, соответствующей _rows[0]
+        self.search_index = SearchIndex(spilled_texts=self._spilled_texts)
+
+    def rowCount(self, parent=QModelIndex()):
+        """Количество строк"""
+        if parent.isValid():
+            return 0
+        return len(self.events)
+
+    def columnCount(self, parent=QModelIndex()):
+        """Количество столбцов"""
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Заголовки столбцов"""
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Данные ячейки"""
+        if not index.isValid():
+            return None
+
+        if index.row() >= self._rows_start:
+            row = self._rows[index.row() - self._rows_start]
+        else:
+            row = self._make_row(self.events[index.row()])
+
+        if role == Qt.DisplayRole:
+            return row[index.column()]
+        if role == Qt.ForegroundRole and index.column() == self.LEVEL_COLUMN:
+            return LEVEL_COLORS.get(row[self.LEVEL_COLUMN])
+        if role == Qt.UserRole:
+            return self.events[index.row()]
+        return None
+
+    def append_events(self, events):
+        """
+        Добавление пачки событий в конец таблицы
+
+        Args:
+            events (list): Список событий
+        """
+        if not events:
+            return
+
+        first = len(self.events)
+        rows = [self._make_row(log_data) for log_data in events]
+        self.search_index.add([make_search_text(log_data) for log_data in events])
+
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.events.append(events)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+        # Вытесненные на диск события больше не держат строки и индекс в памяти
+        window_start = self.events.window_start
+        if window_start > self._rows_start:
+            del self._rows[:window_start - self._rows_start]
+            self._rows_start = window_start
+            self.search_index.trim(window_start)
+
+    def clear(self):
+        """Удаление всех событий"""
+        self.beginResetModel()
+        self.events.clear()
+        self._rows = []
+        self._rows_start = 0
+        self.search_index.clear()
+        self.endResetModel()
+
+    def close(self):
+        """Освобождение файлов хранилища сеанса"""
+        self.events.close()
+
+    def _spilled_texts(self, end):
+        """Строки для поиска по вытесненным на диск событиям (вызывается из потока поиска)"""
+        for row, log_data in self.events.iter_spilled(end):
+            yield row, make_search_text(log_data)
+
+    def event_at(self, row):
+        """
+        Событие по номеру строки модели
+
+        Args:
+            row (int): Номер строки
+
+        Returns:
+            dict: Событие или None, если номер вне диапазона
+        """
+        if 0 <= row < len(self.events):
+            return self.events[row]
+        return None
+
+    def search_text(self, row):
+        """
+        Строка для текстового поиска по номеру строки модели
+
+        Args:
+            row (int): Номер строки
+
+        Returns:
+            str: Поля события в нижнем регистре
+        """
+        if row >= self._rows_start:
+            return self.search_index.text(row)
+        return make_search_text(self.events[row])
+
+    @staticmethod
+    def _make_row(log_data):
+        """Отображаемые значения столбцов для события"""
+        # Сокращаем сообщение для отображения в таблице
+        message = get_event_field(log_data, 'message')
+        if len(message) > MESSAGE_PREVIEW_LENGTH:
+            message = message[:MESSAGE_PREVIEW_LENGTH] + "..."
+
+        return (
+            get_event_field(log_data, 'time'),
+            get_event_field(log_data, 'level'),
+            get_event_field(log_data, 'source'),
+            get_event_field(log_data, 'journal'),
+            str(get_event_field(log_data, 'id')),
+            message,
+        )
+
+
+class LogFilterProxyModel(QAbstractProxyModel):
+    """
+    Фильтр таблицы событий по тексту поиска.
+
+    Результат поиска (возрастающие номера строк исходной модели) вычисляется
+    в фоновом потоке по индексу и устанавливается целиком, поэтому смена
+    фильтра не проверяет строки в потоке интерфейса. Новые строки исходной
+    модели проверяются по текущему запросу по мере добавления.
+    """
+
+    def __init__(self, parent=None):
+        """
+        Инициализация фильтра
+
+        Args:
+            parent (QObject, optional): Родительский объект
+        """
+        super().__init__(parent)
+        self._query = ''
+        self._rows = None   # номера строк исходной модели; None - без фильтра
+
+    def setSourceModel(self, model):
+        """Установка исходной модели"""
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.rowsAboutToBeInserted.connect(self._on_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.modelAboutToBeReset.connect(self.beginResetModel)
+        model.modelReset.connect(self._on_model_reset)
+        self.endResetModel()
+
+    def set_result(self, query, rows=None, limit=0):
+        """
+        Установка результата поиска
+
+        Args:
+            query (str): Текст запроса (пустая строка - без фильтра)
+            rows (array, optional): Возрастающие номера найденных строк
+            limit (int): Количество строк исходной модели, по которым выполнен поиск;
+                более новые строки проверяются здесь
+        """
+        source = self.sourceModel()
+        self.beginResetModel()
+        self._query = query.lower()
+        if self._query:
+            self._rows = rows
+            self._rows.extend(self._matching_rows(limit, source.rowCount()))
+        else:
+            self._rows = None
+        self.endResetModel()
+
+    def _matching_rows(self, first, end):
+        """Номера строк исходной модели из диапазона, подходящих под запрос"""
+        source = self.sourceModel()
+        return [row for row in range(first, end) if self._query in source.search_text(row)]
+
+    def _on_rows_about_to_be_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _on_rows_inserted(self, parent, first, last):
+        if self._rows is None:
+            self.endInsertRows()
+            return
+
+        matched = self._matching_rows(first, last + 1)
+        if matched:
+            count = len(self._rows)
+            self.beginInsertRows(QModelIndex(), count, count + len(matched) - 1)
+            self._rows.extend(matched)
+            self.endInsertRows()
+
+    def _on_model_reset(self):
+        if self._rows is not None:
+            self._rows = self._rows[:0]
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        """Количество строк"""
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        if self._rows is None:
+            return self.sourceModel().rowCount()
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        """Количество столбцов"""
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return self.sourceModel().columnCount()
+
+    def index(self, row, column, parent=QModelIndex()):
+        """Индекс ячейки"""
+        if parent.isValid() or not (0 <= row < self.rowCount()):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        """Таблица плоская, родителей у строк нет"""
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        """Индекс исходной модели для индекса фильтра"""
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row()
+        if self._rows is not None:
+            row = self._rows[row]
+        return self.sourceModel().index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        """Индекс фильтра для индекса исходной модели"""
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row()
+        if self._rows is not None:
+            position = bisect_left(self._rows, row)
+            if position == len(self._rows) or self._rows[position] != row:
+                return QModelIndex()
+            row = position
+        return self.createIndex(row, source_index.column())
@@ -6,13 +6,18 @@
 
 import os
 import sys
+import json
+import time
+import hashlib
 import logging
-import yaml
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, flash, session, g
+from agent_core import AgentCore, AgentCoreClient, SOCKET_ENV
 from agent_logger import AgentLogger
-from rabbitmq_client import RabbitMQClient
-from utils import get_system_info
+from config_service import get_config_service
+from event_buffer import EventBuffer
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utils import get_system_info, iter_json_stream, negotiate_encoding, compress_data, iter_compressed
 
 # Инициализация логгера
 logger = AgentLogger(log_dir='logs').get_logger('web')
@@ -22,9 +27,153 @@ logging.basicConfig(level=logging.DEBUG)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_secret_key")
 
-# Загрузка конфигурации RabbitMQ
-config_path = 'config.ini'
-rabbitmq_client = RabbitMQClient()
+# Загрузка конфигурации: файл читается один раз и перечитывается только при изменении
+config_service = get_config_service('config.yml')
+
+# Ядро агента (коллектор, отправитель RabbitMQ, буфер событий и конвейеры).
+# Под gunicorn ядро работает отдельным процессом (см. gunicorn.conf.py), и все
+# рабочие процессы обращаются к нему через Unix-сокет; без переменной окружения
+# ядро создается в текущем процессе
+if os.environ.get(SOCKET_ENV):
+    core = AgentCoreClient(os.environ[SOCKET_ENV])
+else:
+    core = AgentCore('config.yml')
+
+# Параметры потоковой передачи событий (Server-Sent Events)
+SSE_BATCH_SIZE = 500  # максимальное количество событий в одном кадре
+SSE_HEARTBEAT_INTERVAL = 15.0  # интервал отправки пустых кадров в секундах
+
+# Размер страницы при инкрементальном получении событий
+FETCH_DEFAULT_LIMIT = 500
+FETCH_MAX_LIMIT = 5000
+
+# Размер страницы при постраничном просмотре событий и журнала агента
+EVENTS_DEFAULT_LIMIT = 100
+EVENTS_MAX_LIMIT = 1000
+
+# Размер пачки при массовой публикации логов
+PUBLISH_BATCH_SIZE = 1000
+PUBLISH_MAX_ERRORS = 20  # максимальное количество описаний ошибок в ответе
+
+# Сжатие ответов JSON API: ответы меньше порога не сжимаются,
+# ответы больше порога потоковой передачи отдаются генератором по частям
+COMPRESS_MIN_SIZE = 1024
+STREAM_MIN_SIZE = 256 * 1024
+STREAM_CHUNK_ITEMS = 500  # количество элементов списка в одном блоке потокового ответа
+
+# Статические сведения о системе вычисляются один раз при запуске
+get_system_info()
+
+# Метрики веб-интерфейса
+HTTP_REQUEST_TIME = REGISTRY.histogram('http_request_seconds', 'Время обработки HTTP-запросов', ('endpoint', 'method'))
+HTTP_REQUESTS = REGISTRY.counter('http_requests', 'Количество HTTP-запросов', ('endpoint', 'method', 'status'))
+SSE_CLIENTS = REGISTRY.gauge('sse_clients', 'Количество подключенных клиентов потока событий')
+
+@app.before_request
+def _start_request_timer():
+    """Запоминание времени начала обработки запроса"""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    """Учет времени обработки запроса в метриках"""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unknown'
+        HTTP_REQUEST_TIME.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    return response
+
+@app.after_request
+def _compress_response(response):
+    """Сжатие ответов JSON API (gzip или brotli по заголовку Accept-Encoding)"""
+    if (response.mimetype != 'application/json' or response.status_code in (204, 304)
+            or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        response.response = iter_compressed(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress_data(data, encoding))
+    
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def _view_etag(state):
+    """
+    Строгий ETag представления ответа.
+    Учитывает параметры запроса, версию данных и способ сжатия, поэтому
+    сжатое и несжатое представления имеют разные ETag
+    
+    Args:
+        state (str): Версия данных, из которых строится ответ
+        
+    Returns:
+        str: Значение ETag
+    """
+    key = hashlib.sha1()
+    key.update(request.full_path.encode('utf-8'))
+    if request.method == 'POST':
+        key.update(request.get_data())
+    key.update(f"|{state}|{negotiate_encoding(request.headers.get('Accept-Encoding'))}".encode('utf-8'))
+    return key.hexdigest()
+
+def _not_modified(etag):
+    """
+    Ответ 304 Not Modified, если у клиента актуальная версия представления
+    
+    Args:
+        etag (str): ETag текущего представления
+        
+    Returns:
+        Response: Ответ 304 или None, если представление нужно отправить
+    """
+    if not request.if_none_match.contains(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _json_list_response(head, items, etag=None):
+    """
+    Ответ JSON из заранее сериализованных элементов списка.
+    Большие ответы отдаются генератором по частям без сборки тела в памяти
+    
+    Args:
+        head (str): Начало объекта JSON до открывающей скобки списка, например '{"logs": '
+        items (list): Сериализованные в JSON элементы списка
+        etag (str, optional): ETag представления
+        
+    Returns:
+        Response: Ответ с типом application/json
+    """
+    size = len(head) + sum(len(item) for item in items)
+    if size < STREAM_MIN_SIZE:
+        response = Response(f'{head}[{", ".join(items)}]}}', mimetype='application/json')
+    else:
+        def generate():
+            yield head + '['
+            for start in range(0, len(items), STREAM_CHUNK_ITEMS):
+                prefix = ', ' if start else ''
+                yield prefix + ', '.join(items[start:start + STREAM_CHUNK_ITEMS])
+            yield ']}'
+        response = Response(generate(), mimetype='application/json')
+    
+    if etag:
+        # Клиент должен перепроверять представление при каждом запросе
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+    return response
 
 @app.route('/')
 def index():
@@ -33,9 +182,8 @@ def index():
 
 @app.route('/logs')
 def logs_page():
-    """Страница просмотра логов"""
-    log_entries = AgentLogger().get_log_entries(max_entries=1000)
-    return render_template('logs.html', log_entries=log_entries)
+    """Страница просмотра логов (записи загружаются постранично через API)"""
+    return render_template('logs.html', page_size=EVENTS_DEFAULT_LIMIT)
 
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
@@ -44,7 +192,7 @@ def settings():
         # Обновление настроек RabbitMQ
         rabbitmq_config = {
             'host': request.form.get('rabbitmq_host'),
-            'port': int(request.form.get('rabbitmq_port')),
+            'port': request.form.get('rabbitmq_port'),
             'vhost': request.form.get('rabbitmq_vhost'),
             'username': request.form.get('rabbitmq_username'),
             'password': request.form.get('rabbitmq_password'),
@@ -53,16 +201,9 @@ def settings():
             'use_ssl': bool(request.form.get('rabbitmq_ssl', False))
         }
         
-        # Создаем конфигурацию для сохранения
-        config_data = {
-            'rabbitmq': rabbitmq_config
-        }
-        
-        # Сохранение настроек в файл config.yml
+        # Сохранение настроек в файл config.yml (остальные разделы сохраняются без изменений)
         try:
-            with open('config.yml', 'w', encoding='utf-8') as config_file:
-                yaml.dump(config_data, config_file, default_flow_style=False, allow_unicode=True)
-                
+            config_service.save({'rabbitmq': rabbitmq_config})
             flash('Настройки успешно сохранены', 'success')
         except Exception as e:
             logger.error(f"Ошибка при сохранении конфигурации: {str(e)}")
@@ -70,34 +211,8 @@ def settings():
             
         return redirect(url_for('settings'))
     
-    # Загрузка текущих настроек
-    config = {
-        'rabbitmq': {
-            'host': '192.168.239.181',
-            'port': 5672,
-            'vhost': '/win_logs',
-            'username': 'win_agent',
-            'password': '12345678',
-            'exchange': 'windows_logs',
-            'routing_key': 'system.logs',
-            'use_ssl': False
-        }
-    }
-    
-    # Пытаемся загрузить настройки из файла
-    try:
-        if os.path.exists('config.yml'):
-            with open('config.yml', 'r', encoding='utf-8') as config_file:
-                file_config = yaml.safe_load(config_file)
-                if file_config and isinstance(file_config, dict):
-                    # Обновляем значения по умолчанию 
-                    if 'rabbitmq' in file_config and isinstance(file_config['rabbitmq'], dict):
-                        config['rabbitmq'].update(file_config['rabbitmq'])
-    except Exception as e:
-        logger.error(f"Ошибка при загрузке конфигурации: {str(e)}")
-        flash(f'Ошибка при загрузке настроек: {str(e)}', 'warning')
-    
-    return render_template('settings.html', config=config)
+    # Текущие настройки берутся из уже загруженной конфигурации
+    return render_template('settings.html', config=config_service.config.to_dict())
 
 @app.route('/windows_logs')
 def windows_logs_page():
@@ -108,43 +223,16 @@ def windows_logs_page():
 def connect_rabbitmq():
     """API для подключения к RabbitMQ"""
     try:
-        # Загрузка настроек
-        rabbitmq_settings = {
-            'host': '192.168.239.181',
-            'port': 5672,
-            'vhost': '/win_logs',
-            'username': 'win_agent',
-            'password': '12345678',
-            'exchange': 'windows_logs',
-            'routing_key': 'system.logs'
-        }
+        rabbitmq_settings = config_service.config.rabbitmq
         
-        # Пытаемся загрузить настройки из файла
-        try:
-            if os.path.exists('config.yml'):
-                with open('config.yml', 'r', encoding='utf-8') as config_file:
-                    config = yaml.safe_load(config_file)
-                    if config and isinstance(config, dict) and 'rabbitmq' in config:
-                        rabbitmq_settings.update(config['rabbitmq'])
-        except Exception as e:
-            logger.warning(f"Не удалось загрузить настройки из файла: {str(e)}")
-        
-        # Подключение к RabbitMQ
-        result = rabbitmq_client.connect(
-            host=rabbitmq_settings.get('host'),
-            port=rabbitmq_settings.get('port'),
-            virtual_host=rabbitmq_settings.get('vhost'),
-            username=rabbitmq_settings.get('username'),
-            password=rabbitmq_settings.get('password'),
-            exchange=rabbitmq_settings.get('exchange'),
-            routing_key=rabbitmq_settings.get('routing_key')
-        )
+        # Подключение к RabbitMQ (выполняет ядро агента с параметрами из конфигурации)
+        result = core.connect_rabbitmq()
         
         if result:
-            logger.info(f"Успешное подключение к RabbitMQ: {rabbitmq_settings.get('host')}")
+            logger.info(f"Успешное подключение к RabbitMQ: {rabbitmq_settings.host}")
             return jsonify({'success': True, 'message': 'Успешное подключение к RabbitMQ'})
         else:
-            logger.error(f"Ошибка подключения к RabbitMQ: {rabbitmq_settings.get('host')}")
+            logger.error(f"Ошибка подключения к RabbitMQ: {rabbitmq_settings.host}")
             return jsonify({'success': False, 'message': 'Ошибка подключения к RabbitMQ'})
     except Exception as e:
         logger.error(f"Ошибка при подключении к RabbitMQ: {str(e)}")
@@ -154,7 +242,7 @@ def connect_rabbitmq():
 def disconnect_rabbitmq():
     """API для отключения от RabbitMQ"""
     try:
-        rabbitmq_client.disconnect()
+        core.disconnect_rabbitmq()
         logger.info("Отключение от RabbitMQ")
         return jsonify({'success': True, 'message': 'Отключено от RabbitMQ'})
     except Exception as e:
@@ -170,7 +258,7 @@ def publish_log():
             return jsonify({'success': False, 'message': 'Нет данных для отправки'})
             
         # Публикация лога в RabbitMQ
-        result = rabbitmq_client.publish_log(data)
+        result = core.publish_logs(logs=[data])
         
         if result:
             logger.info(f"Лог успешно опубликован в RabbitMQ: {data.get('id')}")
@@ -182,97 +270,436 @@ def publish_log():
         logger.error(f"Ошибка при публикации лога в RabbitMQ: {str(e)}")
         return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
 
+@app.route('/api/publish-logs', methods=['POST'])
+def publish_logs():
+    """
+    API для массовой публикации логов в RabbitMQ.
+    Принимает тело в формате NDJSON или JSON-массива и разбирает его потоково
+    """
+    try:
+        batch_size = min(int(request.args.get('batch_size', PUBLISH_BATCH_SIZE)), PUBLISH_BATCH_SIZE * 10)
+        batches = []
+        errors = []
+        accepted = 0
+        rejected = 0
+        
+        batch = []
+        batch_rejected = 0
+        
+        def flush():
+            nonlocal batch, batch_rejected, accepted, rejected
+            batch_accepted = len(batch)
+            if batch and not core.publish_logs(logs=batch):
+                batch_rejected += batch_accepted
+                batch_accepted = 0
+            batches.append({'accepted': batch_accepted, 'rejected': batch_rejected})
+            accepted += batch_accepted
+            rejected += batch_rejected
+            batch = []
+            batch_rejected = 0
+        
+        for item, error in iter_json_stream(request.stream):
+            if error is None and not isinstance(item, dict):
+                error = f"ожидался объект JSON, получено: {type(item).__name__}"
+            
+            if error is not None:
+                batch_rejected += 1
+                if len(errors) < PUBLISH_MAX_ERRORS:
+                    errors.append(error)
+            else:
+                batch.append(item)
+            
+            if len(batch) + batch_rejected >= batch_size:
+                flush()
+        
+        if batch or batch_rejected:
+            flush()
+        
+        if not batches:
+            return jsonify({'success': False, 'message': 'Нет данных для отправки'})
+        
+        logger.info(f"Массовая публикация логов в RabbitMQ: принято {accepted}, отклонено {rejected}")
+        return jsonify({
+            'success': rejected == 0,
+            'accepted': accepted,
+            'rejected': rejected,
+            'batches': batches,
+            'errors': errors
+        })
+    except Exception as e:
+        logger.error(f"Ошибка при массовой публикации логов в RabbitMQ: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
 @app.route('/api/agent-logs')
 def get_agent_logs():
-    """API для получения логов агента"""
+    """
+    API для получения логов агента.
+    При указании offset или limit возвращается страница записей и их общее количество
+    """
     try:
         level = request.args.get('level')
-        max_entries = int(request.args.get('max_entries', 1000))
         
-        log_entries = AgentLogger().get_log_entries(max_entries=max_entries, level=level)
-        return jsonify({'success': True, 'logs': log_entries})
+        # Версия журнала определяется временем изменения и размером файла
+        try:
+            stat = os.stat(AgentLogger().get_log_file_path())
+            etag = _view_etag(f"{stat.st_mtime_ns}-{stat.st_size}")
+        except OSError:
+            etag = _view_etag('missing')
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        if 'offset' in request.args or 'limit' in request.args:
+            offset = max(int(request.args.get('offset', 0)), 0)
+            limit = min(max(int(request.args.get('limit', EVENTS_DEFAULT_LIMIT)), 1), EVENTS_MAX_LIMIT)
+            total, log_entries = AgentLogger().get_log_page(
+                offset=offset, limit=limit, level=level, text=request.args.get('q')
+            )
+            head = f'{{"success": true, "total": {total}, "offset": {offset}, "limit": {limit}, "logs": '
+        else:
+            max_entries = int(request.args.get('max_entries', 1000))
+            log_entries = AgentLogger().get_log_entries(max_entries=max_entries, level=level)
+            head = '{"success": true, "logs": '
+        
+        items = [json.dumps(entry, ensure_ascii=False) for entry in log_entries]
+        return _json_list_response(head, items, etag)
     except Exception as e:
         logger.error(f"Ошибка при получении логов агента: {str(e)}")
         return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
 
+@app.route('/api/events')
+def get_events():
+    """
+    API для постраничного просмотра собранных событий с фильтрацией и сортировкой.
+    Возвращается только запрошенная страница и общее количество подходящих событий
+    """
+    try:
+        # Версия буфера читается до выборки: если события добавятся во время выборки,
+        # следующий запрос получит новый ETag и полный ответ
+        etag = _view_etag(core.buffer_version())
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', EVENTS_DEFAULT_LIMIT)), 1), EVENTS_MAX_LIMIT)
+        
+        filters = {field: request.args.get(field) for field in EventBuffer.INDEXED_FIELDS
+                   if request.args.get(field) not in (None, '', 'all')}
+        
+        result = core.query_events(
+            filters=filters,
+            text=request.args.get('q'),
+            sort=request.args.get('sort', '-time'),
+            offset=offset,
+            limit=limit,
+            after=int(request.args.get('after', 0))
+        )
+        
+        head = (f'{{"success": true, "total": {result["total"]}, "offset": {offset}, "limit": {limit}, '
+                f'"cursor": {result["cursor"]}, "logs": ')
+        return _json_list_response(head, result['fragments'], etag)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Ошибка при получении событий: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
+@app.route('/api/history')
+def get_history():
+    """
+    API для выборки событий из локального хранилища за период.
+    Параметры start и end задают период ('YYYY-MM-DD HH:MM:SS'), следующая
+    страница запрашивается по курсору из предыдущего ответа
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', EVENTS_DEFAULT_LIMIT)), 1), EVENTS_MAX_LIMIT)
+        params = {key: request.args.get(key) for key in ('start', 'end', 'log_type', 'level', 'source',
+                                                        'event_id', 'cursor')
+                  if request.args.get(key) not in (None, '', 'all')}
+        
+        result = core.query_store(sort=request.args.get('sort', '-time'), limit=limit, **params)
+        
+        head = (f'{{"success": true, "limit": {limit}, "cursor": {json.dumps(result["cursor"])}, '
+                f'"store": {json.dumps(result["store"], ensure_ascii=False)}, "logs": ')
+        return _json_list_response(head, result['fragments'])
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Ошибка при выборке событий из хранилища: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
+@app.route('/api/stats')
+def get_stats():
+    """
+    API для статистики событий по агрегатам.
+    Параметры: start и end ('YYYY-MM-DD HH:MM:SS', по умолчанию последние сутки),
+    group_by - поля группировки через запятую (log_type, level, source, event_id),
+    фильтры log_type, level, source, event_id, resolution (minute или hour),
+    series=1 - количество событий по интервалам, limit - количество групп
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), EVENTS_MAX_LIMIT)
+        group_by = [field for field in request.args.get('group_by', '').split(',') if field]
+        filters = {key: request.args.get(key) for key in ('log_type', 'level', 'source', 'event_id')
+                   if request.args.get(key) not in (None, '', 'all')}
+        
+        result = core.query_stats(
+            start=request.args.get('start') or None,
+            end=request.args.get('end') or None,
+            group_by=group_by,
+            resolution=request.args.get('resolution') or None,
+            series=request.args.get('series', '').lower() in ('1', 'true', 'yes'),
+            limit=limit,
+            **filters
+        )
+        return jsonify({'success': True, **result})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Ошибка при получении статистики событий: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
+@app.route('/api/alerts')
+def get_alerts():
+    """
+    API для последних тревог детектора всплесков и правил корреляции.
+    Параметр limit - количество тревог (новые первыми)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 100)), 1), EVENTS_MAX_LIMIT)
+        return jsonify({'success': True, **core.get_alerts(limit=limit)})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Ошибка при получении тревог: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
+@app.route('/api/search')
+def search_history():
+    """
+    API для полнотекстового поиска событий в локальном хранилище.
+    Параметр q - строка поиска: все слова обязательны, текст в кавычках ищется
+    как фраза, слово со звездочкой на конце - как префикс. Остальные параметры
+    и постраничный вывод такие же, как у /api/history
+    """
+    try:
+        text = request.args.get('q', '').strip()
+        if not text:
+            return jsonify({'success': False, 'message': 'Ошибка: не указана строка поиска'}), 400
+        limit = min(max(int(request.args.get('limit', EVENTS_DEFAULT_LIMIT)), 1), EVENTS_MAX_LIMIT)
+        params = {key: request.args.get(key) for key in ('start', 'end', 'log_type', 'level', 'source',
+                                                        'event_id', 'cursor')
+                  if request.args.get(key) not in (None, '', 'all')}
+        
+        started = time.perf_counter()
+        result = core.query_store(sort=request.args.get('sort', '-time'), limit=limit, text=text, **params)
+        elapsed = time.perf_counter() - started
+        
+        head = (f'{{"success": true, "query": {json.dumps(text, ensure_ascii=False)}, "limit": {limit}, '
+                f'"cursor": {json.dumps(result["cursor"])}, "took_ms": {elapsed * 1000:.1f}, "logs": ')
+        return _json_list_response(head, result['fragments'])
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Ошибка при поиске событий в хранилище: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
+@app.route('/metrics')
+def metrics():
+    """Экспорт метрик агента в текстовом формате Prometheus"""
+    if isinstance(core, AgentCoreClient):
+        # Метрики компонентов собирает процесс ядра, рабочий процесс добавляет свои HTTP-метрики.
+        # HTTP-метрики у каждого рабочего процесса свои, поэтому они помечаются меткой worker
+        # (pid процесса): ряды разных процессов не смешиваются и суммируются в Prometheus
+        worker_labels = (('worker', str(os.getpid())),)
+        body = REGISTRY.render(prefixes=('http_', 'sse_'), labels=worker_labels) + core.render_metrics()
+    else:
+        body = REGISTRY.render()
+    return Response(body, content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/api/status')
 def get_status():
-    """API для получения статуса подключения к RabbitMQ"""
-    status = {
-        'rabbitmq_connected': False,
-        'system_info': get_system_info(),
-        'current_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
+    """
+    API для получения статуса агента.
+    Ответ собирается из счетчиков в памяти и поддерживает условные запросы (ETag)
+    """
+    status = core.get_status()
+    status['system_info'] = get_system_info()
     
-    # Проверяем статус подключения RabbitMQ
-    if hasattr(rabbitmq_client, 'is_connected'):
-        status['rabbitmq_connected'] = rabbitmq_client.is_connected
-        
-    return jsonify(status)
+    response = jsonify(status)
+    etag = _view_etag(hashlib.sha1(response.get_data()).hexdigest())
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
 
-@app.route('/api/fetch-windows-logs', methods=['POST'])
+@app.route('/api/fetch-windows-logs', methods=['GET', 'POST'])
 def fetch_windows_logs():
-    """API для получения системных логов Windows"""
+    """
+    API для инкрементального получения собранных логов Windows.
+    Возвращает только события после курсора ``after`` и курсор для следующего запроса
+    """
     try:
-        data = request.json or {}
-        log_type = data.get('log_type')
+        # Параметры принимаются из строки запроса или из тела JSON
+        params = dict(request.args)
+        if request.method == 'POST':
+            params.update(request.get_json(silent=True) or {})
+        
+        after = int(params.get('after') or 0)
+        limit = min(int(params.get('limit') or FETCH_DEFAULT_LIMIT), FETCH_MAX_LIMIT)
+        log_type = params.get('log_type')
+        if log_type == 'all':
+            log_type = None
+        
+        # Сначала запрашиваем только версию буфера: ответ 304 не требует выборки событий.
+        # Версия берется до выборки, поэтому добавленные между вызовами события
+        # лишь приведут к повторной выборке при следующем запросе
+        etag = _view_etag(core.buffer_version())
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
         
-        # Здесь будет реализован реальный сбор логов из Windows
-        # В данном случае для демонстрации возвращаем тестовые данные
-        
-        # Журналы Windows
-        log_types = ['System', 'Application', 'Security']
-        if log_type and log_type not in log_types and log_type != 'all':
-            log_types = [log_type]
-        
-        # Создаем пример лога
-        logs = [{
-            'id': 12345,
-            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'source': 'LogCollector',
-            'level': 1,
-            'level_name': 'Информация',
-            'log_type': log_types[0] if log_types else 'System',
-            'message': 'Здесь будут отображаться реальные логи Windows'
-        }]
-        
-        logger.info(f"Запрошены логи для типа: {log_type if log_type else 'все'}, получено {len(logs)} записей")
-        return jsonify({'success': True, 'logs': logs})
+        result = core.fetch_events(after=after, limit=limit, log_type=log_type)
+        
+        # Ответ собирается из заранее сериализованных фрагментов без повторного кодирования
+        head = (f'{{"success": true, "cursor": {result["cursor"]}, "has_more": {json.dumps(result["has_more"])}, '
+                f'"dropped": {result["dropped"]}, "logs": ')
+        return _json_list_response(head, result['fragments'], etag)
     except Exception as e:
         logger.error(f"Ошибка при получении логов Windows: {str(e)}")
         return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
 
+@app.route('/api/start-collecting', methods=['POST'])
+def start_collecting():
+    """API для запуска сбора логов Windows на сервере"""
+    try:
+        data = request.json or {}
+        log_types = data.get('log_types')
+        hours_back = data.get('hours_back')
+        
+        # Значения по умолчанию ядро берет из раздела logs конфигурации
+        result = core.start_collecting(log_types=log_types, hours_back=hours_back)
+        
+        if not result['started']:
+            return jsonify({'success': True, 'message': 'Сбор логов уже запущен', 'cursor': result['cursor']})
+        
+        logger.info(f"Запущен сбор логов через веб-интерфейс: {', '.join(result['log_types'])}")
+        return jsonify({'success': True, 'message': 'Сбор логов запущен', 'cursor': result['cursor']})
+    except Exception as e:
+        logger.error(f"Ошибка при запуске сбора логов: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
+@app.route('/api/stop-collecting', methods=['POST'])
+def stop_collecting():
+    """API для остановки сбора логов Windows на сервере"""
+    try:
+        core.stop_collecting()
+        return jsonify({'success': True, 'message': 'Сбор логов остановлен'})
+    except Exception as e:
+        logger.error(f"Ошибка при остановке сбора логов: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
+@app.route('/api/stream-windows-logs')
+def stream_windows_logs():
+    """API для потоковой передачи собранных логов Windows (Server-Sent Events)"""
+    # Номер последнего полученного события: заголовок передает браузер при
+    # переподключении, параметр запроса - при первом подключении страницы
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_seq = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_seq = None
+    
+    log_type = request.args.get('log_type')
+    
+    def generate():
+        cursor = last_seq
+        SSE_CLIENTS.inc()
+        try:
+            yield 'retry: 3000\n\n'
+            
+            while True:
+                # Длинный опрос ядра: ответ приходит при появлении событий или по истечении таймаута
+                result = core.wait_events(after=cursor, limit=SSE_BATCH_SIZE,
+                                          timeout=SSE_HEARTBEAT_INTERVAL, log_type=log_type)
+                
+                if result['cursor'] == cursor:
+                    # Пустой кадр поддерживает соединение и выявляет отключившихся клиентов
+                    yield ': heartbeat\n\n'
+                    continue
+                
+                cursor = result['cursor']
+                if not result['fragments'] and not result['dropped']:
+                    # Только продвигаем номер последнего события у клиента
+                    yield f'id: {cursor}\n\n'
+                    continue
+                
+                payload = f'{{"logs": [{", ".join(result["fragments"])}], "dropped": {result["dropped"]}}}'
+                yield f'id: {cursor}\nevent: logs\ndata: {payload}\n\n'
+        finally:
+            SSE_CLIENTS.dec()
+    
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    }
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
+
 @app.route('/api/start-streaming', methods=['POST'])
 def start_streaming():
-    """API для начала передачи логов в RabbitMQ"""
+    """
+    API для начала передачи логов в RabbitMQ.
+    Создает (или возобновляет) именованный конвейер: источник -> фильтр -> RabbitMQ
+    """
     try:
         data = request.json or {}
         log_type = data.get('log_type')
         
-        # Отметка в логе, что начата передача логов
-        logger.info(f"Начата передача логов в RabbitMQ, фильтр по типу: {log_type if log_type else 'все'}")
+        params = {key: data[key] for key in ('name', 'log_type', 'source', 'replay', 'log_types', 'hours_back',
+                                            'workers', 'queue_size', 'batch_size') if key in data}
+        result = core.start_streaming(**params)
         
-        # Здесь будет реальная логика начала передачи логов в RabbitMQ
-        
-        return jsonify({'success': True, 'message': 'Передача логов в RabbitMQ начата'})
+        if result['success']:
+            logger.info(f"Начата передача логов в RabbitMQ (конвейер {result['pipeline']['name']}), "
+                        f"фильтр по типу: {log_type if log_type else 'все'}")
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"Ошибка при начале передачи логов: {str(e)}")
         return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
 
 @app.route('/api/stop-streaming', methods=['POST'])
 def stop_streaming():
-    """API для остановки передачи логов в RabbitMQ"""
+    """API для остановки передачи логов в RabbitMQ (останавливает и чтение источника)"""
     try:
-        # Отметка в логе, что передача логов остановлена
-        logger.info("Остановлена передача логов в RabbitMQ")
+        data = request.get_json(silent=True) or {}
+        
+        try:
+            pipeline = core.stop_streaming(name=data.get('name'))
+        except KeyError as e:
+            return jsonify({'success': False, 'message': str(e.args[0] if e.args else e)}), 404
         
-        # Здесь будет реальная логика остановки передачи логов в RabbitMQ
+        logger.info(f"Остановлена передача логов в RabbitMQ (конвейер {pipeline['name']})")
         
-        return jsonify({'success': True, 'message': 'Передача логов в RabbitMQ остановлена'})
+        return jsonify({'success': True, 'message': 'Передача логов в RabbitMQ остановлена', 'pipeline': pipeline})
     except Exception as e:
         logger.error(f"Ошибка при остановке передачи логов: {str(e)}")
         return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
 
+@app.route('/api/pipelines')
+def get_pipelines():
+    """API для просмотра состояния конвейеров"""
+    try:
+        return jsonify({'success': True, **core.get_pipelines()})
+    except Exception as e:
+        logger.error(f"Ошибка при получении состояния конвейеров: {str(e)}")
+        return jsonify({'success': False, 'message': f'Ошибка: {str(e)}'})
+
 if __name__ == "__main__":
-    # Для локальной разработки
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Для локальной разработки. Перезагрузчик отключен: он запускает модуль во втором
+    # процессе, и в каждом процессе создавалось бы свое ядро с подключением к RabbitMQ
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
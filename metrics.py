@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль метрик агента: счетчики, измерители и гистограммы
+с экспортом в текстовом формате Prometheus.
+
+Счетчики и гистограммы хранят значения в ячейках, принадлежащих
+отдельным потокам, поэтому наблюдение не требует блокировок;
+ячейки суммируются только при экспорте. Ячейка завершившегося потока
+прибавляется к общему итогу и освобождается, поэтому количество ячеек
+не растет с числом когда-либо созданных потоков.
+"""
+
+import bisect
+import threading
+import time
+import weakref
+
+# Границы корзин гистограмм длительности по умолчанию (в секундах)
+DEFAULT_TIME_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+                        0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class _CellHolder:
+    """Владелец ячейки в локальных данных потока; удаляется вместе с потоком"""
+
+    __slots__ = ('cell', '__weakref__')
+
+    def __init__(self, cell):
+        self.cell = cell
+
+
+class _ThreadShards:
+    """Набор ячеек значений, по одной на каждый работающий поток"""
+
+    def __init__(self, size):
+        """
+        Инициализация набора ячеек
+
+        Args:
+            size (int): Количество значений в ячейке
+        """
+        self.size = size
+        self.local = threading.local()
+        self.cells = {}             # id ячейки -> ячейка работающего потока
+        self.base = [0] * size      # итог ячеек завершившихся потоков
+        # Освобождение ячейки может произойти при сборке мусора в любом потоке
+        self.lock = threading.RLock()
+
+    def cell(self):
+        """Получение ячейки текущего потока (создается при первом обращении)"""
+        try:
+            return self.local.holder.cell
+        except AttributeError:
+            cell = [0] * self.size
+            holder = _CellHolder(cell)
+            with self.lock:
+                self.cells[id(cell)] = cell
+            # Локальные данные потока удаляются при его завершении, вместе с ними - владелец
+            weakref.finalize(holder, self._retire, cell)
+            self.local.holder = holder
+            return cell
+
+    def _retire(self, cell):
+        """Перенос значений ячейки завершившегося потока в общий итог"""
+        with self.lock:
+            self.cells.pop(id(cell), None)
+            self.base = [total + value for total, value in zip(self.base, cell)]
+
+    def totals(self):
+        """Суммирование значений всех ячеек"""
+        with self.lock:
+            cells = list(self.cells.values())
+            base = self.base
+        return [sum(values) for values in zip(base, *cells)]
+
+
+class Counter:
+    """Монотонно возрастающий счетчик"""
+
+    def __init__(self):
+        """Инициализация счетчика"""
+        self.shards = _ThreadShards(1)
+
+    def inc(self, amount=1):
+        """
+        Увеличение счетчика
+
+        Args:
+            amount (int|float): Величина увеличения
+        """
+        self.shards.cell()[0] += amount
+
+    @property
+    def value(self):
+        """Текущее значение счетчика"""
+        return self.shards.totals()[0]
+
+    def samples(self, name, labels):
+        """Значения для экспорта"""
+        return [(name + '_total', labels, self.value)]
+
+
+class Gauge:
+    """Измеритель текущего значения (например, глубины очереди)"""
+
+    def __init__(self):
+        """Инициализация измерителя"""
+        self.current = 0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        """
+        Установка значения
+
+        Args:
+            value (int|float): Новое значение
+        """
+        self.current = value
+
+    def inc(self, amount=1):
+        """
+        Увеличение значения
+
+        Args:
+            amount (int|float): Величина увеличения
+        """
+        with self.lock:
+            self.current += amount
+
+    def dec(self, amount=1):
+        """
+        Уменьшение значения
+
+        Args:
+            amount (int|float): Величина уменьшения
+        """
+        with self.lock:
+            self.current -= amount
+
+    def set_function(self, function):
+        """
+        Установка функции, вычисляющей значение в момент экспорта
+
+        Args:
+            function (function): Функция без аргументов, возвращающая число
+        """
+        self.function = function
+
+    @property
+    def value(self):
+        """Текущее значение измерителя"""
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float('nan')
+        return self.current
+
+    def samples(self, name, labels):
+        """Значения для экспорта"""
+        return [(name, labels, self.value)]
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, buckets=DEFAULT_TIME_BUCKETS):
+        """
+        Инициализация гистограммы
+
+        Args:
+            buckets (tuple): Возрастающие верхние границы корзин
+        """
+        self.buckets = tuple(sorted(buckets))
+        # Ячейка: счетчики корзин, переполнение (+Inf) и сумма наблюдений
+        self.shards = _ThreadShards(len(self.buckets) + 2)
+
+    def observe(self, value):
+        """
+        Регистрация наблюдения
+
+        Args:
+            value (float): Наблюдаемое значение
+        """
+        cell = self.shards.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def time(self):
+        """
+        Контекстный менеджер для измерения длительности блока кода
+
+        Returns:
+            _Timer: Объект для использования в операторе with
+        """
+        return _Timer(self)
+
+    def samples(self, name, labels):
+        """Значения для экспорта (накопительные корзины, сумма и количество)"""
+        totals = self.shards.totals()
+        result = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, totals):
+            cumulative += count
+            result.append((name + '_bucket', labels + (('le', _format_value(bound)),), cumulative))
+        cumulative += totals[len(self.buckets)]
+        result.append((name + '_bucket', labels + (('le', '+Inf'),), cumulative))
+        result.append((name + '_sum', labels, totals[-1]))
+        result.append((name + '_count', labels, cumulative))
+        return result
+
+
+class _Timer:
+    """Измерение длительности блока кода для гистограммы"""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Metric:
+    """Именованная метрика с набором меток"""
+
+    TYPES = {'counter': Counter, 'gauge': Gauge, 'histogram': Histogram}
+
+    def __init__(self, name, documentation, metric_type, labelnames=(), **kwargs):
+        """
+        Инициализация метрики
+
+        Args:
+            name (str): Имя метрики
+            documentation (str): Описание метрики
+            metric_type (str): Тип метрики (counter, gauge или histogram)
+            labelnames (tuple): Имена меток
+            **kwargs: Параметры значения метрики (например, buckets для гистограммы)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.kwargs = kwargs
+        self.children = {}
+        self.lock = threading.Lock()
+
+        # Метрика без меток сама является значением: методы привязываются напрямую,
+        # чтобы наблюдение не проходило через дополнительный уровень вызова
+        if not self.labelnames:
+            child = self.TYPES[metric_type](**kwargs)
+            self.children[()] = child
+            for method in ('inc', 'dec', 'set', 'set_function', 'observe', 'time'):
+                if hasattr(child, method):
+                    setattr(self, method, getattr(child, method))
+
+    def labels(self, *values):
+        """
+        Получение значения метрики для набора меток
+
+        Args:
+            *values: Значения меток в порядке labelnames
+
+        Returns:
+            Counter|Gauge|Histogram: Значение метрики
+        """
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"Метрика {self.name} ожидает метки: {', '.join(self.labelnames)}")
+            with self.lock:
+                child = self.children.get(key)
+                if child is None:
+                    child = self.TYPES[self.metric_type](**self.kwargs)
+                    self.children[key] = child
+        return child
+
+    @property
+    def value(self):
+        """Текущее значение метрики без меток"""
+        return self.labels().value
+
+    def render(self, labels=()):
+        """
+        Формирование текстового представления метрики
+
+        Args:
+            labels (tuple): Постоянные метки (имя, значение), добавляемые ко всем значениям
+        """
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.metric_type}"]
+
+        for key, child in list(self.children.items()):
+            child_labels = tuple(labels) + tuple(zip(self.labelnames, key))
+            for sample_name, sample_labels, value in child.samples(self.name, child_labels):
+                lines.append(f"{sample_name}{_format_labels(sample_labels)} {_format_value(value)}")
+
+        return '\n'.join(lines)
+
+
+class MetricsRegistry:
+    """Реестр метрик агента"""
+
+    def __init__(self):
+        """Инициализация реестра"""
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, name, documentation, metric_type, labelnames, **kwargs):
+        """Регистрация метрики (повторная регистрация возвращает существующую)"""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = Metric(name, documentation, metric_type, labelnames, **kwargs)
+                self.metrics[name] = metric
+            elif metric.metric_type != metric_type:
+                raise ValueError(f"Метрика {name} уже зарегистрирована с типом {metric.metric_type}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Регистрация счетчика
+
+        Args:
+            name (str): Имя метрики (суффикс _total добавляется при экспорте)
+            documentation (str): Описание метрики
+            labelnames (tuple): Имена меток
+
+        Returns:
+            Metric: Метрика
+        """
+        return self._register(name, documentation, 'counter', labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        """
+        Регистрация измерителя
+
+        Args:
+            name (str): Имя метрики
+            documentation (str): Описание метрики
+            labelnames (tuple): Имена меток
+
+        Returns:
+            Metric: Метрика
+        """
+        return self._register(name, documentation, 'gauge', labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_TIME_BUCKETS):
+        """
+        Регистрация гистограммы
+
+        Args:
+            name (str): Имя метрики
+            documentation (str): Описание метрики
+            labelnames (tuple): Имена меток
+            buckets (tuple): Верхние границы корзин
+
+        Returns:
+            Metric: Метрика
+        """
+        return self._register(name, documentation, 'histogram', labelnames, buckets=buckets)
+
+    def render(self, prefixes=None, labels=()):
+        """
+        Экспорт метрик в текстовом формате Prometheus
+
+        Args:
+            prefixes (tuple, optional): Экспортировать только метрики с указанными префиксами имени
+            labels (tuple): Постоянные метки (имя, значение), добавляемые ко всем значениям
+
+        Returns:
+            str: Текст для ответа на запрос /metrics
+        """
+        with self.lock:
+            metrics = [metric for metric in self.metrics.values()
+                       if prefixes is None or metric.name.startswith(prefixes)]
+        if not metrics:
+            return ''
+        return '\n'.join(metric.render(labels) for metric in metrics) + '\n'
+
+
+def _format_value(value):
+    """Форматирование числа для экспорта"""
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(labels):
+    """Форматирование меток для экспорта"""
+    if not labels:
+        return ''
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+# Общий реестр метрик процесса
+REGISTRY = MetricsRegistry()
+
+# Content-Type ответа в текстовом формате Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
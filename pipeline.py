@@ -0,0 +1,654 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль конвейеров обработки событий.
+
+Конвейер состоит из источника, цепочки фильтров и преобразований и
+приемника (source -> filter -> transform -> sink). Источник читает
+события в собственном потоке и кладет их в ограниченную очередь,
+обработчики конвейера забирают события пачками и передают в приемник.
+Остановка конвейера останавливает и поток чтения источника, поэтому
+приостановленный конвейер не расходует процессорное время.
+"""
+
+import time
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from agent_logger import AgentLogger
+from log_collector import LogCollector
+from metrics import REGISTRY
+
+# Инициализируем логгер
+logger = AgentLogger().get_logger('pipeline')
+
+# Метрики конвейеров
+PIPELINE_EVENTS = REGISTRY.counter('pipeline_events', 'Количество событий, прошедших этапы конвейера',
+                                   ('pipeline', 'stage'))
+PIPELINE_QUEUE_DEPTH = REGISTRY.gauge('pipeline_queue_depth', 'Количество событий в очереди конвейера',
+                                      ('pipeline',))
+PIPELINE_BATCH_TIME = REGISTRY.histogram('pipeline_batch_seconds', 'Время обработки пачки событий конвейером',
+                                         ('pipeline',))
+
+
+class EventBufferSource:
+    """
+    Источник событий из буфера веб-интерфейса.
+    Внутренние конвейеры читают буфер по курсору без потерь: пока конвейер
+    не принял событие, буфер его не вытесняет и ограниченное время ждет
+    (см. BufferCursor). Необязательные приемники (передача в RabbitMQ)
+    читают буфер через подписку с потерями и никогда не задерживают сбор.
+    Курсор или подписка открыты только пока источник запущен.
+    """
+
+    def __init__(self, event_buffer, replay=False, lossless=True):
+        """
+        Инициализация источника
+
+        Args:
+            event_buffer (EventBuffer): Буфер собранных событий
+            replay (bool): Передать при запуске события, уже находящиеся в буфере
+            lossless (bool): Читать по курсору без потерь, иначе через подписку
+        """
+        self.event_buffer = event_buffer
+        self.replay = replay
+        self.lossless = lossless
+        self.last_seq = None
+        self.cursor = None
+        self.subscription = None
+        self.dropped = 0
+        self.thread = None
+        self.running = False
+
+    def start(self, emit):
+        """
+        Запуск потока чтения
+
+        Args:
+            emit (function): Функция передачи события в конвейер; возвращает False,
+                             если конвейер остановлен
+        """
+        # После паузы продолжаем с последнего переданного события
+        last_seq = self.last_seq
+        if last_seq is None and self.replay:
+            last_seq = 0
+        self.running = True
+        if self.lossless:
+            self.cursor = self.event_buffer.open_cursor(last_seq)
+            self.thread = threading.Thread(target=self._read, args=(self.cursor, emit))
+        else:
+            self.subscription = self.event_buffer.subscribe(last_seq)
+            self.thread = threading.Thread(target=self._read_subscription, args=(self.subscription, emit))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Остановка потока чтения и закрытие курсора или подписки"""
+        self.running = False
+        if self.cursor:
+            self.cursor.close()
+        if self.subscription:
+            self.subscription.close()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def _read(self, cursor, emit):
+        """Поток чтения событий по курсору"""
+        while self.running:
+            # Курсор продвигается после передачи пачки, чтобы не брать блокировку буфера на каждое событие
+            try:
+                for seq, event, _ in cursor.read(timeout=1.0):
+                    if not emit(event):
+                        return
+                    self.last_seq = seq
+            finally:
+                if self.last_seq is not None and self.last_seq > cursor.seq:
+                    cursor.commit(self.last_seq)
+
+    def _read_subscription(self, subscription, emit):
+        """Поток чтения событий через подписку (отстающий конвейер теряет старые события)"""
+        while self.running:
+            batch, dropped = subscription.get_batch(timeout=1.0)
+            self.dropped += dropped
+            for seq, event, _ in batch:
+                if not emit(event):
+                    return
+                self.last_seq = seq
+
+    def describe(self):
+        """Описание источника для просмотра состояния"""
+        lost = self.cursor.lost if self.cursor else self.dropped
+        return {'type': 'buffer', 'last_seq': self.last_seq, 'lossless': self.lossless, 'lost': lost}
+
+
+class LogCollectorSource:
+    """
+    Источник событий, собирающий журналы Windows собственным коллектором.
+    Сбор повторяется с заданным интервалом, пока источник запущен.
+    """
+
+    def __init__(self, log_types, hours_back=1, interval=5):
+        """
+        Инициализация источника
+
+        Args:
+            log_types (list): Список типов журналов
+            hours_back (int): Количество часов назад для первого прохода сбора
+            interval (int): Интервал между проходами сбора в секундах
+        """
+        self.log_types = list(log_types)
+        self.hours_back = hours_back
+        self.interval = interval
+        self.collector = LogCollector()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self, emit):
+        """
+        Запуск потока чтения
+
+        Args:
+            emit (function): Функция передачи события в конвейер
+        """
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._read, args=(emit,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Остановка потока чтения"""
+        self.stop_event.set()
+        self.collector.stop_collecting()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def _read(self, emit):
+        """Поток периодического сбора событий"""
+        def callback(event):
+            # Прерываем проход сбора, если конвейер остановлен
+            if not emit(event):
+                self.collector.is_collecting = False
+
+        hours_back = self.hours_back
+        while not self.stop_event.is_set():
+            self.collector.start_collecting(self.log_types, hours_back, callback=callback)
+            self.collector.collect_thread.join()
+
+            # Следующие проходы охватывают только интервал с предыдущего сбора
+            hours_back = self.interval / 3600.0
+            if self.stop_event.wait(self.interval):
+                break
+
+    def describe(self):
+        """Описание источника для просмотра состояния"""
+        return {'type': 'collector', 'log_types': self.log_types, 'interval': self.interval}
+
+
+class RabbitMQSink:
+    """
+    Приемник, передающий пачки событий в RabbitMQ.
+    Если очередь отправки клиента переполнена, приемник ждет, и давление
+    передается через ограниченную очередь конвейера обратно источнику.
+    """
+
+    def __init__(self, rabbitmq_client, max_pending=10000):
+        """
+        Инициализация приемника
+
+        Args:
+            rabbitmq_client (RabbitMQClient): Клиент RabbitMQ
+            max_pending (int): Максимальное количество неотправленных сообщений клиента
+        """
+        self.rabbitmq_client = rabbitmq_client
+        self.max_pending = max_pending
+
+    def write(self, events, is_running):
+        """
+        Передача пачки событий
+
+        Args:
+            events (list): Список событий
+            is_running (function): Функция проверки, работает ли конвейер
+
+        Returns:
+            bool: Успешность передачи
+        """
+        while self.rabbitmq_client.pending_count >= self.max_pending and is_running():
+            time.sleep(0.05)
+        return self.rabbitmq_client.publish_logs(events)
+
+    def describe(self):
+        """Описание приемника для просмотра состояния"""
+        return {'type': 'rabbitmq', 'connected': self.rabbitmq_client.is_connected}
+
+
+class EventBufferSink:
+    """Приемник, добавляющий события в буфер веб-интерфейса"""
+
+    def __init__(self, event_buffer):
+        """
+        Инициализация приемника
+
+        Args:
+            event_buffer (EventBuffer): Буфер событий
+        """
+        self.event_buffer = event_buffer
+
+    def write(self, events, is_running):
+        """
+        Передача пачки событий
+
+        Args:
+            events (list): Список событий
+            is_running (function): Функция проверки, работает ли конвейер
+
+        Returns:
+            bool: Успешность передачи
+        """
+        for event in events:
+            self.event_buffer.append(event)
+        return True
+
+    def describe(self):
+        """Описание приемника для просмотра состояния"""
+        return {'type': 'buffer'}
+
+
+class AlertSink:
+    """
+    Приемник событий тревоги.
+    Хранит последние тревоги для просмотра и передает их в RabbitMQ с
+    отдельным ключом маршрутизации, если есть подключение к брокеру.
+    """
+
+    def __init__(self, rabbitmq_client, routing_key, history=100):
+        """
+        Инициализация приемника
+
+        Args:
+            rabbitmq_client (RabbitMQClient): Клиент RabbitMQ
+            routing_key (str): Ключ маршрутизации тревог
+            history (int): Количество последних тревог, доступных для просмотра
+        """
+        self.rabbitmq_client = rabbitmq_client
+        self.routing_key = routing_key
+        self.history = deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.unsent = 0
+
+    def write(self, events, is_running):
+        """
+        Передача пачки тревог
+
+        Args:
+            events (list): Список событий тревоги
+            is_running (function): Функция проверки, работает ли конвейер
+
+        Returns:
+            bool: Успешность передачи (тревоги без подключения остаются только в истории)
+        """
+        with self.lock:
+            self.history.extend(events)
+        if self.rabbitmq_client.is_connected and self.rabbitmq_client.publish_logs(events, self.routing_key):
+            return True
+        with self.lock:
+            self.unsent += len(events)
+        return True
+
+    def recent(self, limit=None):
+        """
+        Последние тревоги, новые первыми
+
+        Args:
+            limit (int, optional): Максимальное количество тревог
+
+        Returns:
+            list: События тревоги
+        """
+        with self.lock:
+            alerts = list(reversed(self.history))
+        return alerts[:limit] if limit else alerts
+
+    def describe(self):
+        """Описание приемника для просмотра состояния"""
+        return {'type': 'alerts', 'routing_key': self.routing_key,
+                'connected': self.rabbitmq_client.is_connected, 'unsent': self.unsent}
+
+
+def field_filter(field, values):
+    """
+    Создание фильтра по значению поля события
+
+    Args:
+        field (str): Имя поля
+        values (list): Допустимые значения
+
+    Returns:
+        function: Предикат для конвейера
+    """
+    allowed = frozenset(str(value) for value in values)
+    return lambda event: str(event.get(field, '')) in allowed
+
+
+class Pipeline:
+    """Конвейер обработки событий с собственными потоками и ограниченной очередью"""
+
+    # Состояния конвейера
+    CREATED = 'created'
+    RUNNING = 'running'
+    STOPPED = 'stopped'
+
+    def __init__(self, name, source, sink, filters=(), transforms=(),
+                 workers=1, queue_size=1000, batch_size=100):
+        """
+        Инициализация конвейера
+
+        Args:
+            name (str): Имя конвейера
+            source: Источник событий (методы start, stop, describe)
+            sink: Приемник событий (методы write, describe)
+            filters (tuple): Предикаты event -> bool; событие проходит, если все вернули True
+            transforms (tuple): Функции event -> event; None означает отбросить событие
+            workers (int): Количество потоков обработки
+            queue_size (int): Размер очереди между источником и обработчиками
+            batch_size (int): Максимальный размер пачки, передаваемой в приемник
+        """
+        if workers < 1:
+            raise ValueError("Количество потоков обработки должно быть не меньше 1")
+        if queue_size < 1 or batch_size < 1:
+            raise ValueError("Размеры очереди и пачки должны быть положительными")
+
+        self.name = name
+        self.source = source
+        self.sink = sink
+        self.filters = tuple(filters)
+        self.transforms = tuple(transforms)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.state = self.CREATED
+        self.running = False
+        self.worker_threads = []
+        self.lock = threading.Lock()
+        self.started_at = None
+        self.stopped_at = None
+
+        # Счетчики этапов конвейера
+        self.read_metric = PIPELINE_EVENTS.labels(name, 'read')
+        self.filtered_metric = PIPELINE_EVENTS.labels(name, 'filtered')
+        self.written_metric = PIPELINE_EVENTS.labels(name, 'written')
+        self.failed_metric = PIPELINE_EVENTS.labels(name, 'failed')
+        self.batch_time_metric = PIPELINE_BATCH_TIME.labels(name)
+        PIPELINE_QUEUE_DEPTH.labels(name).set_function(self.queue.qsize)
+
+    @property
+    def threads(self):
+        """Количество потоков конвейера (поток чтения и обработчики)"""
+        return self.workers + 1
+
+    def is_running(self):
+        """Проверка, работает ли конвейер"""
+        return self.running
+
+    def start(self):
+        """Запуск конвейера"""
+        with self.lock:
+            if self.running:
+                return
+
+            self.running = True
+            self.worker_threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"pipeline-{self.name}-{index}")
+                thread.daemon = True
+                thread.start()
+                self.worker_threads.append(thread)
+
+            self.source.start(self.emit)
+            self.state = self.RUNNING
+            self.started_at = datetime.now()
+
+        logger.info(f"Конвейер {self.name} запущен, потоков обработки: {self.workers}")
+
+    def stop(self):
+        """Остановка конвейера (события, уже прочитанные источником, обрабатываются до конца)"""
+        with self.lock:
+            if not self.running:
+                return
+
+            # Флаг снимается до остановки источника: поток чтения, ожидающий места
+            # в заполненной очереди в emit(), иначе не завершится до таймаута join.
+            # Обработчики дорабатывают события, уже попавшие в очередь
+            self.running = False
+            self.source.stop()
+            for thread in self.worker_threads:
+                thread.join(timeout=5.0)
+            self.worker_threads = []
+            self.state = self.STOPPED
+            self.stopped_at = datetime.now()
+
+        logger.info(f"Конвейер {self.name} остановлен")
+
+    def emit(self, event):
+        """
+        Передача события от источника в очередь конвейера.
+        При заполненной очереди поток источника ждет (обратное давление).
+
+        Args:
+            event (dict): Данные события
+
+        Returns:
+            bool: False, если конвейер остановлен и чтение нужно прекратить
+        """
+        while self.running:
+            try:
+                self.queue.put(event, timeout=0.5)
+                self.read_metric.inc()
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker(self):
+        """Поток обработки событий"""
+        while self.running or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            # Добираем пачку без ожидания
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            try:
+                self._process(batch)
+            except Exception as e:
+                self.failed_metric.inc(len(batch))
+                logger.error(f"Ошибка при обработке пачки конвейером {self.name}: {str(e)}")
+            self.batch_time_metric.observe(time.perf_counter() - started)
+
+    def _process(self, batch):
+        """Применение фильтров и преобразований к пачке и передача в приемник"""
+        events = []
+        for event in batch:
+            if not all(predicate(event) for predicate in self.filters):
+                continue
+            for transform in self.transforms:
+                event = transform(event)
+                if event is None:
+                    break
+            if event is not None:
+                events.append(event)
+
+        self.filtered_metric.inc(len(batch) - len(events))
+        if not events:
+            return
+
+        if self.sink.write(events, self.is_running):
+            self.written_metric.inc(len(events))
+        else:
+            self.failed_metric.inc(len(events))
+
+    def get_stats(self):
+        """
+        Получение состояния конвейера
+
+        Returns:
+            dict: Состояние, параметры и счетчики конвейера
+        """
+        return {
+            'name': self.name,
+            'state': self.state,
+            'workers': self.workers,
+            'threads': self.threads if self.running else 0,
+            'queue_size': self.queue.maxsize,
+            'queue_depth': self.queue.qsize(),
+            'batch_size': self.batch_size,
+            'read': self.read_metric.value,
+            'filtered': self.filtered_metric.value,
+            'written': self.written_metric.value,
+            'failed': self.failed_metric.value,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'stopped_at': self.stopped_at.strftime('%Y-%m-%d %H:%M:%S') if self.stopped_at else None,
+            'source': self.source.describe(),
+            'sink': self.sink.describe()
+        }
+
+
+class PipelineManager:
+    """
+    Менеджер именованных конвейеров.
+    Следит за общим бюджетом потоков: конвейер не будет запущен,
+    если его потоки превысят оставшийся бюджет.
+    """
+
+    def __init__(self, max_threads=16):
+        """
+        Инициализация менеджера
+
+        Args:
+            max_threads (int): Общее количество потоков, доступное конвейерам
+        """
+        self.max_threads = max_threads
+        self.pipelines = {}
+        self.lock = threading.Lock()
+
+    def add(self, pipeline, replace=False):
+        """
+        Регистрация конвейера
+
+        Args:
+            pipeline (Pipeline): Конвейер
+            replace (bool): Заменить остановленный конвейер с тем же именем
+
+        Returns:
+            Pipeline: Зарегистрированный конвейер
+
+        Raises:
+            ValueError: Если конвейер с таким именем уже существует
+        """
+        with self.lock:
+            existing = self.pipelines.get(pipeline.name)
+            if existing is not None:
+                if not replace or existing.running:
+                    raise ValueError(f"Конвейер {pipeline.name} уже существует")
+            self.pipelines[pipeline.name] = pipeline
+        return pipeline
+
+    def get(self, name):
+        """
+        Получение конвейера по имени
+
+        Args:
+            name (str): Имя конвейера
+
+        Returns:
+            Pipeline: Конвейер или None
+        """
+        with self.lock:
+            return self.pipelines.get(name)
+
+    def used_threads(self):
+        """Количество потоков, занятых работающими конвейерами"""
+        with self.lock:
+            return sum(pipeline.threads for pipeline in self.pipelines.values() if pipeline.running)
+
+    def start(self, name):
+        """
+        Запуск конвейера
+
+        Args:
+            name (str): Имя конвейера
+
+        Raises:
+            KeyError: Если конвейер не найден
+            ValueError: Если не хватает бюджета потоков
+        """
+        with self.lock:
+            pipeline = self.pipelines.get(name)
+            if pipeline is None:
+                raise KeyError(f"Конвейер {name} не найден")
+            if pipeline.running:
+                return
+
+            used = sum(p.threads for p in self.pipelines.values() if p.running)
+            if used + pipeline.threads > self.max_threads:
+                raise ValueError(f"Недостаточно потоков для запуска конвейера {name}: "
+                                 f"занято {used} из {self.max_threads}, требуется {pipeline.threads}")
+
+            # Запуск под блокировкой, чтобы два конвейера не заняли один и тот же бюджет
+            pipeline.start()
+
+    def stop(self, name):
+        """
+        Остановка конвейера
+
+        Args:
+            name (str): Имя конвейера
+
+        Raises:
+            KeyError: Если конвейер не найден
+        """
+        pipeline = self.get(name)
+        if pipeline is None:
+            raise KeyError(f"Конвейер {name} не найден")
+        pipeline.stop()
+
+    def remove(self, name):
+        """
+        Остановка и удаление конвейера
+
+        Args:
+            name (str): Имя конвейера
+        """
+        with self.lock:
+            pipeline = self.pipelines.pop(name, None)
+        if pipeline is not None:
+            pipeline.stop()
+
+    def stop_all(self):
+        """Остановка всех конвейеров"""
+        with self.lock:
+            pipelines = list(self.pipelines.values())
+        for pipeline in pipelines:
+            pipeline.stop()
+
+    def get_stats(self):
+        """
+        Получение состояния всех конвейеров
+
+        Returns:
+            dict: Бюджет потоков и состояние каждого конвейера
+        """
+        with self.lock:
+            pipelines = list(self.pipelines.values())
+        return {
+            'max_threads': self.max_threads,
+            'used_threads': sum(p.threads for p in pipelines if p.running),
+            'pipelines': [pipeline.get_stats() for pipeline in pipelines]
+        }
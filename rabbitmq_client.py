@@ -10,6 +10,16 @@ import time
 import logging
 import queue
 from agent_logger import AgentLogger
+from metrics import REGISTRY
+
+# Метрики отправителя
+QUEUE_DEPTH = REGISTRY.gauge('rabbitmq_queue_depth', 'Количество сообщений, ожидающих отправки')
+QUEUE_WAIT = REGISTRY.histogram('rabbitmq_queue_wait_seconds', 'Время ожидания сообщения в очереди отправки')
+SERIALIZATION_TIME = REGISTRY.histogram('rabbitmq_serialization_seconds', 'Время сериализации сообщения в JSON')
+PUBLISH_TIME = REGISTRY.histogram('rabbitmq_publish_seconds', 'Время выполнения basic_publish')
+PUBLISHED_MESSAGES = REGISTRY.counter('rabbitmq_published', 'Количество отправленных сообщений')
+DROPPED_MESSAGES = REGISTRY.counter('rabbitmq_dropped', 'Количество сообщений, потерянных при отправке')
+RECONNECTS = REGISTRY.counter('rabbitmq_reconnects', 'Количество попыток переподключения к RabbitMQ')
 
 class RabbitMQClient:
     """Класс для работы с RabbitMQ"""
@@ -27,6 +37,30 @@ class RabbitMQClient:
         self.publish_exchange = 'windows_logs'
         self.publish_routing_key = 'system.logs'
         
+        # Счетчики работы отправителя (обновляются на месте, читаются через get_stats)
+        self.stats_lock = threading.Lock()
+        self.pending_count = 0
+        self.published_count = 0
+        self.failed_count = 0
+        self.reconnect_count = 0
+        QUEUE_DEPTH.set_function(lambda: self.pending_count)
+        
+    def get_stats(self):
+        """
+        Получение текущих счетчиков отправителя
+        
+        Returns:
+            dict: Состояние подключения, глубина очереди и счетчики сообщений
+        """
+        with self.stats_lock:
+            return {
+                'connected': self.is_connected,
+                'queue_depth': self.pending_count,
+                'published': self.published_count,
+                'failed': self.failed_count,
+                'reconnects': self.reconnect_count
+            }
+        
     def connect(self, host='localhost', port=5672, 
                 virtual_host='/', username='guest', password='guest', 
                 exchange='windows_logs', routing_key='system.logs',
@@ -131,12 +165,13 @@ class RabbitMQClient:
         self._disconnect()
         self.logger.info("Отключено от RabbitMQ")
     
-    def publish_log(self, log_data):
+    def publish_log(self, log_data, routing_key=None):
         """
         Публикация лога в очередь для последующей отправки
         
         Args:
             log_data (dict): Данные лога для отправки
+            routing_key (str, optional): Ключ маршрутизации (по умолчанию ключ подключения)
             
         Returns:
             bool: Успешность добавления в очередь
@@ -146,12 +181,43 @@ class RabbitMQClient:
             return False
             
         try:
-            self.publish_queue.put(log_data)
+            # Время постановки в очередь нужно для метрики ожидания отправки
+            self.publish_queue.put((time.perf_counter(), log_data, routing_key))
+            with self.stats_lock:
+                self.pending_count += 1
             return True
         except Exception as e:
             self.logger.error(f"Ошибка добавления сообщения в очередь: {str(e)}")
             return False
     
+    def publish_logs(self, logs, routing_key=None):
+        """
+        Публикация пачки логов в очередь одной операцией
+        
+        Args:
+            logs (list): Список словарей с данными логов
+            routing_key (str, optional): Ключ маршрутизации (по умолчанию ключ подключения)
+            
+        Returns:
+            bool: Успешность добавления пачки в очередь
+        """
+        if not self.worker_thread or not self.worker_thread.is_alive():
+            self.logger.warning("Рабочий поток не запущен, невозможно отправить сообщения")
+            return False
+            
+        if not logs:
+            return True
+            
+        try:
+            # Пачка кладется в очередь как один элемент, рабочий поток отправит ее целиком
+            self.publish_queue.put((time.perf_counter(), list(logs), routing_key))
+            with self.stats_lock:
+                self.pending_count += len(logs)
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка добавления пачки сообщений в очередь: {str(e)}")
+            return False
+    
     def _worker_thread(self):
         """Рабочий поток для отправки сообщений"""
         self.logger.info("Запущен поток отправки сообщений")
@@ -169,6 +235,9 @@ class RabbitMQClient:
                         
                         # Пытаемся переподключиться
                         self.logger.info(f"Попытка переподключения к RabbitMQ через {reconnect_delay} секунд")
+                        with self.stats_lock:
+                            self.reconnect_count += 1
+                        RECONNECTS.inc()
                         params = self.connection_params.copy()
                         auto_reconnect = params.pop('auto_reconnect', True)
                         
@@ -188,26 +257,66 @@ class RabbitMQClient:
                 # Если подключены, обрабатываем сообщения из очереди
                 if self.is_connected:
                     try:
-                        # Получаем сообщение из очереди с таймаутом
-                        log_data = self.publish_queue.get(block=True, timeout=1.0)
-                        
-                        # Преобразуем в JSON
-                        message = json.dumps(log_data, ensure_ascii=False)
+                        # Получаем сообщение или пачку сообщений из очереди с таймаутом
+                        enqueued_at, item, routing_key = self.publish_queue.get(block=True, timeout=1.0)
+                        messages = item if isinstance(item, list) else [item]
+                        QUEUE_WAIT.observe(time.perf_counter() - enqueued_at)
                         
-                        # Отправляем сообщение
-                        self.channel.basic_publish(
-                            exchange=self.publish_exchange,
-                            routing_key=self.publish_routing_key,
-                            body=message,
-                            properties=pika.BasicProperties(
-                                delivery_mode=2,  # Persistent
-                                content_type='application/json',
-                                content_encoding='utf-8'
-                            )
+                        properties = pika.BasicProperties(
+                            delivery_mode=2,  # Persistent
+                            content_type='application/json',
+                            content_encoding='utf-8'
                         )
                         
-                        # Помечаем задачу как выполненную
-                        self.publish_queue.task_done()
+                        sent = 0
+                        try:
+                            for log_data in messages:
+                                # Преобразуем в JSON
+                                started = time.perf_counter()
+                                message = json.dumps(log_data, ensure_ascii=False)
+                                serialized = time.perf_counter()
+                                
+                                # Отправляем сообщение
+                                self.channel.basic_publish(
+                                    exchange=self.publish_exchange,
+                                    routing_key=routing_key or self.publish_routing_key,
+                                    body=message,
+                                    properties=properties
+                                )
+                                sent += 1
+                                
+                                SERIALIZATION_TIME.observe(serialized - started)
+                                PUBLISH_TIME.observe(time.perf_counter() - serialized)
+                        except pika.exceptions.AMQPError:
+                            # Неотправленный остаток пачки вернется в очередь после переподключения
+                            if isinstance(item, list) and sent < len(messages):
+                                self.publish_queue.put((enqueued_at, messages[sent:], routing_key))
+                                requeued = len(messages) - sent
+                            else:
+                                requeued = 0
+                            with self.stats_lock:
+                                self.failed_count += len(messages) - sent - requeued
+                                self.pending_count -= len(messages) - requeued
+                                self.published_count += sent
+                            DROPPED_MESSAGES.inc(len(messages) - sent - requeued)
+                            PUBLISHED_MESSAGES.inc(sent)
+                            raise
+                        except Exception:
+                            with self.stats_lock:
+                                self.failed_count += len(messages) - sent
+                                self.pending_count -= len(messages)
+                                self.published_count += sent
+                            DROPPED_MESSAGES.inc(len(messages) - sent)
+                            PUBLISHED_MESSAGES.inc(sent)
+                            raise
+                        else:
+                            with self.stats_lock:
+                                self.pending_count -= len(messages)
+                                self.published_count += sent
+                            PUBLISHED_MESSAGES.inc(sent)
+                        finally:
+                            # Помечаем задачу как выполненную
+                            self.publish_queue.task_done()
                         
                     except queue.Empty:
                         # Если очередь пуста, продолжаем цикл
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+"""
+Агрегаты событий по интервалам времени.
+
+Для каждой минуты и каждого часа хранится количество событий по ключу
+(журнал, уровень, источник, идентификатор события). Агрегаты обновляются
+по мере прохождения событий через конвейер, поэтому вопросы вида
+"сколько ошибок по источникам за сутки" решаются просмотром нескольких
+тысяч интервалов, а не исходных событий.
+"""
+
+import os
+import re
+import json
+import time
+import calendar
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from agent_logger import AgentLogger
+from metrics import REGISTRY
+from utils import get_event_field
+
+logger = AgentLogger().get_logger('rollups')
+
+# Метрики агрегатов
+ROLLUP_EVENTS = REGISTRY.counter('rollup_events', 'Количество событий, учтенных в агрегатах')
+ROLLUP_QUERY_TIME = REGISTRY.histogram('rollup_query_seconds', 'Время выполнения запроса к агрегатам')
+
+# Разрешения агрегатов: длина интервала и срок хранения в секундах
+RESOLUTIONS = {
+    'minute': (60, 48 * 3600),
+    'hour': (3600, 90 * 86400),
+}
+
+# Период, до которого по умолчанию используются минутные интервалы (секунд)
+MINUTE_QUERY_SPAN = 6 * 3600
+
+# Поля ключа агрегата; по ним допускаются группировка и фильтрация
+KEY_FIELDS = ('log_type', 'level', 'source', 'event_id')
+
+# Интервал сохранения агрегатов на диск (секунд)
+SAVE_INTERVAL = 60
+
+# Количество ключей, после которого проверяется, не пора ли убрать неиспользуемые
+KEYS_COMPACT_MIN = 10000
+
+# Время события 'YYYY-MM-DD HH:MM:SS'
+TIME_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_time(text):
+    """
+    Время 'YYYY-MM-DD HH:MM:SS' в секундах
+
+    Время событий локальное и не содержит часового пояса, поэтому
+    преобразование выполняется без учета пояса и обратимо через format_time.
+
+    Args:
+        text (str): Время
+
+    Returns:
+        int: Секунды или None, если время не разобрано
+    """
+    match = TIME_PATTERN.match(text)
+    if match is None:
+        return None
+    return calendar.timegm(tuple(map(int, match.groups())))
+
+
+def format_time(seconds):
+    """Время в секундах в формате 'YYYY-MM-DD HH:MM:SS'"""
+    return time.strftime(TIME_FORMAT, time.gmtime(seconds))
+
+
+def now_seconds():
+    """Текущее локальное время в секундах (в той же шкале, что parse_time)"""
+    return calendar.timegm(datetime.now().timetuple())
+
+
+def _event_key(event):
+    """Ключ агрегата для события"""
+    return (
+        str(get_event_field(event, 'journal')),
+        str(get_event_field(event, 'level')),
+        str(get_event_field(event, 'source')),
+        str(get_event_field(event, 'id')),
+    )
+
+
+class EventRollups:
+    """
+    Счетчики событий по минутам и часам.
+
+    Ключи (журнал, уровень, источник, идентификатор) хранятся один раз
+    в таблице ключей, интервал хранит только номера ключей и количества.
+    Интервалы старше срока хранения удаляются. Агрегаты периодически
+    сохраняются в файл JSON и загружаются из него при запуске.
+    """
+
+    def __init__(self, path=None):
+        """
+        Инициализация агрегатов
+
+        Args:
+            path (str, optional): Файл для сохранения агрегатов (без файла агрегаты только в памяти)
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.keys = []          # номер ключа -> ключ
+        self.key_numbers = {}   # ключ -> номер ключа
+        self.buckets = {name: {} for name in RESOLUTIONS}   # начало интервала -> {номер ключа: количество}
+        self.starts = {name: [] for name in RESOLUTIONS}    # начала интервалов по возрастанию
+        self.changed = False
+        self.stop_event = threading.Event()
+        self.save_thread = None
+        self.last_prune = 0
+
+    def add(self, events):
+        """
+        Учет пачки событий
+
+        Args:
+            events (list): События; события без разобранного времени учитываются текущим временем
+        """
+        now = None
+        with self.lock:
+            for event in events:
+                seconds = parse_time(str(get_event_field(event, 'time')))
+                if seconds is None:
+                    now = now or now_seconds()
+                    seconds = now
+
+                key = _event_key(event)
+                number = self.key_numbers.get(key)
+                if number is None:
+                    number = self.key_numbers[key] = len(self.keys)
+                    self.keys.append(key)
+
+                for name, (size, _) in RESOLUTIONS.items():
+                    start = seconds - seconds % size
+                    bucket = self.buckets[name].get(start)
+                    if bucket is None:
+                        bucket = self.buckets[name][start] = {}
+                        insort(self.starts[name], start)
+                    bucket[number] = bucket.get(number, 0) + 1
+            self.changed = True
+
+        ROLLUP_EVENTS.inc(len(events))
+        if time.monotonic() - self.last_prune >= SAVE_INTERVAL:
+            self.prune()
+
+    def prune(self):
+        """Удаление интервалов старше срока хранения и неиспользуемых ключей"""
+        self.last_prune = time.monotonic()
+        now = now_seconds()
+        with self.lock:
+            for name, (_, retention) in RESOLUTIONS.items():
+                starts = self.starts[name]
+                count = bisect_left(starts, now - retention)
+                for start in starts[:count]:
+                    del self.buckets[name][start]
+                del starts[:count]
+                if count:
+                    self.changed = True
+
+            # Таблица ключей перестраивается, когда большая часть ключей больше не встречается
+            if len(self.keys) >= KEYS_COMPACT_MIN:
+                used = set()
+                for bucket in self.buckets['hour'].values():
+                    used.update(bucket)
+                if len(used) * 2 < len(self.keys):
+                    self._renumber_keys(sorted(used))
+
+    def _renumber_keys(self, used):
+        """Перенумерация используемых ключей (вызывается под блокировкой)"""
+        mapping = {old: new for new, old in enumerate(used)}
+        self.keys = [self.keys[old] for old in used]
+        self.key_numbers = {key: number for number, key in enumerate(self.keys)}
+        for buckets in self.buckets.values():
+            for start, bucket in buckets.items():
+                buckets[start] = {mapping[number]: count for number, count in bucket.items()}
+
+    def query(self, start=None, end=None, group_by=(), resolution=None, series=False, limit=100, **filters):
+        """
+        Количество событий за период с группировкой
+
+        Границы периода округляются до интервалов выбранного разрешения.
+
+        Args:
+            start (str, optional): Начало периода 'YYYY-MM-DD HH:MM:SS' (по умолчанию сутки назад)
+            end (str, optional): Конец периода, не включительно (по умолчанию текущее время)
+            group_by (tuple): Поля группировки из KEY_FIELDS
+            resolution (str, optional): 'minute' или 'hour' (по умолчанию по длине периода)
+            series (bool): Добавить количество событий по интервалам
+            limit (int): Максимальное количество групп в ответе (самые многочисленные)
+            **filters: Значения полей из KEY_FIELDS, по которым отбираются события
+
+        Returns:
+            dict: Период, разрешение, общее количество, группы и (при series) ряд по интервалам
+
+        Raises:
+            ValueError: Если поле группировки, фильтр, разрешение или время указаны неверно
+        """
+        started = time.perf_counter()
+        group_by = tuple(group_by or ())
+        for field in group_by + tuple(filters):
+            if field not in KEY_FIELDS:
+                raise ValueError(f"Неизвестное поле агрегата: {field}")
+        positions = [KEY_FIELDS.index(field) for field in group_by]
+        conditions = [(KEY_FIELDS.index(field), str(value)) for field, value in filters.items()
+                      if value not in (None, '')]
+
+        end_seconds = parse_time(end) if end else now_seconds() + 1
+        start_seconds = parse_time(start) if start else end_seconds - 86400
+        if start_seconds is None or end_seconds is None:
+            raise ValueError("Время должно быть в формате 'YYYY-MM-DD HH:MM:SS'")
+
+        if resolution is None:
+            minute_oldest = now_seconds() - RESOLUTIONS['minute'][1]
+            short = end_seconds - start_seconds <= MINUTE_QUERY_SPAN and start_seconds >= minute_oldest
+            resolution = 'minute' if short else 'hour'
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Неизвестное разрешение: {resolution}")
+        size = RESOLUTIONS[resolution][0]
+        start_seconds -= start_seconds % size
+        end_seconds += -end_seconds % size
+
+        groups = {}
+        totals = {}
+        total = 0
+        with self.lock:
+            # Фильтры и группа вычисляются один раз для каждого ключа, а не для каждого интервала
+            key_groups = {
+                number: tuple(key[position] for position in positions)
+                for number, key in enumerate(self.keys)
+                if all(key[position] == value for position, value in conditions)
+            }
+            starts = self.starts[resolution]
+            buckets = self.buckets[resolution]
+            for bucket_start in starts[bisect_left(starts, start_seconds):bisect_left(starts, end_seconds)]:
+                bucket_total = 0
+                for number, count in buckets[bucket_start].items():
+                    group = key_groups.get(number)
+                    if group is None:
+                        continue
+                    bucket_total += count
+                    groups[group] = groups.get(group, 0) + count
+                totals[bucket_start] = bucket_total
+                total += bucket_total
+
+        ordered = sorted(groups.items(), key=lambda item: item[1], reverse=True)
+        result = {
+            'start': format_time(start_seconds),
+            'end': format_time(end_seconds),
+            'resolution': resolution,
+            'total': total,
+            'groups': [dict(zip(group_by, group), count=count) for group, count in ordered[:limit]]
+                      if group_by else [],
+        }
+        if series:
+            # Ряд содержит все интервалы периода, в том числе без событий, в пределах срока хранения
+            now = now_seconds()
+            first = max(start_seconds, now - RESOLUTIONS[resolution][1] - now % size)
+            last = min(end_seconds, now - now % size + size)
+            result['series'] = [{'time': format_time(point), 'count': totals.get(point, 0)}
+                                for point in range(first, last, size)]
+        ROLLUP_QUERY_TIME.observe(time.perf_counter() - started)
+        return result
+
+    def load(self):
+        """Загрузка сохраненных агрегатов из файла"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with self.lock:
+                self.keys = [tuple(key) for key in data['keys']]
+                self.key_numbers = {key: number for number, key in enumerate(self.keys)}
+                for name in RESOLUTIONS:
+                    # Счетчики интервала хранятся плоским списком: номер ключа, количество, ...
+                    self.buckets[name] = {
+                        int(start): dict(zip(values[::2], values[1::2]))
+                        for start, values in data.get(name, {}).items()
+                    }
+                    self.starts[name] = sorted(self.buckets[name])
+            logger.info(f"Загружены агрегаты событий из {self.path}: ключей {len(self.keys)}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Не удалось загрузить агрегаты событий из {self.path}: {str(e)}")
+        self.prune()
+
+    def save(self):
+        """Сохранение агрегатов в файл, если они изменились"""
+        if not self.path:
+            return
+        with self.lock:
+            if not self.changed:
+                return
+            data = {
+                'version': 1,
+                'keys': list(self.keys),
+                **{
+                    name: {
+                        str(start): [value for item in bucket.items() for value in item]
+                        for start, bucket in buckets.items()
+                    }
+                    for name, buckets in self.buckets.items()
+                },
+            }
+            self.changed = False
+
+        # Запись во временный файл с заменой: прерванное сохранение не портит файл
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.changed = True
+            logger.error(f"Не удалось сохранить агрегаты событий в {self.path}: {str(e)}")
+
+    def start_saving(self, interval=SAVE_INTERVAL):
+        """
+        Запуск фонового сохранения агрегатов
+
+        Args:
+            interval (float): Интервал сохранения в секундах
+        """
+        if self.save_thread and self.save_thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.save_thread = threading.Thread(target=self._save_loop, args=(interval,), name='rollups-save')
+        self.save_thread.daemon = True
+        self.save_thread.start()
+
+    def _save_loop(self, interval):
+        """Поток сохранения агрегатов"""
+        while not self.stop_event.wait(interval):
+            self.prune()
+            self.save()
+
+    def close(self):
+        """Остановка фонового сохранения и сохранение агрегатов"""
+        self.stop_event.set()
+        if self.save_thread and self.save_thread.is_alive():
+            self.save_thread.join(timeout=5.0)
+        self.save()
+
+
+class RollupSink:
+    """Приемник конвейера, обновляющий агрегаты событий"""
+
+    def __init__(self, rollups):
+        """
+        Инициализация приемника
+
+        Args:
+            rollups (EventRollups): Агрегаты событий
+        """
+        self.rollups = rollups
+
+    def write(self, events, is_running):
+        """
+        Передача пачки событий
+
+        Args:
+            events (list): Список событий
+            is_running (function): Функция проверки, работает ли конвейер
+
+        Returns:
+            bool: Успешность записи
+        """
+        self.rollups.add(events)
+        return True
+
+    def describe(self):
+        """Описание приемника для просмотра состояния"""
+        return {'type': 'rollups', 'path': self.rollups.path}
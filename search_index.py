@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Инвертированный индекс для поиска подстроки в собранных событиях
+"""
+
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+# Токены - непрерывные последовательности букв и цифр (в том числе кириллических)
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Каждые сколько строк проверяется отмена поиска
+CANCEL_CHECK_INTERVAL = 4096
+
+
+def _trigrams(token):
+    """Множество триграмм токена"""
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class SearchIndex:
+    """
+    Индекс строк событий для поиска подстроки.
+
+    Для каждого токена хранится возрастающий список номеров строк, в которых
+    он встречается, а словарь токенов проиндексирован триграммами. Поиск
+    подстроки сводится к пересечению списков строк для токенов запроса:
+    каждый токен запроса обязан быть подстрокой какого-либо токена строки.
+    Найденные кандидаты затем проверяются точным поиском подстроки, поэтому
+    результат совпадает с проверкой `query in text` по всем строкам.
+
+    Индекс дополняется в конец, а самые старые строки могут быть убраны
+    из индекса (trim); поиск по ним выполняется последовательным проходом
+    через функцию spilled_texts.
+
+    Изменения выполняются под блокировкой, а поиск в другом потоке берет ее
+    только для выборки списков и запоминает количество строк (limit).
+    add() дописывает строки и номера в существующие списки на месте, поэтому
+    поиск может увидеть строки, добавленные после выборки, но отбрасывает
+    все номера не меньше limit; строки с меньшими номерами в списках уже не
+    меняются. trim() не изменяет списки, а заменяет их укороченными копиями,
+    поэтому поиск продолжает работать со старыми.
+    """
+
+    def __init__(self, spilled_texts=None):
+        """
+        Инициализация пустого индекса
+
+        Args:
+            spilled_texts (callable, optional): Функция (end), возвращающая пары
+                (номер строки, строка в нижнем регистре) для убранных из индекса
+                строк с номерами меньше end
+        """
+        self._lock = threading.Lock()
+        self.spilled_texts = spilled_texts
+        self.clear()
+
+    def clear(self):
+        """Удаление всех строк"""
+        with self._lock:
+            self._base = 0        # номер первой строки в индексе
+            self._texts = []
+            self._postings = {}   # токен -> номера строк
+            self._trigrams = {}   # триграмма -> токены словаря
+
+    def __len__(self):
+        return self._base + len(self._texts)
+
+    def text(self, row):
+        """
+        Строка по номеру
+
+        Args:
+            row (int): Номер строки (не меньше номера первой строки в индексе)
+
+        Returns:
+            str: Строка в нижнем регистре
+        """
+        return self._texts[row - self._base]
+
+    def trim(self, base):
+        """
+        Удаление из индекса строк с номерами меньше base
+
+        Args:
+            base (int): Номер новой первой строки индекса
+        """
+        with self._lock:
+            if base <= self._base:
+                return
+            # Списки заменяются новыми: поиск в другом потоке продолжает работать со старыми
+            self._texts = self._texts[base - self._base:]
+            self._base = base
+
+            removed = {}   # триграмма -> токены, больше не встречающиеся в индексе
+            for token, postings in list(self._postings.items()):
+                if postings[0] >= base:
+                    continue
+                position = bisect_left(postings, base)
+                if position < len(postings):
+                    self._postings[token] = postings[position:]
+                    continue
+
+                del self._postings[token]
+                for trigram in _trigrams(token):
+                    removed.setdefault(trigram, set()).add(token)
+
+            for trigram, tokens in removed.items():
+                tokens = self._trigrams[trigram] - tokens
+                if tokens:
+                    self._trigrams[trigram] = tokens
+                else:
+                    del self._trigrams[trigram]
+
+    def add(self, texts):
+        """
+        Добавление строк в конец индекса
+
+        Args:
+            texts (list): Строки в нижнем регистре
+        """
+        with self._lock:
+            first = self._base + len(self._texts)
+            self._texts.extend(texts)
+
+            for row, text in enumerate(texts, first):
+                for token in set(TOKEN_PATTERN.findall(text)):
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = array('I')
+                        for trigram in _trigrams(token):
+                            self._trigrams.setdefault(trigram, set()).add(token)
+                    postings.append(row)
+
+    def _matching_tokens(self, part):
+        """Токены словаря, содержащие подстроку (вызывается под блокировкой)"""
+        if len(part) < 3:
+            return [token for token in self._postings if part in token]
+
+        candidates = None
+        for trigram in sorted(_trigrams(part), key=lambda t: len(self._trigrams.get(t, ()))):
+            tokens = self._trigrams.get(trigram)
+            if not tokens:
+                return []
+            candidates = set(tokens) if candidates is None else candidates & tokens
+            if not candidates:
+                return []
+        return [token for token in candidates if part in token]
+
+    def search(self, query, is_cancelled=None):
+        """
+        Поиск строк, содержащих подстроку
+
+        Args:
+            query (str): Текст запроса
+            is_cancelled (callable, optional): Функция без аргументов, возвращающая
+                True, если результат больше не нужен
+
+        Returns:
+            tuple: (возрастающие номера найденных строк, количество строк в индексе
+                на момент поиска) или None, если поиск отменен
+        """
+        query = query.lower()
+        parts = TOKEN_PATTERN.findall(query)
+
+        # Под блокировкой только выбираются списки строк, сам поиск идет без нее
+        with self._lock:
+            base = self._base
+            limit = base + len(self._texts)
+            texts = self._texts
+            groups = [
+                [self._postings[token] for token in self._matching_tokens(part)]
+                for part in parts
+            ]
+
+        result = array('I')
+
+        # Строки, убранные из индекса, проверяются последовательным проходом
+        if base and self.spilled_texts is not None:
+            for i, (row, text) in enumerate(self.spilled_texts(base)):
+                if i % CANCEL_CHECK_INTERVAL == 0 and is_cancelled and is_cancelled():
+                    return None
+                if query in text:
+                    result.append(row)
+
+        if groups:
+            candidates = None
+            for group in sorted(groups, key=lambda g: sum(len(postings) for postings in g)):
+                rows = set()
+                for postings in group:
+                    rows.update(postings)
+                candidates = rows if candidates is None else candidates & rows
+                if not candidates:
+                    return result, limit
+                if is_cancelled and is_cancelled():
+                    return None
+            # Строки, добавленные после выборки списков, в результат не входят
+            candidates = sorted(row for row in candidates if base <= row < limit)
+        else:
+            candidates = range(base, limit)
+
+        for i, row in enumerate(candidates):
+            if i % CANCEL_CHECK_INTERVAL == 0 and is_cancelled and is_cancelled():
+                return None
+            if query in texts[row - base]:
+                result.append(row)
+        return result, limit
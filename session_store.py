@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище событий сеанса с ограниченным окном в памяти
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+from agent_logger import AgentLogger
+from metrics import REGISTRY
+
+logger = AgentLogger().get_logger('session_store')
+
+# Метрики хранилища сеанса
+SPILLED_EVENTS = REGISTRY.counter('session_store_spilled_events', 'Количество событий, вытесненных из памяти на диск')
+SEGMENT_READS = REGISTRY.counter('session_store_block_reads', 'Количество блоков событий, прочитанных с диска')
+
+# Количество событий в блоке: для блока хранится смещение в файле сегмента
+BLOCK_SIZE = 256
+
+# Максимальный размер файла сегмента, после которого начинается новый (байт)
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+# Количество прочитанных с диска блоков, хранимых в кэше
+CACHE_BLOCKS = 64
+
+
+class _Segment:
+    """Файл сегмента: события в формате NDJSON и смещения начала каждого блока"""
+
+    def __init__(self, path, start):
+        """
+        Args:
+            path (str): Путь к файлу сегмента
+            start (int): Номер первого события сегмента в сеансе
+        """
+        self.path = path
+        self.start = start
+        self.count = 0
+        self.size = 0
+        self.block_offsets = array('Q')
+
+
+class SessionSnapshot:
+    """
+    Представление первых событий хранилища, зафиксированных при создании.
+
+    Длина представления не меняется при добавлении событий и вытеснении их
+    на диск, поэтому его можно читать из другого потока (например, при
+    экспорте). Если хранилище очищено во время чтения, доступ к событию
+    вызывает RuntimeError вместо чтения событий нового сеанса.
+    """
+
+    def __init__(self, store, length, generation):
+        """
+        Args:
+            store (SessionEventStore): Хранилище
+            length (int): Количество событий в представлении
+            generation (int): Номер очистки хранилища на момент создания
+        """
+        self._store = store
+        self._length = length
+        self._generation = generation
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._store._get(i, self._generation) for i in range(*key.indices(self._length))]
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("Номер события вне диапазона")
+        return self._store._get(key, self._generation)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self._store._get(i, self._generation)
+
+
+class SessionEventStore:
+    """
+    Хранилище событий сеанса.
+
+    Последние события хранятся в памяти, более старые вытесняются пачками
+    в файлы сегментов на диске. Для каждого блока из BLOCK_SIZE событий
+    запоминается смещение в файле, поэтому событие по номеру читается одним
+    позиционированием и чтением блока, а недавно прочитанные блоки кэшируются.
+    Объем памяти ограничен размером окна и не зависит от длительности сеанса.
+
+    Объект ведет себя как последовательность: поддерживаются len(),
+    доступ по номеру и срезы.
+    """
+
+    def __init__(self, window_size=100000, spill_size=25000, directory=None):
+        """
+        Инициализация хранилища
+
+        Args:
+            window_size (int): Количество последних событий, хранимых в памяти
+            spill_size (int): Количество событий, вытесняемых на диск за раз
+            directory (str, optional): Каталог файлов сегментов (по умолчанию временный)
+        """
+        self.window_size = window_size
+        self.spill_size = spill_size
+        self._directory = directory
+        self._own_directory = directory is None
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._segments = []
+        self._segment_starts = []
+        self._writer = None
+        self._window = []
+        self.window_start = 0
+        # Увеличивается при каждой очистке, чтобы представления замечали ее
+        self.generation = 0
+
+    def __len__(self):
+        return self.window_start + len(self._window)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self._get(i) for i in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("Номер события вне диапазона")
+        return self._get(key)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def snapshot(self):
+        """
+        Представление текущих событий для чтения из другого потока
+
+        Returns:
+            SessionSnapshot: Представление фиксированной длины
+        """
+        with self._lock:
+            return SessionSnapshot(self, len(self), self.generation)
+
+    def _get(self, index, generation=None):
+        """Событие по номеру в пределах хранилища"""
+        # Блокировка нужна для чтения из другого потока (например, при экспорте)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                raise RuntimeError("Хранилище событий очищено во время чтения")
+            if index >= self.window_start:
+                return self._window[index - self.window_start]
+
+            segment_number = bisect_right(self._segment_starts, index) - 1
+            segment = self._segments[segment_number]
+            block = (index - segment.start) // BLOCK_SIZE
+            events = self._read_block(segment_number, block)
+            return events[index - segment.start - block * BLOCK_SIZE]
+
+    def _read_block(self, segment_number, block):
+        """Чтение блока событий из сегмента с кэшированием (вызывается под блокировкой)"""
+        key = (segment_number, block)
+        events = self._cache.get(key)
+        if events is not None:
+            self._cache.move_to_end(key)
+            return events
+
+        segment = self._segments[segment_number]
+        count = min(BLOCK_SIZE, segment.count - block * BLOCK_SIZE)
+        with open(segment.path, 'rb') as f:
+            f.seek(segment.block_offsets[block])
+            events = [json.loads(f.readline()) for _ in range(count)]
+        SEGMENT_READS.inc()
+
+        self._cache[key] = events
+        if len(self._cache) > CACHE_BLOCKS:
+            self._cache.popitem(last=False)
+        return events
+
+    def append(self, events):
+        """
+        Добавление событий в конец хранилища
+
+        Args:
+            events (list): События
+
+        Returns:
+            int: Количество событий, вытесненных на диск при добавлении
+        """
+        with self._lock:
+            self._window.extend(events)
+
+        spilled = 0
+        while len(self._window) > self.window_size + self.spill_size:
+            spilled += self._spill(self.spill_size)
+        return spilled
+
+    def _spill(self, count):
+        """Запись самых старых событий окна в текущий сегмент"""
+        chunk = self._window[:count]
+
+        with self._lock:
+            segment = self._current_segment()
+            lines = [(json.dumps(log, ensure_ascii=False) + '\n').encode('utf-8') for log in chunk]
+            for line in lines:
+                if segment.count % BLOCK_SIZE == 0:
+                    segment.block_offsets.append(segment.size)
+                segment.count += 1
+                segment.size += len(line)
+            self._writer.write(b''.join(lines))
+            self._writer.flush()
+
+            del self._window[:count]
+            self.window_start += count
+
+        SPILLED_EVENTS.inc(count)
+        return count
+
+    def _current_segment(self):
+        """Сегмент для записи; новый создается, если текущий достиг предельного размера"""
+        if self._segments and self._segments[-1].size < SEGMENT_MAX_BYTES:
+            return self._segments[-1]
+
+        if self._writer is not None:
+            self._writer.close()
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='log_agent_session_')
+        os.makedirs(self._directory, exist_ok=True)
+
+        path = os.path.join(self._directory, f'segment_{len(self._segments):06d}.ndjson')
+        segment = _Segment(path, self.window_start)
+        self._writer = open(path, 'wb')
+        self._segments.append(segment)
+        self._segment_starts.append(segment.start)
+        logger.info(f"Создан сегмент событий сеанса: {path}")
+        return segment
+
+    def iter_spilled(self, end=None):
+        """
+        Последовательное чтение вытесненных на диск событий
+
+        Может вызываться из другого потока: читаются только события,
+        записанные к моменту вызова.
+
+        Args:
+            end (int, optional): Номер события, до которого читать
+
+        Yields:
+            tuple: (номер события, событие)
+        """
+        with self._lock:
+            segments = [(s.path, s.start, s.count) for s in self._segments]
+
+        for path, start, count in segments:
+            if end is not None:
+                count = min(count, end - start)
+            if count <= 0:
+                break
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                # Хранилище очищено во время чтения
+                return
+            with f:
+                for index in range(start, start + count):
+                    yield index, json.loads(f.readline())
+
+    def clear(self):
+        """Удаление всех событий, в том числе файлов сегментов"""
+        with self._lock:
+            self.generation += 1
+        self.close()
+        with self._lock:
+            self._window = []
+            self.window_start = 0
+
+    def close(self):
+        """Закрытие и удаление файлов сегментов"""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for segment in self._segments:
+                try:
+                    os.remove(segment.path)
+                except OSError:
+                    pass
+            self._segments = []
+            self._segment_starts = []
+            self._cache.clear()
+            if self._own_directory and self._directory is not None:
+                shutil.rmtree(self._directory, ignore_errors=True)
+                self._directory = None
@@ -0,0 +1,94 @@
+/**
+ * Фоновый поток фильтрации событий страницы логов.
+ *
+ * Столбцы строятся один раз при добавлении событий: уровень, тип журнала
+ * и строка для текстового поиска в нижнем регистре. Номера событий
+ * хранятся упорядоченными по времени, поэтому результат фильтра получается
+ * одним проходом без сортировки.
+ *
+ * Сообщения:
+ *   {type: 'filter', filter, generation} - смена фильтра, ответ 'filtered'
+ *   {type: 'append', start, logs, times} - новые события, ответ 'matched'
+ *   {type: 'trim', base} - удаление событий с номерами меньше base
+ *   {type: 'clear'} - удаление всех событий
+ */
+importScripts('/static/js/sorted_index.js');
+
+// Столбцы хранятся со смещением: элемент 0 соответствует событию с номером base
+let base = 0;
+const levels = [];
+const logTypes = [];
+const texts = [];
+const times = [];
+const order = new SortedIndex((a, b) => (times[a - base] - times[b - base]) || (a - b));
+
+let filter = { text: '', level: null, logType: null };
+let generation = 0;
+
+// Проверка события на соответствие текущему фильтру
+function matches(index) {
+    const i = index - base;
+    if (filter.level !== null && levels[i] !== filter.level) return false;
+    if (filter.logType !== null && logTypes[i] !== filter.logType) return false;
+    if (filter.text && !texts[i].includes(filter.text)) return false;
+    return true;
+}
+
+// Добавление событий и отбор подходящих под фильтр
+function append(start, logs, eventTimes) {
+    const added = [];
+    for (let i = 0; i < logs.length; i++) {
+        const log = logs[i];
+        const index = start + i;
+        levels[index - base] = log.level;
+        logTypes[index - base] = log.log_type;
+        texts[index - base] = `${log.id} ${log.source} ${log.log_type} ${log.level_name} ${log.message}`.toLowerCase();
+        times[index - base] = eventTimes[i];
+        added.push(index);
+    }
+    added.sort(order.compare);
+    order.insertMany(added);
+
+    const matched = added.filter(matches);
+    self.postMessage({ type: 'matched', generation: generation, indexes: matched });
+}
+
+// Полный проход по упорядоченному списку для нового фильтра
+function applyFilter() {
+    const result = new Int32Array(order.length);
+    let count = 0;
+    for (const block of order.blocks) {
+        for (const index of block) {
+            if (matches(index)) result[count++] = index;
+        }
+    }
+    const indexes = result.slice(0, count);
+    self.postMessage({ type: 'filtered', generation: generation, indexes: indexes }, [indexes.buffer]);
+}
+
+self.onmessage = function(message) {
+    const data = message.data;
+    if (data.type === 'filter') {
+        filter = data.filter;
+        generation = data.generation;
+        applyFilter();
+    } else if (data.type === 'append') {
+        append(data.start, data.logs, data.times);
+    } else if (data.type === 'trim') {
+        const count = data.base - base;
+        if (count <= 0) return;
+        order.filter(index => index >= data.base);
+        levels.splice(0, count);
+        logTypes.splice(0, count);
+        texts.splice(0, count);
+        times.splice(0, count);
+        base = data.base;
+    } else if (data.type === 'clear') {
+        base = 0;
+        levels.length = 0;
+        logTypes.length = 0;
+        texts.length = 0;
+        times.length = 0;
+        order.reset([]);
+    }
+};
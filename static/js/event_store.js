@@ -0,0 +1,195 @@
+/**
+ * Хранилище событий страницы логов.
+ *
+ * События хранятся в порядке поступления, повторы отсекаются по ключу
+ * (log_type, id) через Map. Время каждого события разбирается один раз
+ * при добавлении и хранится числом, поэтому сравнение событий по времени
+ * не разбирает строки дат.
+ *
+ * В памяти держится ограниченное окно последних событий: при превышении
+ * maxEvents самые старые по порядку поступления события удаляются пачкой.
+ * Номера событий при этом не меняются - номер первого хранимого события
+ * равен base, а номера удаленных событий больше не используются.
+ */
+class EventStore {
+    /**
+     * @param {number} [maxEvents=200000] - количество хранимых событий
+     * @param {number} [evictCount=20000] - количество событий, удаляемых за раз
+     */
+    constructor(maxEvents = 200000, evictCount = 20000) {
+        this.maxEvents = maxEvents;
+        this.evictCount = evictCount;
+        this.clear();
+    }
+
+    /** Удаление всех событий */
+    clear() {
+        this.base = 0;
+        this.events = [];
+        this.times = [];
+        this.keys = new Map();
+    }
+
+    /** Номер, который получит следующее событие */
+    get end() {
+        return this.base + this.events.length;
+    }
+
+    /** Количество хранимых событий */
+    get size() {
+        return this.events.length;
+    }
+
+    /**
+     * Разбор времени события в миллисекунды
+     *
+     * @param {string} time - время в формате 'YYYY-MM-DD HH:MM:SS'
+     * @returns {number} метка времени (0, если время не удалось разобрать)
+     */
+    static parseTime(time) {
+        if (typeof time === 'string' && time.length >= 19 && time[4] === '-' && time[10] === ' ') {
+            return Date.UTC(
+                +time.slice(0, 4), +time.slice(5, 7) - 1, +time.slice(8, 10),
+                +time.slice(11, 13), +time.slice(14, 16), +time.slice(17, 19)
+            );
+        }
+        const parsed = Date.parse(time);
+        return Number.isNaN(parsed) ? 0 : parsed;
+    }
+
+    /**
+     * Добавление событий с отсечением уже полученных
+     *
+     * @param {Array} logs - события
+     * @returns {number} номер первого добавленного события; добавленные
+     *          события занимают номера от него до end - 1
+     */
+    add(logs) {
+        const start = this.end;
+        for (const log of logs) {
+            const key = `${log.log_type}\u0000${log.id}`;
+            if (this.keys.has(key)) continue;
+            this.keys.set(key, this.end);
+            this.events.push(log);
+            this.times.push(EventStore.parseTime(log.time));
+        }
+        return start;
+    }
+
+    /**
+     * Удаление самых старых событий, если превышен размер окна
+     *
+     * @returns {boolean} true, если события были удалены (изменился base)
+     */
+    evict() {
+        if (this.events.length <= this.maxEvents) return false;
+
+        const count = Math.min(this.events.length, this.events.length - this.maxEvents + this.evictCount);
+        for (let i = 0; i < count; i++) {
+            const log = this.events[i];
+            this.keys.delete(`${log.log_type}\u0000${log.id}`);
+        }
+        this.events.splice(0, count);
+        this.times.splice(0, count);
+        this.base += count;
+        return true;
+    }
+
+    /**
+     * Событие по номеру
+     *
+     * @param {number} index - номер события (не меньше base)
+     */
+    get(index) {
+        return this.events[index - this.base];
+    }
+
+    /**
+     * Сравнение событий по времени, при равном времени - по порядку поступления
+     *
+     * @param {number} a - номер первого события
+     * @param {number} b - номер второго события
+     */
+    compare(a, b) {
+        return (this.times[a - this.base] - this.times[b - this.base]) || (a - b);
+    }
+}
+
+
+/**
+ * Фильтрация событий в фоновом потоке (Web Worker).
+ *
+ * Поток хранит собственную копию нужных для фильтра столбцов и список
+ * событий, упорядоченный по времени. Ответы, относящиеся к устаревшему
+ * фильтру, отбрасываются по номеру поколения: поток обрабатывает сообщения
+ * по порядку, поэтому все события, отправленные до смены фильтра, уже
+ * учтены в полном результате для нового фильтра.
+ */
+class EventFilter {
+    /**
+     * @param {Object} handlers
+     * @param {Function} handlers.onFiltered - полный результат фильтра: (indexes) => void
+     * @param {Function} handlers.onMatched - подходящие события из новой пачки: (indexes) => void
+     */
+    constructor(handlers) {
+        this.generation = 0;
+        this.worker = new Worker('/static/js/event_filter_worker.js');
+        this.worker.onmessage = (message) => {
+            const data = message.data;
+            if (data.generation !== this.generation) return;
+            if (data.type === 'filtered') {
+                handlers.onFiltered(data.indexes);
+            } else if (data.type === 'matched') {
+                handlers.onMatched(data.indexes);
+            }
+        };
+        this.worker.onerror = (error) => console.error('Ошибка фильтрации событий:', error.message);
+    }
+
+    /**
+     * Установка фильтра; результат придет в onFiltered
+     *
+     * @param {Object} filter - {text, level, logType}
+     */
+    setFilter(filter) {
+        this.generation++;
+        this.worker.postMessage({ type: 'filter', filter: filter, generation: this.generation });
+    }
+
+    /**
+     * Передача новых событий; подходящие под фильтр придут в onMatched
+     *
+     * @param {EventStore} store - хранилище событий
+     * @param {number} start - номер первого нового события
+     */
+    append(store, start) {
+        if (start >= store.end) return;
+        this.worker.postMessage({
+            type: 'append',
+            start: start,
+            logs: store.events.slice(start - store.base).map(log => ({
+                id: log.id,
+                source: log.source,
+                level: log.level,
+                level_name: log.level_name,
+                log_type: log.log_type,
+                message: log.message
+            })),
+            times: store.times.slice(start - store.base)
+        });
+    }
+
+    /**
+     * Удаление в потоке фильтрации событий с номерами меньше base
+     *
+     * @param {number} base - номер первого хранимого события
+     */
+    trim(base) {
+        this.worker.postMessage({ type: 'trim', base: base });
+    }
+
+    /** Удаление всех событий в потоке фильтрации */
+    clear() {
+        this.worker.postMessage({ type: 'clear' });
+    }
+}
@@ -17,7 +17,7 @@ function updateTime() {
 
 // Обновление статуса подключения к RabbitMQ
 function updateRabbitMQStatus() {
-    fetch('/api/status')
+    fetch('/api/status', { cache: 'no-cache' })
         .then(response => response.json())
         .then(data => {
             const statusIndicator = document.getElementById('rabbitmq-status-indicator');
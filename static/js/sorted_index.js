@@ -0,0 +1,162 @@
+/**
+ * Упорядоченный список, разбитый на блоки ограниченного размера.
+ *
+ * Вставка элемента стоит O(log n + B): двоичный поиск блока и сдвиг
+ * внутри одного блока, а не всего массива. Доступ по позиции -
+ * двоичный поиск по началам блоков. Используется для упорядоченного
+ * по времени списка событий таблицы, в который события приходят
+ * не по порядку.
+ */
+class SortedIndex {
+    /**
+     * @param {Function} compare - функция сравнения элементов (a, b) => число
+     * @param {number} [blockSize=1024] - размер блока; блок вдвое большего размера делится пополам
+     */
+    constructor(compare, blockSize = 1024) {
+        this.compare = compare;
+        this.blockSize = blockSize;
+        this.reset([]);
+    }
+
+    /**
+     * Замена содержимого уже упорядоченным массивом
+     *
+     * @param {Array} items - упорядоченные элементы
+     */
+    reset(items) {
+        this.blocks = [];
+        for (let start = 0; start < items.length; start += this.blockSize) {
+            this.blocks.push(items.slice(start, start + this.blockSize));
+        }
+        this.length = items.length;
+        this.offsets = null;
+    }
+
+    /** Начальные позиции блоков (пересчитываются после изменений при первом обращении) */
+    _getOffsets() {
+        if (this.offsets === null) {
+            this.offsets = new Array(this.blocks.length);
+            let position = 0;
+            for (let i = 0; i < this.blocks.length; i++) {
+                this.offsets[i] = position;
+                position += this.blocks[i].length;
+            }
+        }
+        return this.offsets;
+    }
+
+    /**
+     * Элемент по позиции
+     *
+     * @param {number} position - позиция от 0 до length - 1
+     */
+    get(position) {
+        const offsets = this._getOffsets();
+        let low = 0;
+        let high = offsets.length - 1;
+        while (low < high) {
+            const middle = (low + high + 1) >> 1;
+            if (offsets[middle] <= position) low = middle;
+            else high = middle - 1;
+        }
+        return this.blocks[low][position - offsets[low]];
+    }
+
+    /** Последний элемент (undefined для пустого списка) */
+    last() {
+        if (this.blocks.length === 0) return undefined;
+        const block = this.blocks[this.blocks.length - 1];
+        return block[block.length - 1];
+    }
+
+    /**
+     * Вставка элемента с сохранением порядка
+     *
+     * @param {*} item - элемент
+     */
+    insert(item) {
+        this.length++;
+        this.offsets = null;
+
+        if (this.blocks.length === 0) {
+            this.blocks.push([item]);
+            return;
+        }
+
+        // Первый блок, последний элемент которого больше вставляемого
+        let low = 0;
+        let high = this.blocks.length - 1;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            const block = this.blocks[middle];
+            if (this.compare(block[block.length - 1], item) > 0) high = middle;
+            else low = middle + 1;
+        }
+
+        const block = this.blocks[low];
+        let start = 0;
+        let end = block.length;
+        while (start < end) {
+            const middle = (start + end) >> 1;
+            if (this.compare(block[middle], item) > 0) end = middle;
+            else start = middle + 1;
+        }
+        block.splice(start, 0, item);
+
+        if (block.length >= this.blockSize * 2) {
+            this.blocks.splice(low + 1, 0, block.splice(this.blockSize));
+        }
+    }
+
+    /**
+     * Вставка упорядоченной пачки элементов
+     *
+     * @param {Array} items - упорядоченные элементы
+     */
+    insertMany(items) {
+        if (items.length === 0) return;
+
+        const last = this.last();
+        if (last === undefined || this.compare(last, items[0]) <= 0) {
+            // Обычный случай: вся пачка после последнего элемента, дописываем блоками
+            let block = this.blocks.length > 0 ? this.blocks[this.blocks.length - 1] : null;
+            for (const item of items) {
+                if (block === null || block.length >= this.blockSize) {
+                    block = [];
+                    this.blocks.push(block);
+                }
+                block.push(item);
+            }
+            this.length += items.length;
+            this.offsets = null;
+            return;
+        }
+
+        for (const item of items) {
+            this.insert(item);
+        }
+    }
+
+    /**
+     * Удаление элементов, не удовлетворяющих условию, с сохранением порядка
+     *
+     * @param {Function} keep - условие (item) => boolean
+     * @returns {number} количество удаленных элементов
+     */
+    filter(keep) {
+        const before = this.length;
+        const blocks = [];
+        let length = 0;
+        for (const block of this.blocks) {
+            const kept = block.filter(keep);
+            if (kept.length > 0) {
+                blocks.push(kept);
+                length += kept.length;
+            }
+        }
+        this.blocks = blocks;
+        this.length = length;
+        this.offsets = null;
+        return before - length;
+    }
+}
@@ -0,0 +1,148 @@
+/**
+ * Виртуальная таблица для больших списков событий.
+ *
+ * DOM-строки создаются только для видимой области (плюс небольшой запас),
+ * остальная высота списка занята двумя строками-распорками. Строки
+ * переиспользуются при прокрутке, содержимое заполняется функцией renderRow.
+ * Высота строки фиксирована, поэтому номер первой видимой строки
+ * вычисляется по scrollTop без измерения DOM.
+ */
+class VirtualTable {
+    /**
+     * @param {Object} options
+     * @param {HTMLElement} options.container - прокручиваемый контейнер таблицы
+     * @param {HTMLElement} options.tbody - тело таблицы
+     * @param {number} options.columns - количество столбцов
+     * @param {number} options.rowHeight - высота строки в пикселях
+     * @param {Function} options.createRow - создание пустой строки: () => HTMLTableRowElement
+     * @param {Function} options.renderRow - заполнение строки: (tr, index) => void
+     * @param {string} options.emptyText - текст для пустой таблицы
+     * @param {number} [options.overscan=10] - количество строк запаса сверху и снизу
+     */
+    constructor(options) {
+        this.container = options.container;
+        this.tbody = options.tbody;
+        this.columns = options.columns;
+        this.rowHeight = options.rowHeight;
+        this.createRow = options.createRow;
+        this.renderRow = options.renderRow;
+        this.emptyText = options.emptyText;
+        this.overscan = options.overscan || 10;
+
+        this.rowCount = 0;
+        this.rows = [];           // пул DOM-строк
+        this.rowIndexes = [];     // номер строки данных, отображаемой в каждой DOM-строке
+        this.firstRendered = -1;
+        this.frameRequested = false;
+
+        this.topSpacer = this._createSpacer();
+        this.bottomSpacer = this._createSpacer();
+        this.emptyRow = document.createElement('tr');
+        const emptyCell = document.createElement('td');
+        emptyCell.colSpan = this.columns;
+        emptyCell.className = 'text-center';
+        emptyCell.textContent = this.emptyText;
+        this.emptyRow.appendChild(emptyCell);
+
+        this.tbody.replaceChildren(this.emptyRow);
+
+        this.container.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        window.addEventListener('resize', () => this.scheduleRender());
+    }
+
+    _createSpacer() {
+        const tr = document.createElement('tr');
+        tr.className = 'virtual-spacer';
+        const td = document.createElement('td');
+        td.colSpan = this.columns;
+        tr.appendChild(td);
+        return tr;
+    }
+
+    /**
+     * Изменение количества строк
+     *
+     * @param {number} count - новое количество строк
+     * @param {number} [insertedBefore=0] - сколько строк добавлено (или удалено,
+     *        если число отрицательное) выше текущей позиции прокрутки; если таблица
+     *        прокручена, позиция сдвигается, чтобы видимые строки остались на месте
+     */
+    setRowCount(count, insertedBefore = 0) {
+        this.rowCount = count;
+        if (insertedBefore !== 0 && this.container.scrollTop > 0) {
+            this.container.scrollTop += insertedBefore * this.rowHeight;
+        }
+        // Содержимое строк могло сместиться, поэтому видимая область перерисовывается полностью
+        this.firstRendered = -1;
+        this.scheduleRender();
+    }
+
+    /** Перерисовка видимых строк (например, после смены фильтра) */
+    refresh() {
+        this.firstRendered = -1;
+        this.scheduleRender();
+    }
+
+    /** Прокрутка к началу таблицы */
+    scrollToTop() {
+        this.container.scrollTop = 0;
+        this.scheduleRender();
+    }
+
+    /** Отрисовка не чаще одного раза за кадр */
+    scheduleRender() {
+        if (this.frameRequested) return;
+        this.frameRequested = true;
+        requestAnimationFrame(() => {
+            this.frameRequested = false;
+            this.render();
+        });
+    }
+
+    render() {
+        if (this.rowCount === 0) {
+            if (this.tbody.firstChild !== this.emptyRow || this.tbody.childNodes.length !== 1) {
+                this.tbody.replaceChildren(this.emptyRow);
+            }
+            this.firstRendered = -1;
+            return;
+        }
+
+        const viewportHeight = this.container.clientHeight;
+        const first = Math.max(Math.floor(this.container.scrollTop / this.rowHeight) - this.overscan, 0);
+        const visibleCount = Math.ceil(viewportHeight / this.rowHeight) + this.overscan * 2;
+        const last = Math.min(first + visibleCount, this.rowCount);
+        const count = last - first;
+
+        // Пул строк растет до размера видимой области и дальше не меняется
+        while (this.rows.length < count) {
+            this.rows.push(this.createRow());
+            this.rowIndexes.push(-1);
+        }
+
+        if (this.tbody.firstChild !== this.topSpacer) {
+            this.tbody.replaceChildren(this.topSpacer, ...this.rows, this.bottomSpacer);
+        }
+
+        this.topSpacer.style.height = `${first * this.rowHeight}px`;
+        this.bottomSpacer.style.height = `${(this.rowCount - last) * this.rowHeight}px`;
+
+        // Заполняются только строки, которые показывают другие данные
+        const fullRedraw = this.firstRendered === -1;
+        for (let i = 0; i < this.rows.length; i++) {
+            const tr = this.rows[i];
+            if (i >= count) {
+                tr.hidden = true;
+                this.rowIndexes[i] = -1;
+                continue;
+            }
+            tr.hidden = false;
+            const index = first + i;
+            if (fullRedraw || this.rowIndexes[i] !== index) {
+                this.renderRow(tr, index);
+                this.rowIndexes[i] = index;
+            }
+        }
+        this.firstRendered = first;
+    }
+}
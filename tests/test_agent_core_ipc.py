@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты обмена с ядром агента через Unix-сокет (agent_core)
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_core import (AgentCoreClient, AgentCoreError, AgentCoreServer, MAX_FRAME_SIZE, _FRAME_HEADER,
+                        _read_frame, _write_frame)
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="нужны Unix-сокеты")
+
+
+class _FakeCore:
+    """Ядро, выполняющее вызовы без побочных эффектов"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def dispatch(self, call):
+        self.calls.append(call['method'])
+        time.sleep(self.delay)
+        if call['method'] == 'fail':
+            return {'error': 'плохой параметр', 'type': 'ValueError'}
+        return {'result': call['params'].get('value')}
+
+
+@pytest.fixture
+def server(tmp_path):
+    servers = []
+
+    def start(core):
+        path = str(tmp_path / f'core_{len(servers)}.sock')
+        instance = AgentCoreServer(core, path)
+        threading.Thread(target=instance.serve_forever, daemon=True).start()
+        servers.append(instance)
+        return path
+
+    yield start
+    for instance in servers:
+        instance.shutdown()
+        instance.server_close()
+
+
+def test_frame_round_trip_and_eof():
+    left, right = socket.socketpair()
+    payload = [{'method': 'get_status', 'params': {'текст': 'значение'}}]
+    _write_frame(left, payload)
+    assert _read_frame(right) == payload
+
+    left.close()
+    assert _read_frame(right) is None
+    right.close()
+
+
+def test_oversized_frame_is_rejected():
+    left, right = socket.socketpair()
+    left.sendall(_FRAME_HEADER.pack(MAX_FRAME_SIZE + 1))
+    with pytest.raises(AgentCoreError):
+        _read_frame(right)
+    left.close()
+    right.close()
+
+
+def test_call_many_keeps_order_and_maps_errors(server):
+    core = _FakeCore()
+    client = AgentCoreClient(server(core))
+    started = time.monotonic()
+
+    assert client.call_many([('a', {'value': 1}), ('b', {'value': [2]}), ('c', {})]) == [1, [2], None]
+    with pytest.raises(ValueError, match='плохой параметр'):
+        client.call_many([('fail', {})])
+    # После ошибки метода соединение остается рабочим
+    assert client.call_many([('a', {'value': 3})]) == [3]
+    assert core.calls == ['a', 'b', 'c', 'fail', 'a']
+    # Проверка простаивающего соединения не ждет таймаута ответа
+    assert time.monotonic() - started < 5.0
+
+
+def test_read_timeout_is_not_retried(server):
+    core = _FakeCore(delay=0.5)
+    client = AgentCoreClient(server(core), timeout=0.1)
+
+    with pytest.raises(AgentCoreError):
+        client.call_many([('start', {})])
+    time.sleep(0.6)
+    assert core.calls == ['start']
+
+
+def test_connection_closed_by_core_is_replaced(tmp_path):
+    path = str(tmp_path / 'core.sock')
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(5)
+    received = []
+
+    def serve():
+        # Каждое соединение обслуживает один запрос и закрывается, как при перезапуске ядра
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            with connection:
+                calls = _read_frame(connection)
+                received.append(calls)
+                _write_frame(connection, [{'result': len(received)} for _ in calls])
+
+    threading.Thread(target=serve, daemon=True).start()
+    client = AgentCoreClient(path)
+    assert client.call_many([('a', {})]) == [1]
+    time.sleep(0.1)
+    assert client.call_many([('a', {})]) == [2]
+    assert len(received) == 2
+    listener.close()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты чтения дописываемого журнала (agent_logger.LogFileTail)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_logger import LogFileTail
+
+
+def _append(path, text):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_reads_only_new_complete_lines(tmp_path):
+    path = str(tmp_path / 'agent.log')
+    _append(path, 'old\n')
+    tail = LogFileTail(path)
+    assert tail.read_lines() == ['old']
+
+    _append(path, 'one\ntw')
+    assert tail.read_lines() == ['one']
+    _append(path, 'o\n')
+    assert tail.read_lines() == ['two']
+    assert tail.read_lines() == []
+
+
+def test_file_is_not_kept_open_and_rotation_is_followed(tmp_path):
+    path = str(tmp_path / 'agent.log')
+    _append(path, '2026-10-18 first\n')
+    tail = LogFileTail(path)
+    assert tail.read_lines() == ['2026-10-18 first']
+
+    # Ротация переименованием (в Windows она невозможна, пока файл открыт)
+    _append(path, '2026-10-18 last')
+    os.rename(path, path + '.2026-10-18')
+    _append(path, '2026-10-19 new\n')
+    assert tail.read_lines() == ['2026-10-18 last', '2026-10-19 new']
+
+
+def test_truncated_file_is_read_from_start(tmp_path):
+    path = str(tmp_path / 'agent.log')
+    _append(path, 'a long first line\n')
+    tail = LogFileTail(path)
+    tail.read_lines()
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('a\n')
+    assert tail.read_lines() == ['a']
+
+
+def test_initial_read_starts_at_line_boundary(tmp_path):
+    path = str(tmp_path / 'agent.log')
+    _append(path, ''.join(f"line {number}\n" for number in range(100)))
+    tail = LogFileTail(path, initial_bytes=20)
+    assert tail.read_lines() == ['line 98', 'line 99']
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты обнаружения всплесков частоты событий (anomaly_detector.RateAnomalyDetector)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anomaly_detector import WARMUP_INTERVALS, RateAnomalyDetector
+from rollups import format_time, parse_time
+
+BASE = parse_time('2026-10-19 10:00:00')
+
+
+def _event(seconds, source='Security-Auditing', event_id='4625'):
+    return {'time': format_time(seconds), 'log_type': 'Security', 'source': source, 'id': event_id}
+
+
+def _feed(detector, seconds, count, **kwargs):
+    return [alert for alert in (detector.detect(_event(seconds, **kwargs)) for _ in range(count)) if alert]
+
+
+def test_no_alert_during_warmup():
+    detector = RateAnomalyDetector(interval=10)
+    alerts = []
+    for interval in range(WARMUP_INTERVALS):
+        alerts += _feed(detector, BASE + interval * 10, 100 if interval % 2 else 1)
+    assert alerts == []
+
+
+def test_spike_raises_one_alert_per_interval():
+    detector = RateAnomalyDetector(interval=10)
+    for interval in range(10):
+        assert _feed(detector, BASE + interval * 10, 2) == []
+
+    alerts = _feed(detector, BASE + 100, 100)
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert alert['alert'] == 'rate_anomaly'
+    assert alert['count'] == 20
+    assert alert['source'] == 'Security-Auditing'
+    assert alert['event_id'] == '4625'
+    assert alert['time'] == '2026-10-19 10:01:40'
+
+    # В следующем интервале тревога поднимается снова, но тоже один раз
+    assert len(_feed(detector, BASE + 110, 100)) == 1
+    assert detector.get_stats()['alerts'] == 2
+
+
+def test_steady_rate_and_late_events_do_not_alert():
+    detector = RateAnomalyDetector(interval=10, min_count=5)
+    for interval in range(20):
+        assert _feed(detector, BASE + interval * 10, 30) == []
+    # Опоздавшие события учитываются в текущем интервале и не сбрасывают его
+    assert _feed(detector, BASE, 3) == []
+    assert detector.states[('Security', 'Security-Auditing', '4625')].interval == (BASE + 190) // 10
+
+
+def test_idle_intervals_lower_expected_rate():
+    detector = RateAnomalyDetector(interval=10, half_life=10)
+    for interval in range(10):
+        _feed(detector, BASE + interval * 10, 50)
+    # После долгого перерыва среднее затухает, и обычный поток снова выглядит всплеском
+    assert len(_feed(detector, BASE + 10000, 60)) == 1
+
+
+def test_least_recent_keys_are_evicted():
+    detector = RateAnomalyDetector(max_keys=2)
+    _feed(detector, BASE, 1, source='A')
+    _feed(detector, BASE, 1, source='B')
+    _feed(detector, BASE, 1, source='A')
+    _feed(detector, BASE, 1, source='C')
+
+    assert [key[1] for key in detector.states] == ['A', 'C']
+    stats = detector.get_stats()
+    assert stats['keys'] == 2
+    assert stats['evicted'] == 1
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'interval': 0}, {'half_life': 0}, {'threshold': 0}, {'min_count': 0}, {'max_keys': 0},
+])
+def test_invalid_parameters(kwargs):
+    with pytest.raises(ValueError):
+        RateAnomalyDetector(**kwargs)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты сохранения конфигурации (config_service.ConfigService.save)
+"""
+
+import configparser
+import os
+import sys
+import threading
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_service import ConfigService
+
+YAML_TEXT = """# Параметры подключения к RabbitMQ
+rabbitmq:
+  host: "192.168.239.181"      # адрес сервера RabbitMQ
+  port: 5672
+  password: "12345678"     # пароль
+
+# Неизвестный агенту раздел
+custom:
+  key: value   # комментарий
+
+logs:
+  # Типы журналов для сбора
+  types:
+    - "Система"
+    - "Приложение"
+  hours_back: 1"""
+
+
+def test_yaml_save_keeps_unknown_keys(tmp_path):
+    path = tmp_path / 'config.yml'
+    path.write_text(YAML_TEXT, encoding='utf-8')
+    service = ConfigService(str(path))
+
+    service.save({'rabbitmq': {'host': 'mq.local', 'password': 'a "b" #c'},
+                  'logs': {'types': ['Безопасность']}, 'interval': 7})
+
+    document = yaml.safe_load(path.read_text(encoding='utf-8'))
+    assert document['custom'] == {'key': 'value'}
+    assert document['rabbitmq'] == {'host': 'mq.local', 'port': 5672, 'password': 'a "b" #c'}
+
+    config = ConfigService(str(path)).config
+    assert config == service.config
+    assert config.rabbitmq.password == 'a "b" #c'
+    assert config.logs.types == ('Безопасность',)
+    assert config.interval == 7
+
+
+def test_yaml_save_keeps_comments_with_ruamel(tmp_path):
+    pytest.importorskip('ruamel.yaml')
+    path = tmp_path / 'config.yml'
+    path.write_text(YAML_TEXT, encoding='utf-8')
+
+    ConfigService(str(path)).save({'rabbitmq': {'host': 'mq.local'}})
+
+    text = path.read_text(encoding='utf-8')
+    assert '# Параметры подключения к RabbitMQ' in text
+    assert '# адрес сервера RabbitMQ' in text
+    assert '  key: value   # комментарий' in text
+
+
+def test_subscribers_are_notified_without_service_lock(tmp_path):
+    path = tmp_path / 'config.yml'
+    path.write_text(YAML_TEXT, encoding='utf-8')
+    service = ConfigService(str(path))
+    calls = []
+
+    def subscriber(old_config, new_config):
+        # Чтение конфигурации из другого потока не ждет завершения обработчика
+        reader = threading.Thread(target=lambda: service.reload(force=True))
+        reader.start()
+        reader.join(2.0)
+        calls.append((old_config.rabbitmq.host, new_config.rabbitmq.host, reader.is_alive()))
+
+    service.subscribe(subscriber)
+    service.save({'rabbitmq': {'host': 'mq.local'}})
+    assert calls == [('192.168.239.181', 'mq.local', False)]
+
+
+def test_yaml_save_without_changes_keeps_file(tmp_path):
+    path = tmp_path / 'config.yml'
+    path.write_text(YAML_TEXT, encoding='utf-8')
+    service = ConfigService(str(path))
+
+    service.save({'rabbitmq': {'host': '192.168.239.181'}})
+
+    assert path.read_text(encoding='utf-8') == YAML_TEXT
+
+
+def test_ini_save_keeps_other_sections_and_keys(tmp_path):
+    path = tmp_path / 'config.ini'
+    path.write_text("[RabbitMQ]\nhost = localhost\nextra = keep\n\n"
+                    "[Custom]\nfoo = bar\n\n"
+                    "[Logging]\ndirectory = logs\nlevel = DEBUG\n", encoding='utf-8')
+    service = ConfigService(str(path))
+    assert service.config.rabbitmq.username == 'guest'
+
+    service.save({'rabbitmq': {'host': 'mq.local'}, 'logs': {'types': ['Безопасность']}})
+
+    parser = configparser.ConfigParser()
+    parser.read(str(path), encoding='utf-8')
+    assert parser['RabbitMQ']['host'] == 'mq.local'
+    assert parser['RabbitMQ']['extra'] == 'keep'
+    assert parser['Custom']['foo'] == 'bar'
+    assert parser['Logging']['level'] == 'DEBUG'
+    assert parser['Logs'].getboolean('security')
+    assert not parser['Logs'].getboolean('system')
+    assert ConfigService(str(path)).config == service.config
+
+
+def test_ini_and_yaml_use_separate_store_directories(tmp_path):
+    ini_path = tmp_path / 'config.ini'
+    ini_path.write_text("[RabbitMQ]\nhost = localhost\n", encoding='utf-8')
+    yaml_path = tmp_path / 'config.yml'
+    yaml_path.write_text("interval: 5\n", encoding='utf-8')
+
+    gui_storage = ConfigService(str(ini_path)).config.storage
+    core_storage = ConfigService(str(yaml_path)).config.storage
+    assert core_storage.directory == 'data/events'
+    assert gui_storage.directory == 'data/events_gui'
+    assert gui_storage.retention_days == core_storage.retention_days
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты корреляции событий по правилам (correlation)
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from correlation import CorrelationEngine, TimeWheel, load_rules
+from rollups import format_time, parse_time
+
+BASE = parse_time('2026-10-19 10:00:00')
+
+FAILED = 'Неудачный вход в систему'
+SUCCESS = 'Успешный вход в систему'
+
+BRUTEFORCE = {
+    'name': 'logon_bruteforce',
+    'group_by': ['computer', 'account'],
+    'window': 60,
+    'sequence': [
+        {'where': {'message': {'contains': FAILED}}, 'count': 3},
+        {'where': {'message': {'contains': SUCCESS}}},
+    ],
+}
+
+
+def _event(offset, message, account='bob', computer='pc1'):
+    return {'time': format_time(BASE + offset), 'message': message, 'computer': computer, 'account': account,
+            'log_type': 'Security', 'source': 'Security-Auditing', 'id': '4625'}
+
+
+def test_threshold_rule_within_window():
+    engine = CorrelationEngine([{'name': 'errors', 'where': {'level_name': 'Ошибка'}, 'count': 3, 'window': 10}])
+    event = {'level_name': 'Ошибка'}
+
+    # События реже окна не дают тревоги
+    assert engine.process([dict(event, time=format_time(BASE + offset)) for offset in (0, 6, 12, 18)]) == []
+    alerts = engine.process([dict(event, time=format_time(BASE + offset)) for offset in (19, 20)])
+    assert len(alerts) == 1
+    assert alerts[0]['rule'] == 'errors'
+    assert alerts[0]['first_time'] == format_time(BASE + 12)
+    assert alerts[0]['count'] == 3
+
+
+def test_sequence_rule_fires_once_per_group():
+    engine = CorrelationEngine([BRUTEFORCE])
+    events = [_event(offset, FAILED) for offset in range(3)] + [_event(5, FAILED, account='eve')]
+    events += [_event(10, SUCCESS, account='eve'), _event(10, SUCCESS), _event(11, SUCCESS)]
+
+    alerts = engine.process(events)
+    assert len(alerts) == 1
+    alert = alerts[0]
+    assert alert['group'] == {'computer': 'pc1', 'account': 'bob'}
+    assert alert['count'] == 4
+    assert alert['time'] == format_time(BASE + 10)
+    assert alert['first_time'] == format_time(BASE)
+
+
+def test_sequence_must_fit_window():
+    engine = CorrelationEngine([BRUTEFORCE])
+    # Успешный вход без предшествующей серии не начинает последовательность
+    assert engine.process([_event(0, SUCCESS)]) == []
+    assert engine.process([_event(offset, FAILED) for offset in (1, 2, 3)] + [_event(100, SUCCESS)]) == []
+    # Новая серия после истечения окна срабатывает
+    assert len(engine.process([_event(offset, FAILED) for offset in (101, 102, 103)]
+                              + [_event(104, SUCCESS)])) == 1
+
+
+def test_equal_conditions_share_predicates():
+    engine = CorrelationEngine([
+        {'name': 'a', 'where': {'id': '4625', 'source': {'in': ['A', 'B']}}, 'window': 5},
+        {'name': 'b', 'where': {'id': '4625'}, 'count': 2, 'window': 5},
+    ])
+    assert engine.get_stats()['predicates'] == 2
+    alerts = engine.process([{'id': '4625', 'source': 'A', 'time': format_time(BASE + offset)}
+                             for offset in (0, 1)])
+    assert [alert['rule'] for alert in alerts] == ['a', 'a', 'b']
+
+
+def test_idle_groups_expire_and_groups_are_limited():
+    engine = CorrelationEngine([BRUTEFORCE], max_groups=2)
+    engine.process([_event(0, FAILED, account=name) for name in ('a', 'b', 'c')])
+    rule = engine.rules[0]
+    assert len(rule.groups) == 2
+    assert rule.get_stats()['dropped'] == 1
+
+    engine.process([_event(200, FAILED, account='c')])
+    assert list(rule.groups) == [('pc1', 'c')]
+
+
+def test_time_wheel_expires_untouched_keys():
+    wheel = TimeWheel(5)
+    states = {'a': SimpleNamespace(tick=None), 'b': SimpleNamespace(tick=None)}
+    wheel.advance(100, states)
+    wheel.touch('a', states['a'])
+    wheel.advance(103, states)
+    wheel.touch('b', states['b'])
+
+    assert wheel.advance(105, states) == 0
+    assert wheel.advance(106, states) == 1
+    assert list(states) == ['b']
+    wheel.touch('b', states['b'])
+    # Скачок больше оборота колеса
+    assert wheel.advance(1000, states) == 1
+    assert states == {}
+
+
+def test_time_wheel_keeps_touched_keys():
+    wheel = TimeWheel(5)
+    states = {'a': SimpleNamespace(tick=None)}
+    for second in range(100, 120):
+        wheel.advance(second, states)
+        wheel.touch('a', states['a'])
+    assert list(states) == ['a']
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / 'rules.yml'
+    path.write_text("rules:\n"
+                    "  - name: service_crash\n"
+                    "    where: {id: '7031', message: {regex: 'служба .* завершена'}}\n"
+                    "    count: 2\n"
+                    "    window: 30\n", encoding='utf-8')
+    engine = load_rules(str(path))
+    assert engine.get_stats()['rules'][0]['name'] == 'service_crash'
+
+    path.write_text("rules: {}\n", encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_rules(str(path))
+    path.write_text("rules: [\n", encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_rules(str(path))
+
+
+@pytest.mark.parametrize('rule', [
+    {'where': {'id': '1'}, 'window': 5},
+    {'name': 'r', 'where': {'id': '1'}},
+    {'name': 'r', 'where': {'id': '1'}, 'window': 0},
+    {'name': 'r', 'window': 5},
+    {'name': 'r', 'sequence': [], 'window': 5},
+    {'name': 'r', 'where': {'id': '1'}, 'count': 0, 'window': 5},
+    {'name': 'r', 'where': {'id': {'like': '1'}}, 'window': 5},
+    {'name': 'r', 'where': {'id': {'equals': '1', 'in': ['1']}}, 'window': 5},
+    {'name': 'r', 'where': {'id': {'in': '1'}}, 'window': 5},
+    {'name': 'r', 'where': {'message': {'regex': '('}}, 'window': 5},
+])
+def test_invalid_rules(rule):
+    with pytest.raises(ValueError):
+        CorrelationEngine([rule])
+
+
+def test_duplicate_rule_names():
+    rule = {'name': 'r', 'where': {'id': '1'}, 'window': 5}
+    with pytest.raises(ValueError):
+        CorrelationEngine([rule, rule])
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты обогащения событий (enrichment)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enrichment import Enricher, FieldExtractor, KeywordAutomaton
+
+
+def test_automaton_finds_overlapping_keywords():
+    automaton = KeywordAutomaton({'he': {'a'}, 'she': {'b'}, 'hers': {'c'}, 'his': {'d'}})
+    assert automaton.search('USHERS') == {'a', 'b', 'c'}
+    assert automaton.search('this') == {'d'}
+    assert automaton.search('') == set()
+
+
+def test_automaton_matches_naive_search():
+    words = ['ab', 'bab', 'abc', 'c', 'bca', 'aaaa']
+    automaton = KeywordAutomaton({word: {word} for word in words})
+    for text in ('abcabcaaaab', 'bbbbb', 'aaaaaaa', 'xbabcx'):
+        assert automaton.search(text) == {word for word in words if word in text}
+
+
+def test_extractor_uses_group_or_whole_match():
+    extractor = FieldExtractor({
+        'account': r'Account:\s*(\S+)',
+        'code': r'E\d{3}',
+    })
+    assert extractor.extract('Account: bob failed E042') == {'account': 'bob', 'code': 'E042'}
+    assert extractor.extract('nothing here') == {}
+
+
+def test_extractor_finds_field_inside_other_match():
+    extractor = FieldExtractor({
+        'account': r'Имя учетной записи:\s*(\S+)',
+        'ip_address': r'\b\d{1,3}(?:\.\d{1,3}){3}\b',
+    })
+    assert extractor.extract('Имя учетной записи: 10.0.0.1') == {
+        'account': '10.0.0.1', 'ip_address': '10.0.0.1'}
+
+    extractor = FieldExtractor({'user': r'user=(\w+)', 'host': r'user=\w+@(\w+)'})
+    assert extractor.extract('user=bob@pc1') == {'user': 'bob', 'host': 'pc1'}
+
+
+def test_extractor_takes_leftmost_of_field_patterns():
+    extractor = FieldExtractor({'outer': r'\[(.*)\]', 'inner': [r'y=(\d+)', r'x=(\d+)']})
+    assert extractor.extract('[x=1 y=2]') == {'outer': 'x=1 y=2', 'inner': '1'}
+
+
+@pytest.mark.parametrize('pattern', [r'(a)\1', r'(?P<x>a)', r'(a)?(?(1)b|c)', r'('])
+def test_extractor_rejects_invalid_patterns(pattern):
+    with pytest.raises(ValueError):
+        FieldExtractor({'field': pattern})
+
+
+def test_extractor_rejects_reserved_fields():
+    with pytest.raises(ValueError):
+        FieldExtractor({'message': 'a'})
+
+
+def test_escaped_backslash_before_digit_is_allowed():
+    extractor = FieldExtractor({'path': r'(C:\\1\w*)'})
+    assert extractor.extract(r'open C:\1abc') == {'path': r'C:\1abc'}
+
+
+def test_enricher_returns_copy_with_tags_and_fields():
+    enricher = Enricher(tags={'ioc': ['mimikatz']}, fields={'account': r'user=(\w+)'})
+    event = {'message': 'MIMIKATZ run by user=eve', 'tags': ['old']}
+    enriched = enricher.enrich(event)
+    assert enriched['tags'] == ['ioc', 'old']
+    assert enriched['account'] == 'eve'
+    assert 'account' not in event
+
+    plain = {'message': 'ok'}
+    assert enricher.enrich(plain) is plain
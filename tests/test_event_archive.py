@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты столбцового архива событий (event_archive, собственный формат *.evc)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_archive import ArchiveReader, ArchiveWriter, iter_archive
+
+
+def _event(number):
+    return {
+        'time': f"2026-10-19 10:{number // 60 % 60:02d}:{number % 60:02d}",
+        'log_type': 'System' if number % 2 else 'Security',
+        'level': number % 4,
+        'level_name': 'Ошибка',
+        'source': f"Source{number % 7}",
+        'id': str(4624 + number % 3),
+        'message': f"Сообщение {number}\nвторая строка",
+    }
+
+
+def _write(path, events, row_group_size=100):
+    with ArchiveWriter(path, row_group_size=row_group_size, fmt='evc') as writer:
+        writer.write(events)
+
+
+def _read(path, **kwargs):
+    return [event for chunk in iter_archive(path, **kwargs) for event in chunk]
+
+
+def test_round_trip_across_row_groups(tmp_path):
+    path = str(tmp_path / 'events.evc')
+    events = [_event(number) for number in range(1000)]
+    _write(path, events)
+
+    reader = ArchiveReader(path)
+    assert reader.count == 1000
+    assert len(reader.row_groups) == 10
+    assert _read(path) == events
+
+
+def test_russian_keys_extra_fields_and_missing_values(tmp_path):
+    path = str(tmp_path / 'events.evc')
+    events = [
+        {'время': '2026-10-19 10:00:00', 'журнал': 'Система', 'сообщение': 'текст', 'tags': ['ioc']},
+        {'message': 'без времени', 'account': 'bob'},
+        {'time': 'не время', 'message': 'неразобранное время'},
+    ]
+    _write(path, events)
+
+    assert _read(path) == [
+        {'time': '2026-10-19 10:00:00', 'log_type': 'Система', 'message': 'текст', 'tags': ['ioc']},
+        {'message': 'без времени', 'account': 'bob'},
+        {'time': 'не время', 'message': 'неразобранное время'},
+    ]
+
+
+def test_period_filter_skips_groups_and_rows(tmp_path):
+    path = str(tmp_path / 'events.evc')
+    events = [_event(number) for number in range(600)]
+    _write(path, events)
+
+    selected = _read(path, start='2026-10-19 10:02:30', end='2026-10-19 10:05:00')
+    assert selected == events[150:300]
+    assert _read(path, start='2026-10-19 11:00:00') == []
+
+
+def test_column_subset_and_chunks(tmp_path):
+    path = str(tmp_path / 'events.evc')
+    events = [_event(number) for number in range(250)]
+    _write(path, events)
+
+    groups = list(ArchiveReader(path).iter_groups(columns=['source']))
+    assert [len(group['source']) for group in groups] == [100, 100, 50]
+    assert set(groups[0]) == {'source'}
+    assert [len(chunk) for chunk in iter_archive(path, chunk_size=40)] == [40, 40, 20, 40, 40, 20, 40, 10]
+
+
+def test_many_distinct_dictionary_values(tmp_path):
+    path = str(tmp_path / 'events.evc')
+    events = [{'time': '2026-10-19 10:00:00', 'source': f"S{number}"} for number in range(70000)]
+    _write(path, events, row_group_size=70000)
+    assert _read(path) == events
+
+
+def test_truncated_archive_is_rejected(tmp_path):
+    path = str(tmp_path / 'events.evc')
+    _write(path, [_event(0)])
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:-3])
+
+    with pytest.raises(ValueError):
+        ArchiveReader(path)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты буфера событий (event_buffer.EventBuffer)
+"""
+
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_buffer
+from event_buffer import EventBuffer
+
+
+def test_cursor_blocks_eviction_until_commit():
+    buffer = EventBuffer(maxlen=3)
+    cursor = buffer.open_cursor()
+    for number in range(3):
+        buffer.append({'n': number})
+
+    appended = threading.Event()
+    thread = threading.Thread(target=lambda: (buffer.append({'n': 3}), appended.set()))
+    thread.start()
+    assert not appended.wait(0.2)
+
+    entries = cursor.read(limit=1)
+    assert [event['n'] for _, event, _ in entries] == [0]
+    cursor.commit(entries[-1][0])
+    assert appended.wait(1.0)
+    thread.join()
+    cursor.close()
+
+
+def test_stuck_cursor_does_not_stall_append(monkeypatch):
+    monkeypatch.setattr(event_buffer, 'CURSOR_WAIT_LIMIT', 0.1)
+    buffer = EventBuffer(maxlen=10)
+    cursor = buffer.open_cursor()
+
+    for number in range(100):
+        buffer.append({'n': number})
+
+    assert cursor.detached
+    assert cursor not in buffer.cursors
+
+    # При следующем чтении курсор продолжает с самого старого события и подключается снова
+    entries = cursor.read(limit=100)
+    assert [event['n'] for _, event, _ in entries] == list(range(90, 100))
+    assert cursor.lost == 90
+    assert cursor in buffer.cursors
+    cursor.close()
+
+
+def _fill(buffer, count, start=0):
+    for number in range(start, start + count):
+        buffer.append({'n': number})
+
+
+def test_since_returns_events_after_seq_with_limit():
+    buffer = EventBuffer(maxlen=100)
+    _fill(buffer, 10)
+
+    assert [seq for seq, _, _ in buffer.since(0)] == list(range(1, 11))
+    assert [seq for seq, _, _ in buffer.since(4, limit=3)] == [5, 6, 7]
+    assert buffer.since(10) == []
+    assert buffer.since(4, limit=0) == []
+
+
+def test_since_after_eviction_starts_at_oldest_event():
+    buffer = EventBuffer(maxlen=5)
+    _fill(buffer, 12)
+
+    assert buffer.first_seq == 8
+    assert [seq for seq, _, _ in buffer.since(2)] == [8, 9, 10, 11, 12]
+    assert [event['n'] for _, event, _ in buffer.since(9, limit=2)] == [9, 10]
+
+
+def test_since_after_clear_keeps_numbering():
+    buffer = EventBuffer(maxlen=10)
+    _fill(buffer, 3)
+    version = buffer.version
+    buffer.clear()
+
+    assert buffer.since(0) == []
+    assert buffer.version != version
+    assert buffer.append({'n': 3}) == 4
+    assert [seq for seq, _, _ in buffer.since(0)] == [4]
+
+
+def test_fragment_is_serialized_event():
+    buffer = EventBuffer()
+    buffer.append({'сообщение': 'тест'})
+    (_, event, fragment), = buffer.since(0)
+    assert json.loads(fragment) == event
+
+
+def _events_buffer():
+    buffer = EventBuffer(maxlen=100)
+    levels = ['Ошибка', 'Предупреждение', 'Сведения']
+    for number in range(30):
+        buffer.append({
+            'n': number,
+            'level': str(number % 3),
+            'level_name': levels[number % 3],
+            'log_type': 'System' if number % 2 else 'Security',
+            'source': f"Source{number % 5}",
+            'message': f"message {number}",
+            # Время идет в обратном порядке, чтобы сортировка по времени отличалась от порядка поступления
+            'time': f"2026-10-19 10:{59 - number:02d}:00",
+        })
+    return buffer
+
+
+def test_query_pages_without_filters():
+    buffer = _events_buffer()
+
+    total, page = buffer.query(sort='seq', offset=5, limit=3)
+    assert total == 30
+    assert [event['n'] for _, event, _ in page] == [5, 6, 7]
+
+    total, page = buffer.query(sort='-seq', offset=0, limit=2)
+    assert [event['n'] for _, event, _ in page] == [29, 28]
+
+    total, page = buffer.query(sort='time', limit=2)
+    assert [event['n'] for _, event, _ in page] == [29, 28]
+
+    total, page = buffer.query(sort='-seq', offset=40, limit=5)
+    assert total == 30 and page == []
+
+
+def test_query_filters_combine_with_text_and_after():
+    buffer = _events_buffer()
+
+    total, page = buffer.query(filters={'level': '0', 'log_type': 'System'}, sort='seq', limit=100)
+    expected = [n for n in range(30) if n % 3 == 0 and n % 2]
+    assert total == len(expected)
+    assert [event['n'] for _, event, _ in page] == expected
+
+    total, page = buffer.query(text='MESSAGE 2', sort='seq', limit=100)
+    assert [event['n'] for _, event, _ in page] == [2] + list(range(20, 30))
+
+    total, page = buffer.query(filters={'source': 'Source1'}, after=10, sort='-time', limit=100)
+    assert [event['n'] for _, event, _ in page] == [11, 16, 21, 26]
+
+    # Пустые значения фильтров не ограничивают выборку
+    assert buffer.query(filters={'level': ''})[0] == 30
+
+
+def test_query_indexes_follow_eviction():
+    buffer = EventBuffer(maxlen=5)
+    for number in range(12):
+        buffer.append({'n': number, 'level': 'x', 'time': f"{number:02d}"})
+
+    total, page = buffer.query(filters={'level': 'x'}, sort='time', limit=10)
+    assert total == 5
+    assert [event['n'] for _, event, _ in page] == [7, 8, 9, 10, 11]
+
+
+def test_query_rejects_unknown_field_and_sort():
+    buffer = _events_buffer()
+    with pytest.raises(ValueError):
+        buffer.query(filters={'message': 'x'})
+    with pytest.raises(ValueError):
+        buffer.query(sort='level')
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты экспорта и импорта событий (log_export)
+"""
+
+import gzip
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log_export import export_logs, iter_import
+
+EVENTS = [
+    {'id': str(number), 'время': f"2026-10-19 10:00:{number % 60:02d}", 'источник': 'Service',
+     'сообщение': f"Сообщение {number}, \"кавычки\" и запятая", 'журнал': 'System'}
+    for number in range(1200)
+]
+
+
+def _import(path, chunk_size=500):
+    return [event for chunk in iter_import(path, chunk_size=chunk_size) for event in chunk]
+
+
+@pytest.mark.parametrize('name', ['events.json', 'events.ndjson', 'events.json.gz'])
+def test_json_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    assert export_logs(EVENTS, path)
+    assert _import(path) == EVENTS
+    assert not os.path.exists(path + '.part')
+
+
+def test_csv_round_trip_keeps_message(tmp_path):
+    path = str(tmp_path / 'events.csv')
+    assert export_logs(EVENTS, path)
+    imported = _import(path)
+    assert len(imported) == len(EVENTS)
+    assert imported[7]['сообщение'] == EVENTS[7]['сообщение']
+
+
+def test_import_chunks_are_bounded(tmp_path):
+    path = str(tmp_path / 'events.json')
+    export_logs(EVENTS, path)
+    assert [len(chunk) for chunk in iter_import(path, chunk_size=500)] == [500, 500, 200]
+
+
+def test_json_import_skips_bad_elements(tmp_path):
+    path = str(tmp_path / 'events.json.gz')
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write('[{"id": "1"}, {"id": oops}, 5, {"id": "2", "n": 12345}]')
+    assert _import(path) == [{'id': '1'}, {'id': '2', 'n': 12345}]
+
+
+def test_cancelled_export_leaves_no_file(tmp_path):
+    path = str(tmp_path / 'events.json')
+    assert not export_logs(EVENTS, path, is_cancelled=lambda: True)
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + '.part')
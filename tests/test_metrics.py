@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты экспорта метрик (metrics.MetricsRegistry)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry
+
+
+def test_render_with_constant_labels():
+    registry = MetricsRegistry()
+    registry.counter('http_requests', 'Запросы', ('endpoint',)).labels('/api').inc(2)
+    registry.counter('http_errors', 'Ошибки').inc()
+    registry.gauge('pipeline_queue', 'Очередь').set(5)
+
+    text = registry.render(prefixes=('http_',), labels=(('worker', '42'),))
+    assert 'http_requests_total{worker="42",endpoint="/api"} 2' in text
+    assert 'http_errors_total{worker="42"} 1' in text
+    assert 'pipeline_queue' not in text
+    assert 'pipeline_queue 5' in registry.render()
+
+
+def test_histogram_with_constant_labels():
+    registry = MetricsRegistry()
+    registry.histogram('http_request_seconds', 'Время', buckets=(0.1, 1.0)).observe(0.5)
+
+    lines = registry.render(labels=(('worker', '7'),)).splitlines()
+    assert 'http_request_seconds_bucket{worker="7",le="0.1"} 0' in lines
+    assert 'http_request_seconds_bucket{worker="7",le="1.0"} 1' in lines
+    assert 'http_request_seconds_count{worker="7"} 1' in lines
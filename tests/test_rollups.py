@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты агрегатов событий по интервалам времени (rollups.EventRollups)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rollups
+from rollups import EventRollups, format_time, now_seconds, parse_time
+
+
+def _base():
+    # Начало часа двумя часами ранее: все интервалы в пределах срока хранения
+    now = now_seconds()
+    return now - now % 3600 - 2 * 3600
+
+
+def _event(seconds, source='Disk', level='Ошибка', event_id='7', log_type='System'):
+    return {'time': format_time(seconds), 'log_type': log_type, 'level_name': level,
+            'source': source, 'id': event_id}
+
+
+def test_time_round_trip():
+    assert format_time(parse_time('2026-10-19 10:11:12')) == '2026-10-19 10:11:12'
+    assert parse_time('не время') is None
+
+
+def test_query_groups_and_filters():
+    base = _base()
+    store = EventRollups()
+    store.add([_event(base + 10, source='Disk')] * 4
+              + [_event(base + 70, source='Net')] * 2
+              + [_event(base + 80, source='Net', level='Сведения')])
+
+    result = store.query(format_time(base), format_time(base + 3600), group_by=('source',))
+    assert result['resolution'] == 'minute'
+    assert result['total'] == 7
+    assert result['groups'] == [{'source': 'Disk', 'count': 4}, {'source': 'Net', 'count': 3}]
+
+    filtered = store.query(format_time(base), format_time(base + 3600),
+                           group_by=('level',), level='Сведения')
+    assert filtered['total'] == 1
+    assert filtered['groups'] == [{'level': 'Сведения', 'count': 1}]
+
+    # Граница периода округляется до интервала и не включается
+    assert store.query(format_time(base + 60), format_time(base + 120))['total'] == 3
+    assert store.query(format_time(base), format_time(base + 3600), limit=1, group_by=('source',))['groups'] == \
+        [{'source': 'Disk', 'count': 4}]
+
+
+def test_query_series_and_resolution():
+    base = _base()
+    store = EventRollups()
+    store.add([_event(base), _event(base + 3600 + 5)])
+
+    minutes = store.query(format_time(base), format_time(base + 180), series=True)
+    assert [point['count'] for point in minutes['series']] == [1, 0, 0]
+
+    hours = store.query(format_time(base - 86400), format_time(base + 7200), series=True)
+    assert hours['resolution'] == 'hour'
+    assert hours['total'] == 2
+    assert [point['count'] for point in hours['series']][-2:] == [1, 1]
+
+
+def test_query_rejects_invalid_arguments():
+    store = EventRollups()
+    with pytest.raises(ValueError):
+        store.query(group_by=('message',))
+    with pytest.raises(ValueError):
+        store.query(computer='pc')
+    with pytest.raises(ValueError):
+        store.query(resolution='day')
+    with pytest.raises(ValueError):
+        store.query(start='вчера')
+
+
+def test_prune_drops_expired_minutes():
+    base = _base()
+    store = EventRollups()
+    store.add([_event(base - 3 * 86400), _event(base)])
+    store.prune()
+
+    assert store.starts['minute'] == [base]
+    assert store.starts['hour'] == [base - 3 * 86400, base]
+
+
+def test_prune_renumbers_unused_keys(monkeypatch):
+    monkeypatch.setattr(rollups, 'KEYS_COMPACT_MIN', 4)
+    base = _base()
+    store = EventRollups()
+    store.add([_event(base - 100 * 86400, source=f"Old{number}") for number in range(4)]
+              + [_event(base, source='New')])
+    store.prune()
+
+    assert store.keys == [('System', 'Ошибка', 'New', '7')]
+    assert store.buckets['hour'] == {base: {0: 1}}
+    assert store.query(format_time(base), format_time(base + 60), group_by=('source',))['groups'] == \
+        [{'source': 'New', 'count': 1}]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    base = _base()
+    path = str(tmp_path / 'rollups' / 'agent.json')
+    store = EventRollups(path)
+    store.add([_event(base, source='Disk'), _event(base + 61, source='Net')])
+    store.save()
+
+    loaded = EventRollups(path)
+    loaded.load()
+    assert loaded.keys == store.keys
+    assert loaded.buckets == store.buckets
+    assert loaded.starts == store.starts
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_load_ignores_corrupted_file(tmp_path):
+    path = tmp_path / 'agent.json'
+    path.write_text('{"keys": [', encoding='utf-8')
+    store = EventRollups(str(path))
+    store.load()
+    assert store.keys == []
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты инвертированного индекса поиска (search_index.SearchIndex)
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import SearchIndex
+
+WORDS = ['ошибка', 'служба', 'запущена', 'error', 'service', 'dns', 'a1', 'учетной', 'записи', '10.0.0.1']
+QUERIES = ['', 'ош', 'ошибка служ', 'rvice', 'dns error', 'a1', 'записи 10.0', '.0.', 'нет такого', 'e']
+
+
+def _texts(count, seed=1):
+    generator = random.Random(seed)
+    return [' '.join(generator.choice(WORDS) for _ in range(generator.randint(1, 5))) for _ in range(count)]
+
+
+def _naive(texts, query):
+    return [row for row, text in enumerate(texts) if query.lower() in text]
+
+
+def test_search_matches_naive_substring_search():
+    texts = _texts(500)
+    index = SearchIndex()
+    index.add(texts[:200])
+    index.add(texts[200:])
+
+    for query in QUERIES:
+        rows, limit = index.search(query)
+        assert list(rows) == _naive(texts, query), query
+        assert limit == len(texts)
+
+
+def test_trimmed_rows_are_searched_through_spilled_texts():
+    texts = _texts(300, seed=2)
+    index = SearchIndex(spilled_texts=lambda end: ((row, texts[row]) for row in range(end)))
+    index.add(texts)
+    index.trim(120)
+
+    assert len(index) == 300
+    assert index.text(120) == texts[120]
+    for query in QUERIES:
+        rows, _ = index.search(query)
+        assert list(rows) == _naive(texts, query), query
+
+
+def test_rows_added_after_search_snapshot_are_excluded():
+    index = SearchIndex()
+    index.add(['first error'])
+    calls = []
+
+    def add_during_search():
+        # Поиск проверяет отмену после выборки списков: добавляем строку в этот момент
+        if not calls:
+            index.add(['second error'])
+        calls.append(1)
+        return False
+
+    rows, limit = index.search('error', is_cancelled=add_during_search)
+    assert list(rows) == [0]
+    assert limit == 1
+    assert list(index.search('error')[0]) == [0, 1]
+
+
+def test_cancelled_search_returns_none():
+    index = SearchIndex()
+    index.add(_texts(100))
+    assert index.search('ошибка', is_cancelled=lambda: True) is None
+
+
+def test_clear_resets_numbering():
+    index = SearchIndex()
+    index.add(['error'])
+    index.clear()
+    assert len(index) == 0
+    index.add(['other error'])
+    assert list(index.search('error')[0]) == [0]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты хранилища событий сеанса (session_store.SessionEventStore)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_store import BLOCK_SIZE, SessionEventStore
+
+
+def _events(start, count):
+    return [{'n': number, 'message': f"событие {number}"} for number in range(start, start + count)]
+
+
+def test_spilled_events_are_read_back_in_order(tmp_path):
+    store = SessionEventStore(window_size=100, spill_size=300, directory=str(tmp_path))
+    for start in range(0, 5000, 250):
+        store.append(_events(start, 250))
+
+    assert len(store) == 5000
+    assert store.window_start > 0
+    assert [event['n'] for event in store] == list(range(5000))
+    assert store[BLOCK_SIZE]['n'] == BLOCK_SIZE
+    assert store[-1]['n'] == 4999
+    assert [event['n'] for event in store[1000:1003]] == [1000, 1001, 1002]
+    assert [index for index, _ in store.iter_spilled()] == list(range(store.window_start))
+    store.close()
+
+
+def test_snapshot_keeps_length_while_store_grows(tmp_path):
+    store = SessionEventStore(window_size=10, spill_size=10, directory=str(tmp_path))
+    store.append(_events(0, 15))
+    snapshot = store.snapshot()
+
+    store.append(_events(15, 100))
+    assert len(snapshot) == 15
+    assert [event['n'] for event in snapshot] == list(range(15))
+    with pytest.raises(IndexError):
+        snapshot[15]
+    store.close()
+
+
+def test_snapshot_fails_after_clear(tmp_path):
+    store = SessionEventStore(window_size=10, spill_size=10, directory=str(tmp_path))
+    store.append(_events(0, 50))
+    snapshot = store.snapshot()
+
+    store.clear()
+    store.append(_events(100, 50))
+    with pytest.raises(RuntimeError):
+        snapshot[0]
+    store.close()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты потокового разбора JSON (utils.iter_json_stream)
+"""
+
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import iter_json_stream
+
+
+def _parse(text, chunk_size=65536):
+    """Разбор текста с заданным размером блока чтения"""
+    return list(iter_json_stream(io.BytesIO(text.encode('utf-8')), chunk_size=chunk_size))
+
+
+def test_bad_element_does_not_drop_following_elements():
+    valid = ','.join(json.dumps({'id': i}) for i in range(100000))
+    results = _parse('[{"a":1},{bad},' + valid + ']')
+
+    assert len(results) == 100002
+    assert results[0] == ({'a': 1}, None)
+    assert results[1][0] is None and results[1][1].startswith('элемент 1:')
+    assert all(error is None for _, error in results[2:])
+    assert results[-1] == ({'id': 99999}, None)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 65536])
+def test_values_split_across_chunks(chunk_size):
+    text = '[1.5, false, 3, "a,]\\\\\\"b", {"x": [1, "]"]}, -2e10]'
+    results = _parse(text, chunk_size)
+
+    assert results == [(value, None) for value in json.loads(text)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 65536])
+def test_truncated_array_yields_one_error(chunk_size):
+    results = _parse('[{"a": 1}, {"b": ', chunk_size)
+
+    assert results[0] == ({'a': 1}, None)
+    assert len(results) == 2 and results[1][0] is None
@@ -5,9 +5,24 @@
 
 import os
 import sys
+import json
+import zlib
+import codecs
 import configparser
 import datetime
 import platform
+import functools
+import re
+
+try:
+    import brotli
+except ImportError:
+    # Сжатие brotli необязательно, без модуля используется gzip
+    brotli = None
+
+# Символы, значимые для поиска границы элемента JSON-массива вне строк и внутри строк
+_JSON_STRUCTURE = re.compile(r'[\[\]{}",]')
+_JSON_STRING_SPECIAL = re.compile(r'["\\]')
 
 def create_default_config(config_path):
     """
@@ -52,12 +67,15 @@ def create_default_config(config_path):
     with open(config_path, 'w', encoding='utf-8') as configfile:
         config.write(configfile)
 
+@functools.lru_cache(maxsize=1)
 def get_system_info():
     """
-    Получение информации о системе
+    Получение информации о системе.
+    Сведения не меняются во время работы агента, поэтому вычисляются
+    один раз (часть функций platform запускает внешние процессы)
     
     Returns:
-        dict: Словарь с информацией о системе
+        dict: Словарь с информацией о системе (общий для всех вызовов, не изменять)
     """
     info = {
         'platform': platform.platform(),
@@ -118,3 +136,227 @@ def parse_windows_timestamp(timestamp):
     dt = datetime.datetime.fromtimestamp(unix_timestamp)
     
     return dt
+
+# Ключи полей события: коллектор передает английские ключи,
+# сохраненные ранее файлы и старые версии агента - русские
+EVENT_FIELDS = {
+    'id': ('id',),
+    'level': ('уровень', 'level_name'),
+    'time': ('время', 'time'),
+    'source': ('источник', 'source'),
+    'category': ('категория', 'category'),
+    'journal': ('журнал', 'log_type'),
+    'computer': ('компьютер', 'computer'),
+    'message': ('сообщение', 'message'),
+}
+
+def get_event_field(log_data, field, default=''):
+    """
+    Получение поля события независимо от языка ключей
+    
+    Args:
+        log_data (dict): Событие
+        field (str): Имя поля из EVENT_FIELDS
+        default: Значение, если поле отсутствует
+        
+    Returns:
+        Значение поля события
+    """
+    for key in EVENT_FIELDS[field]:
+        if key in log_data:
+            return log_data[key]
+    return default
+
+def iter_json_stream(stream, chunk_size=65536):
+    """
+    Инкрементальный разбор потока JSON-объектов без загрузки его целиком в память.
+    Поддерживаются формат NDJSON (один объект на строку) и JSON-массив объектов.
+    
+    Args:
+        stream: Двоичный поток с методом read()
+        chunk_size (int): Размер читаемого блока в байтах
+        
+    Yields:
+        tuple: Пара (объект, ошибка). Для корректного элемента ошибка равна None,
+               для некорректного объект равен None, а ошибка содержит описание
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = ''
+    eof = False
+    
+    def read_more():
+        nonlocal buffer, eof
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+            buffer += decoder.decode(b'', final=True)
+        else:
+            buffer += decoder.decode(chunk)
+    
+    # Определяем формат по первому значащему символу
+    while not eof and not buffer.lstrip():
+        read_more()
+    buffer = buffer.lstrip().lstrip('\ufeff')
+    
+    if not buffer.startswith('['):
+        # NDJSON: разбираем построчно
+        line_number = 0
+        while True:
+            lines = buffer.split('\n')
+            buffer = lines.pop() if not eof else ''
+            
+            for line in lines:
+                line_number += 1
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line), None
+                except ValueError as e:
+                    yield None, f"строка {line_number}: {str(e)}"
+                    
+            if eof:
+                return
+            read_more()
+    
+    # JSON-массив: сначала находим границу элемента (запятую или закрывающую
+    # скобку массива вне строк и вложенных значений), затем декодируем только
+    # его, поэтому ошибка в одном элементе не мешает разбору следующих, а
+    # число на границе блока не принимается до получения разделителя
+    json_decoder = json.JSONDecoder()
+    position = 1
+    index = 0
+    
+    while True:
+        # Пропускаем пробелы и разделители между элементами
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            buffer, position = buffer[position:], 0
+            read_more()
+            
+        if position >= len(buffer):
+            yield None, "неожиданный конец массива JSON"
+            return
+            
+        if buffer[position] == ']':
+            return
+            
+        scan = position
+        depth = 0
+        in_string = False
+        boundary = None
+        while boundary is None:
+            match = (_JSON_STRING_SPECIAL if in_string else _JSON_STRUCTURE).search(buffer, scan)
+            if match is None:
+                if eof:
+                    break
+                # Элемент еще не получен целиком: отбрасываем обработанную часть буфера и дочитываем
+                scan -= position
+                buffer, position = buffer[position:], 0
+                read_more()
+                continue
+                
+            char = match.group()
+            scan = match.end()
+            if in_string:
+                if char == '\\':
+                    # Экранированный символ пропускается, даже если он придет со следующим блоком
+                    scan += 1
+                else:
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            elif char in '}]' and depth > 0:
+                depth -= 1
+            elif depth == 0 and char in ',]':
+                boundary = match.start()
+                
+        if boundary is None:
+            yield None, f"элемент {index}: неожиданный конец массива JSON"
+            return
+            
+        try:
+            item = json_decoder.decode(buffer[position:boundary])
+        except ValueError as e:
+            yield None, f"элемент {index}: {str(e)}"
+        else:
+            yield item, None
+        index += 1
+        position = boundary
+
+def negotiate_encoding(accept_encoding):
+    """
+    Выбор способа сжатия ответа по заголовку Accept-Encoding
+    
+    Args:
+        accept_encoding (str): Значение заголовка Accept-Encoding
+        
+    Returns:
+        str: 'br', 'gzip' или None, если клиент не принимает сжатые ответы
+    """
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+def _compressor(encoding):
+    """Создание потокового компрессора: функции сжатия очередного блока и завершения"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        return compressor.process, compressor.finish
+    # wbits=31: формат gzip (заголовок и контрольная сумма)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+def compress_data(data, encoding):
+    """
+    Сжатие тела ответа целиком
+    
+    Args:
+        data (bytes): Данные
+        encoding (str): 'br' или 'gzip'
+        
+    Returns:
+        bytes: Сжатые данные
+    """
+    compress, finish = _compressor(encoding)
+    return compress(data) + finish()
+
+def iter_compressed(chunks, encoding):
+    """
+    Потоковое сжатие тела ответа
+    
+    Args:
+        chunks (iterable): Блоки данных (str или bytes)
+        encoding (str): 'br' или 'gzip'
+        
+    Yields:
+        bytes: Сжатые блоки
+    """
+    compress, finish = _compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()